@@ -14,5 +14,13 @@ python manage.py seed_db
 echo "Creating admin user..."
 python manage.py createadmin
 
-# Start the Gunicorn server
-exec gunicorn config.wsgi:application --bind 0.0.0.0:10000
+# Start the server. SERVER_MODE=asgi runs uvicorn with the async payment
+# views, so requests waiting on Chapa share the event loop instead of each
+# holding a sync worker; the default stays on Gunicorn (WSGI).
+if [ "${SERVER_MODE:-wsgi}" = "asgi" ]; then
+  export PAYMENT_ASYNC_VIEWS="${PAYMENT_ASYNC_VIEWS:-true}"
+  exec uvicorn config.asgi:application --host 0.0.0.0 --port 10000 \
+    --workers "${WEB_CONCURRENCY:-1}"
+fi
+exec gunicorn config.wsgi:application --bind 0.0.0.0:10000 \
+  --workers "${WEB_CONCURRENCY:-1}"
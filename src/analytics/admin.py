@@ -0,0 +1,5 @@
+from django.contrib import admin
+from .models import DailyProductSales, DailyCategorySales
+
+admin.site.register(DailyProductSales)
+admin.site.register(DailyCategorySales)
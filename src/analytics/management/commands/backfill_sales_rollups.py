@@ -0,0 +1,64 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from analytics.rollups import date_chunks, rebuild
+from shop.models import Order, Status
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the daily sales rollups from paid orders, one date range at "
+        "a time. Run backfill_order_snapshots first so old lines have names."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--start",
+            type=date.fromisoformat,
+            help="First day to rebuild, YYYY-MM-DD (default: the first paid order).",
+        )
+        parser.add_argument(
+            "--end",
+            type=date.fromisoformat,
+            help="Last day to rebuild, inclusive (default: today).",
+        )
+        parser.add_argument(
+            "--chunk-days",
+            type=int,
+            default=7,
+            help="Days rebuilt per transaction (default: 7).",
+        )
+
+    def handle(self, *args, **options):
+        start = options["start"]
+        if start is None:
+            first = (
+                Order.objects.filter(status=Status.success)
+                .order_by("created_at")
+                .values_list("created_at", flat=True)
+                .first()
+            )
+            if first is None:
+                self.stdout.write(self.style.SUCCESS("No paid orders to roll up."))
+                return
+            start = timezone.localdate(first)
+        end = (options["end"] or timezone.localdate()) + timedelta(days=1)
+        if options["chunk_days"] < 1:
+            raise CommandError("--chunk-days must be at least 1.")
+
+        # Each chunk is its own short transaction over a bounded slice of
+        # orders, rather than one scan of the whole history.
+        products = categories = 0
+        for chunk_start, chunk_end in date_chunks(start, end, options["chunk_days"]):
+            written = rebuild(chunk_start, chunk_end)
+            products += written[0]
+            categories += written[1]
+            self.stdout.write(f"Rebuilt {chunk_start} to {chunk_end - timedelta(days=1)}")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Wrote {products} product and {categories} category rollup rows."
+            )
+        )
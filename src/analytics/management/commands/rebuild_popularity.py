@@ -0,0 +1,46 @@
+from collections import defaultdict
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from analytics.models import DailyProductSales
+from shop.cache import bump_catalog_version
+from shop.models import Product, ProductPopularity
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes every product's decayed popularity score from the daily "
+        "sales rollups. Run it after changing POPULARITY_HALF_LIFE_DAYS or "
+        "POPULARITY_EPOCH."
+    )
+
+    def handle(self, *args, **options):
+        # Each day's sales are weighted as if made at noon that day.
+        weights = {}
+        scores = defaultdict(float)
+        for day, product_id, units in DailyProductSales.objects.values_list(
+            "date", "product_id", "units"
+        ).iterator():
+            if day not in weights:
+                noon = timezone.make_aware(datetime.combine(day, time(12)))
+                weights[day] = ProductPopularity.objects.decay_weight(noon)
+            scores[product_id] += units * weights[day]
+
+        existing = set(
+            Product.objects.filter(pk__in=scores).values_list("pk", flat=True)
+        )
+        with transaction.atomic():
+            ProductPopularity.objects.all().delete()
+            ProductPopularity.objects.bulk_create(
+                ProductPopularity(product_id=product_id, score=score)
+                for product_id, score in scores.items()
+                if product_id in existing
+            )
+            transaction.on_commit(bump_catalog_version)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt popularity scores of {len(existing)} products.")
+        )
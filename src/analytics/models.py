@@ -0,0 +1,90 @@
+from django.db import connections, models, router
+
+# Rollups are keyed by plain ids and names rather than foreign keys: they are
+# history, and must outlive (and never block) the deletion of a product.
+
+
+class RollupManager(models.Manager):
+    def increment(self, rows):
+        """
+        Adds each row's units, revenue and order_count onto the matching
+        rollup row, creating it if needed, in one INSERT ... ON CONFLICT DO
+        UPDATE. Concurrent increments of the same bucket cannot lose updates.
+        """
+        if not rows:
+            return
+
+        table = self.model._meta.db_table
+        keys = self.model.rollup_key
+        columns = [*keys, *self.model.rollup_labels, "units", "revenue", "order_count"]
+        values = ", ".join([f"({', '.join(['%s'] * len(columns))})"] * len(rows))
+        labels = "".join(
+            f", {label} = EXCLUDED.{label}" for label in self.model.rollup_labels
+        )
+        sql = f"""
+            INSERT INTO {table} ({', '.join(columns)})
+            VALUES {values}
+            ON CONFLICT ({', '.join(keys)}) DO UPDATE
+            SET units = {table}.units + EXCLUDED.units,
+                revenue = {table}.revenue + EXCLUDED.revenue,
+                order_count = {table}.order_count + EXCLUDED.order_count{labels}
+        """
+        params = [row[column] for row in rows for column in columns]
+
+        connection = connections[router.db_for_write(self.model)]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+
+class SalesRollup(models.Model):
+    date = models.DateField(help_text="Day the order was placed.")
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    order_count = models.PositiveIntegerField(
+        default=0, help_text="Paid orders with at least one line in this bucket."
+    )
+
+    objects = RollupManager()
+
+    # Columns identifying a bucket, and descriptive columns refreshed on update
+    rollup_key = ()
+    rollup_labels = ()
+
+    class Meta:
+        abstract = True
+
+
+class DailyProductSales(SalesRollup):
+    product_id = models.BigIntegerField()
+    product_name = models.CharField(max_length=155, help_text="Latest name sold under.")
+
+    rollup_key = ("date", "product_id")
+    rollup_labels = ("product_name",)
+
+    class Meta:
+        verbose_name_plural = "Daily product sales"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["date", "product_id"], name="analytics_product_sales_day"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.product_name}: {self.units} units"
+
+
+class DailyCategorySales(SalesRollup):
+    category_name = models.CharField(max_length=155)
+
+    rollup_key = ("date", "category_name")
+
+    class Meta:
+        verbose_name_plural = "Daily category sales"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["date", "category_name"], name="analytics_category_sales_day"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.category_name}: {self.units} units"
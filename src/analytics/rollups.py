@@ -0,0 +1,99 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models import Count, F, Max, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from shop.models import OrderItem, Status
+
+from .models import DailyCategorySales, DailyProductSales
+
+
+def record_order(order):
+    """
+    Adds a newly paid order to the daily rollups, bucketed by the day it was
+    placed. Call it once, inside the transaction that moves the order to
+    `success`, so the rollups change exactly when the order does.
+    """
+    date = timezone.localdate(order.created_at)
+    products = defaultdict(lambda: {"units": 0, "revenue": Decimal("0")})
+    categories = defaultdict(lambda: {"units": 0, "revenue": Decimal("0")})
+
+    for product_id, product_name, category_name, quantity, price in (
+        order.order_items.values_list(
+            "product_id", "product_name", "category_name", "quantity", "price"
+        )
+    ):
+        buckets = [categories[category_name]]
+        if product_id is not None:
+            buckets.append(products[product_id])
+            products[product_id]["product_name"] = product_name
+        for bucket in buckets:
+            bucket["units"] += quantity
+            bucket["revenue"] += price * quantity
+
+    DailyProductSales.objects.increment(
+        [
+            {"date": date, "product_id": product_id, "order_count": 1, **totals}
+            for product_id, totals in products.items()
+        ]
+    )
+    DailyCategorySales.objects.increment(
+        [
+            {"date": date, "category_name": category_name, "order_count": 1, **totals}
+            for category_name, totals in categories.items()
+        ]
+    )
+
+
+def rebuild(start, end):
+    """
+    Recomputes the rollups for orders placed from `start` up to (not
+    including) `end`, replacing whatever was recorded for those days.
+    Returns the number of product and category rows written.
+    """
+    paid = OrderItem.objects.filter(
+        order__status=Status.success,
+        order__created_at__gte=_start_of(start),
+        order__created_at__lt=_start_of(end),
+    ).annotate(day=TruncDate("order__created_at"))
+    totals = {
+        "units": Sum("quantity"),
+        "revenue": Sum(
+            F("price") * F("quantity"),
+            output_field=models.DecimalField(max_digits=14, decimal_places=2),
+        ),
+        "order_count": Count("order_id", distinct=True),
+    }
+
+    with transaction.atomic():
+        product_rows = [
+            DailyProductSales(date=row.pop("day"), **row)
+            for row in paid.exclude(product_id=None)
+            .values("day", "product_id")
+            .annotate(product_name=Max("product_name"), **totals)
+        ]
+        category_rows = [
+            DailyCategorySales(date=row.pop("day"), **row)
+            for row in paid.values("day", "category_name").annotate(**totals)
+        ]
+        DailyProductSales.objects.filter(date__gte=start, date__lt=end).delete()
+        DailyCategorySales.objects.filter(date__gte=start, date__lt=end).delete()
+        DailyProductSales.objects.bulk_create(product_rows)
+        DailyCategorySales.objects.bulk_create(category_rows)
+    return len(product_rows), len(category_rows)
+
+
+def _start_of(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def date_chunks(start, end, days):
+    """Yields consecutive [chunk_start, chunk_end) ranges covering [start, end)."""
+    while start < end:
+        chunk_end = min(start + timedelta(days=days), end)
+        yield start, chunk_end
+        start = chunk_end
@@ -0,0 +1,132 @@
+from datetime import date, datetime, timezone as dt_timezone
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.test import APIClient
+from django.contrib.auth import get_user_model
+from analytics.models import DailyCategorySales, DailyProductSales
+from analytics.rollups import record_order
+from shop.models import (
+    Category,
+    Product,
+    Order,
+    OrderItem,
+    ProductPopularity,
+    Status,
+)
+import pytest
+
+User = get_user_model()
+
+DAY = date(2026, 3, 14)
+
+
+@pytest.mark.django_db
+class TestSalesRollups(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="buyer@example.com", password="password"
+        )
+        self.books = Category.objects.create(name="Books", description="Read")
+        self.games = Category.objects.create(name="Games", description="Play")
+        self.novel = Product.objects.create(
+            name="Novel", price="10.00", stock=100, category=self.books
+        )
+        self.puzzle = Product.objects.create(
+            name="Puzzle", price="25.00", stock=100, category=self.games
+        )
+
+    def paid_order(self, lines, day=DAY, status=Status.success):
+        order = Order.objects.create(user=self.user, total_price="0.00", status=status)
+        Order.objects.filter(pk=order.pk).update(
+            created_at=datetime(day.year, day.month, day.day, 12, tzinfo=dt_timezone.utc)
+        )
+        order.refresh_from_db()
+        OrderItem.objects.bulk_create(
+            OrderItem(
+                order=order,
+                product=product,
+                quantity=quantity,
+                price=product.price,
+                **OrderItem.snapshot(product),
+            )
+            for product, quantity in lines
+        )
+        return order
+
+    def test_recording_orders_increments_the_days_buckets(self):
+        record_order(self.paid_order([(self.novel, 2), (self.puzzle, 1)]))
+        record_order(self.paid_order([(self.novel, 1)]))
+
+        novel = DailyProductSales.objects.get(date=DAY, product_id=self.novel.id)
+        self.assertEqual((novel.units, novel.revenue, novel.order_count), (3, 30, 2))
+        games = DailyCategorySales.objects.get(date=DAY, category_name="Games")
+        self.assertEqual((games.units, games.revenue, games.order_count), (1, 25, 1))
+
+    def test_backfill_matches_incremental_recording(self):
+        orders = [
+            self.paid_order([(self.novel, 2), (self.puzzle, 1)]),
+            self.paid_order([(self.puzzle, 3)], day=date(2026, 3, 20)),
+        ]
+        self.paid_order([(self.novel, 5)], status=Status.failed)
+        for order in orders:
+            record_order(order)
+        recorded = set(
+            DailyProductSales.objects.values_list(
+                "date", "product_id", "units", "revenue", "order_count"
+            )
+        )
+
+        DailyProductSales.objects.all().delete()
+        call_command(
+            "backfill_sales_rollups",
+            start=DAY,
+            end=date(2026, 3, 31),
+            chunk_days=3,
+            stdout=StringIO(),
+        )
+        rebuilt = set(
+            DailyProductSales.objects.values_list(
+                "date", "product_id", "units", "revenue", "order_count"
+            )
+        )
+        self.assertEqual(rebuilt, recorded)
+        self.assertEqual(DailyCategorySales.objects.count(), 3)
+
+    def test_popularity_can_be_rebuilt_from_the_rollups(self):
+        record_order(self.paid_order([(self.novel, 1), (self.puzzle, 3)]))
+
+        call_command("rebuild_popularity", stdout=StringIO())
+
+        ranked = ProductPopularity.objects.order_by("-score")
+        self.assertEqual(
+            list(ranked.values_list("product_id", flat=True)),
+            [self.puzzle.id, self.novel.id],
+        )
+
+    def test_sales_report_is_admin_only_and_reads_the_rollups(self):
+        record_order(self.paid_order([(self.novel, 2), (self.puzzle, 1)]))
+        url = "/api/v1/analytics/sales/?start=2026-03-01&end=2026-03-31"
+
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        self.assertEqual(client.get(url).status_code, 403)
+
+        admin = User.objects.create_superuser(
+            email="admin@example.com", password="password"
+        )
+        client.force_authenticate(user=admin)
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["units"], 3)
+        self.assertEqual(float(response.data["revenue"]), 45.0)
+        self.assertEqual(response.data["top_products"][0]["product_name"], "Puzzle")
+        self.assertEqual(
+            [c["category_name"] for c in response.data["categories"]],
+            ["Games", "Books"],
+        )
+
+        # Served from the cache on repeat
+        with self.assertNumQueries(0):
+            client.get(url)
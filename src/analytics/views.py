@@ -0,0 +1,73 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max, Sum
+from drf_spectacular.utils import extend_schema
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .models import DailyCategorySales, DailyProductSales
+from .serializers import SalesReportQuerySerializer, SalesReportSerializer
+
+
+class SalesReportView(APIView):
+    """
+    Revenue and units by day, category and product, read from the daily
+    rollup tables only (never from the order tables).
+    """
+
+    permission_classes = [IsAdminUser]
+
+    @extend_schema(
+        summary="Sales report",
+        description=(
+            "[Admin Only] Units, revenue and paid orders between `start` and `end` "
+            "(inclusive, default: the last 30 days), by day and category, plus the "
+            "`top` products by revenue. Orders count on the day they were placed. "
+            "Responses are cached for up to ANALYTICS_CACHE_TIMEOUT seconds."
+        ),
+        parameters=[SalesReportQuerySerializer],
+        responses={200: SalesReportSerializer},
+        tags=["Analytics"],
+    )
+    def get(self, request, *args, **kwargs):
+        query = SalesReportQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        start, end, top = (query.validated_data[k] for k in ("start", "end", "top"))
+
+        key = f"analytics:sales:{start}:{end}:{top}"
+        data = cache.get(key)
+        if data is None:
+            data = SalesReportSerializer(self.build_report(start, end, top)).data
+            cache.set(key, data, settings.ANALYTICS_CACHE_TIMEOUT)
+        return Response(data)
+
+    def build_report(self, start, end, top):
+        totals = {
+            "units": Sum("units"),
+            "revenue": Sum("revenue"),
+            "order_count": Sum("order_count"),
+        }
+        categories = DailyCategorySales.objects.filter(date__gte=start, date__lte=end)
+        products = DailyProductSales.objects.filter(date__gte=start, date__lte=end)
+
+        daily = list(
+            categories.values("date")
+            .annotate(units=Sum("units"), revenue=Sum("revenue"))
+            .order_by("date")
+        )
+        return {
+            "start": start,
+            "end": end,
+            "units": sum(day["units"] for day in daily),
+            "revenue": sum((day["revenue"] for day in daily), Decimal("0")),
+            "daily": daily,
+            "categories": categories.values("category_name")
+            .annotate(**totals)
+            .order_by("-revenue", "category_name"),
+            "top_products": products.values("product_id")
+            .annotate(product_name=Max("product_name"), **totals)
+            .order_by("-revenue", "product_id")[:top],
+        }
@@ -9,8 +9,29 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
+from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
 from django.core.asgi import get_asgi_application
+from django.views import static
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
-application = get_asgi_application()
+
+class StaticFilesHandler(ASGIStaticFilesHandler):
+    """
+    Answers static file requests before the middleware stack, which under
+    SERVER_MODE=asgi leaves out the sync-only WhiteNoise middleware, so every
+    other request reaches Django without a sync hop.
+
+    Serves the collected (hashed) files from STATIC_ROOT when there is one,
+    and falls back to the staticfiles finders in development.
+    """
+
+    def serve(self, request):
+        if not settings.STATIC_ROOT:
+            return super().serve(request)
+        path = request.path.removeprefix(self.base_url.path)
+        return static.serve(request, path, document_root=settings.STATIC_ROOT)
+
+
+application = StaticFilesHandler(get_asgi_application())
@@ -10,7 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
-from datetime import timedelta
+from datetime import date, timedelta
 from pathlib import Path
 import sys
 import environ
@@ -46,6 +46,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "rest_framework",
     "rest_framework_simplejwt",
     "rest_framework_simplejwt.token_blacklist",
@@ -58,6 +59,7 @@ INSTALLED_APPS = [
     "users",
     "shop",
     "payment",
+    "analytics",
 ]
 
 MIDDLEWARE = [
@@ -68,10 +70,18 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "shop.middleware.CartMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# WhiteNoise's middleware is sync only: under ASGI every request would pass
+# through a thread just to reach it. Uvicorn leaves it out and config.asgi
+# serves static files ahead of the middleware stack instead.
+SERVER_MODE = env.str("SERVER_MODE", default="wsgi")
+if SERVER_MODE == "asgi":
+    MIDDLEWARE.remove("whitenoise.middleware.WhiteNoiseMiddleware")
+
 CORS_ALLOWED_ORIGINS = env.list("CORS_ALLOWED_ORIGINS", default=[])
 
 REST_FRAMEWORK = {
@@ -144,6 +154,51 @@ CHAPA_WEBHOOK_SECRET = env("CHAPA_WEBHOOK_SECRET", None)
 BACKEND_CALLBACK_URL = env("BACKEND_CALLBACK_URL", None)
 FRONTEND_RETURN_URL = env("FRONTEND_RETURN_URL", None)
 
+# --- CHAPA GATEWAY CLIENT ---
+# One keep-alive session per process (see payment.chapa). Timeouts are in
+# seconds; only idempotent calls (verify) are retried, with exponential backoff.
+CHAPA_BASE_URL = env.str("CHAPA_BASE_URL", default="https://api.chapa.co/v1")
+CHAPA_POOL_SIZE = env.int("CHAPA_POOL_SIZE", default=10)
+CHAPA_CONNECT_TIMEOUT = env.float("CHAPA_CONNECT_TIMEOUT", default=3.05)
+CHAPA_READ_TIMEOUT = env.float("CHAPA_READ_TIMEOUT", default=10)
+CHAPA_VERIFY_RETRIES = env.int("CHAPA_VERIFY_RETRIES", default=3)
+CHAPA_RETRY_BACKOFF = env.float("CHAPA_RETRY_BACKOFF", default=0.2)
+# Connections of the async client (see PAYMENT_ASYNC_VIEWS); calls beyond it
+# wait for a free connection
+CHAPA_ASYNC_POOL_SIZE = env.int("CHAPA_ASYNC_POOL_SIZE", default=100)
+# Minutes a checkout_url is handed out again to repeat initializations of the
+# same order instead of calling Chapa; keep it under Chapa's own link expiry
+CHAPA_CHECKOUT_TTL_MINUTES = env.int("CHAPA_CHECKOUT_TTL_MINUTES", default=30)
+
+# --- CHAPA CIRCUIT BREAKER ---
+# Per process (see payment.resilience). At most MAX_IN_FLIGHT calls wait on
+# Chapa at once (ASYNC_ for the async views); past that, or once ERROR_RATE
+# of at least MIN_CALLS calls in the last WINDOW_SECONDS failed, calls are
+# refused with a 503 for RESET_SECONDS instead of blocking workers. With
+# single-threaded Gunicorn workers only the breaker applies.
+CHAPA_MAX_IN_FLIGHT = env.int("CHAPA_MAX_IN_FLIGHT", default=10)
+CHAPA_ASYNC_MAX_IN_FLIGHT = env.int("CHAPA_ASYNC_MAX_IN_FLIGHT", default=100)
+CHAPA_BREAKER_ERROR_RATE = env.float("CHAPA_BREAKER_ERROR_RATE", default=0.5)
+CHAPA_BREAKER_MIN_CALLS = env.int("CHAPA_BREAKER_MIN_CALLS", default=10)
+CHAPA_BREAKER_WINDOW_SECONDS = env.int("CHAPA_BREAKER_WINDOW_SECONDS", default=30)
+CHAPA_BREAKER_RESET_SECONDS = env.int("CHAPA_BREAKER_RESET_SECONDS", default=30)
+
+# --- PAYMENT WEBHOOKS ---
+# Webhooks are queued and verified by the process_webhooks workers. A failed
+# verification is retried after BACKOFF * 2 ** (attempt - 1) seconds, up to
+# MAX_ATTEMPTS times. A claimed event returns to the queue after the lease
+# if its worker dies.
+WEBHOOK_MAX_ATTEMPTS = env.int("WEBHOOK_MAX_ATTEMPTS", default=8)
+WEBHOOK_RETRY_BACKOFF_SECONDS = env.int("WEBHOOK_RETRY_BACKOFF_SECONDS", default=30)
+WEBHOOK_CLAIM_LEASE_SECONDS = env.int("WEBHOOK_CLAIM_LEASE_SECONDS", default=300)
+
+# --- ASYNC PAYMENT VIEWS ---
+# Route payment initialize/webhook to payment.async_views, which wait on Chapa
+# without holding a worker. Only useful under ASGI (SERVER_MODE=asgi in
+# entrypoint.sh turns it on); keep CONN_MAX_AGE at 0 there, since the ORM
+# runs in short-lived threads.
+PAYMENT_ASYNC_VIEWS = env.bool("PAYMENT_ASYNC_VIEWS", default=False)
+
 AUTH_USER_MODEL = "users.CustomUser"
 
 ROOT_URLCONF = "config.urls"
@@ -173,6 +228,60 @@ DATABASES = {
     "default": env.db(),
 }
 
+# --- CACHE CONFIGURATION ---
+# Defaults to a per-process memory cache, which is only correct with a single
+# worker. Point CACHE_URL at a shared backend (e.g. redis://redis:6379/1) so
+# every worker serves the same catalog cache; the shop.E001 check refuses a
+# per-process cache when WEB_CONCURRENCY (Gunicorn/Uvicorn workers) is above 1.
+CACHES = {
+    "default": env.cache("CACHE_URL", default="locmemcache://"),
+}
+WEB_CONCURRENCY = env.int("WEB_CONCURRENCY", default=1)
+
+# Upper bound on how long a rendered catalog response is kept. Entries are
+# invalidated as soon as a Product or Category changes, so this only limits
+# memory use, not staleness.
+CATALOG_CACHE_TIMEOUT = env.int("CATALOG_CACHE_TIMEOUT", default=60 * 15)
+# Seconds a product's stock level is cached. Stock is overlaid onto cached
+# catalog responses from these entries, so sales never invalidate the catalog.
+CATALOG_STOCK_CACHE_TIMEOUT = env.int("CATALOG_STOCK_CACHE_TIMEOUT", default=5)
+
+# --- ANALYTICS ---
+# How long an admin sales report is served from the cache.
+ANALYTICS_CACHE_TIMEOUT = env.int("ANALYTICS_CACHE_TIMEOUT", default=60 * 5)
+
+# --- PRODUCT POPULARITY ---
+# Sales count half as much towards `?ordering=popular` every
+# POPULARITY_HALF_LIFE_DAYS. Scores are weighted relative to POPULARITY_EPOCH;
+# changing either needs a `rebuild_popularity` run.
+POPULARITY_HALF_LIFE_DAYS = env.float("POPULARITY_HALF_LIFE_DAYS", default=7)
+POPULARITY_EPOCH = date.fromisoformat(env.str("POPULARITY_EPOCH", default="2026-01-01"))
+# Seconds `?ordering=popular` responses are cached; sales do not invalidate them.
+POPULARITY_CACHE_TIMEOUT = env.int("POPULARITY_CACHE_TIMEOUT", default=60)
+
+# --- CHECKOUT ---
+# "sync": POST /orders/ reserves stock in the request (201).
+# "async": POST /orders/ queues the checkout (202, status "queued") and the
+# `process_checkouts` worker pool settles it.
+CHECKOUT_MODE = env.str("CHECKOUT_MODE", default="sync")
+
+# --- CHECKOUT LOCKING ---
+# "block": wait up to CHECKOUT_LOCK_TIMEOUT_MS for product row locks, then 503.
+# "nowait": fail fast on a held lock and retry with jittered backoff, then 409.
+CHECKOUT_LOCK_STRATEGY = env.str("CHECKOUT_LOCK_STRATEGY", default="block")
+CHECKOUT_LOCK_TIMEOUT_MS = env.int("CHECKOUT_LOCK_TIMEOUT_MS", default=3000)
+CHECKOUT_LOCK_RETRIES = env.int("CHECKOUT_LOCK_RETRIES", default=3)
+CHECKOUT_LOCK_RETRY_BACKOFF_MS = env.int("CHECKOUT_LOCK_RETRY_BACKOFF_MS", default=50)
+
+# --- IDEMPOTENCY KEYS ---
+# How long a stored response is replayed to retries carrying the same
+# Idempotency-Key, and how long a retry waits for an in-flight original.
+# An original still unfinished after the lease is taken to be dead and its
+# key is handed to the next retry; keep the lease above the slowest request.
+IDEMPOTENCY_KEY_TTL_HOURS = env.int("IDEMPOTENCY_KEY_TTL_HOURS", default=24)
+IDEMPOTENCY_WAIT_SECONDS = env.float("IDEMPOTENCY_WAIT_SECONDS", default=10)
+IDEMPOTENCY_LEASE_SECONDS = env.int("IDEMPOTENCY_LEASE_SECONDS", default=60)
+
 # --- EMAIL BACKEND CONFIGURATION ---
 # This line tells Django to print emails to the console instead of sending them.
 TESTING = "test" in sys.argv
@@ -30,6 +30,7 @@ urlpatterns = [
     re_path(r"^api/v1/auth/", include("djoser.urls")),
     re_path(r"^api/v1/auth/", include("djoser.urls.jwt")),
     path("api/v1/payments/", include("payment.urls")),
+    path("api/v1/analytics/", include("analytics.urls")),
     # API Schema and Documentation URLs
     path("api/v1/schema/", SpectacularAPIView.as_view(), name="schema"),
     # Optional UI:
@@ -0,0 +1,9 @@
+import pytest
+from django.core.cache import cache
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # The catalog cache outlives each test's database transaction, so start
+    # every test from an empty cache.
+    cache.clear()
@@ -0,0 +1,157 @@
+"""
+Async versions of the initialize and webhook payment views, routed in place
+of the APIView ones when PAYMENT_ASYNC_VIEWS is on (see entrypoint.sh for the
+ASGI run mode). Every middleware in the ASGI stack is async capable (see
+SERVER_MODE in settings), so a request waiting on Chapa is a suspended
+coroutine rather than a blocked worker, and one process can keep hundreds of
+gateway calls in flight. ORM work goes through sync_to_async.
+
+DRF views are sync only, so these are plain Django views that authenticate
+with the same JWTAuthentication and answer in the same shapes.
+"""
+
+import functools
+import json
+import logging
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from shop.idempotency import async_idempotent
+from shop.models import Status
+from .chapa import checkout_fields, get_async_client, initialize_payload, new_tx_ref
+from .models import Payment
+from .resilience import GatewayUnavailable
+from .serializers import InitializePaymentSerializer
+from .webhooks import WebhookRejected, read_event, store_event
+
+logger = logging.getLogger(__name__)
+
+
+def jwt_required(view):
+    """Sets `request.user` from the bearer token, or answers 401."""
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            result = await sync_to_async(JWTAuthentication().authenticate)(request)
+        except AuthenticationFailed as e:
+            return JsonResponse(
+                {"detail": e.detail}, status=status.HTTP_401_UNAUTHORIZED
+            )
+        if result is None:
+            return JsonResponse(
+                {"detail": "Authentication credentials were not provided."},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+        request.user = result[0]
+        return await view(request, *args, **kwargs)
+
+    return wrapper
+
+
+@csrf_exempt
+@require_POST
+@jwt_required
+@async_idempotent
+async def initialize_payment(request):
+    """Async InitializePaymentView.post."""
+    try:
+        data = json.loads(request.body or b"{}")
+    except json.JSONDecodeError:
+        return JsonResponse(
+            {"detail": "JSON parse error."}, status=status.HTTP_400_BAD_REQUEST
+        )
+
+    serializer = InitializePaymentSerializer(
+        data=data, context={"request": request}
+    )
+    if not await sync_to_async(serializer.is_valid)():
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    checkout = serializer.validated_data.get("checkout")
+    if checkout is not None:
+        return JsonResponse(
+            {"checkout_url": checkout.checkout_url}, status=status.HTTP_200_OK
+        )
+    order = serializer.validated_data["order"]
+
+    tx_ref = new_tx_ref(order)
+    payload = initialize_payload(order, request.user, tx_ref)
+
+    try:
+        response_data = await get_async_client().initialize(payload)
+    except GatewayUnavailable as e:
+        return JsonResponse(
+            {"detail": e.detail},
+            status=e.status_code,
+            headers={"Retry-After": str(e.wait)},
+        )
+    except httpx.HTTPStatusError as e:
+        chapa_error_details = e.response.text
+        logger.error(
+            "Chapa returned a client error for order %s. Details: %s",
+            order.id,
+            chapa_error_details,
+        )
+        return JsonResponse(
+            {
+                "error": "The payment provider rejected the request.",
+                "details": chapa_error_details,
+            },
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    except httpx.TimeoutException:
+        logger.error("Chapa request timed out for order %s", order.id)
+        return JsonResponse(
+            {"error": "Payment service timed out. Please try again later."},
+            status=status.HTTP_504_GATEWAY_TIMEOUT,
+        )
+    except httpx.HTTPError as e:
+        logger.exception(
+            "Failed to initialize payment for order %s: %s", order.id, str(e)
+        )
+        return JsonResponse(
+            {"error": "Failed to connect to the payment provider."},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+
+    if response_data.get("status") == "success":
+        await Payment.objects.acreate(
+            order=order,
+            transaction_ref=tx_ref,
+            amount=order.total_price,
+            status=Status.pending,
+            **checkout_fields(response_data["data"]),
+        )
+        return JsonResponse(response_data["data"], status=status.HTTP_200_OK)
+
+    logger.warning(
+        "Payment initialization failed for order %s: %s", order.id, response_data
+    )
+    return JsonResponse(
+        {
+            "error": "Failed to initialize payment.",
+            "details": response_data.get("message", "Unknown error."),
+        },
+        status=status.HTTP_400_BAD_REQUEST,
+    )
+
+
+@csrf_exempt
+@require_POST
+async def payment_webhook(request):
+    """Async PaymentWebhookView.post."""
+    try:
+        event_data, tx_ref = read_event(request.headers, request.body)
+    except WebhookRejected as e:
+        return JsonResponse({"error": e.message}, status=e.status_code)
+
+    await sync_to_async(store_event)(tx_ref, event_data)
+    return HttpResponse(status=status.HTTP_200_OK)
@@ -0,0 +1,384 @@
+import asyncio
+import functools
+import threading
+import time
+import uuid
+import weakref
+from collections import deque
+from datetime import timedelta
+
+import httpx
+import requests
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .resilience import Bulkhead, CircuitBreaker, guarded
+
+# Statuses worth retrying an idempotent call on
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Latencies kept per operation for the percentiles in GatewayMetrics
+LATENCY_SAMPLES = 1000
+
+
+def new_tx_ref(order):
+    """A unique transaction reference for a payment of `order`."""
+    return f"nexus-{order.id}-{uuid.uuid4().hex}"
+
+
+def initialize_payload(order, user, tx_ref):
+    """The `transaction/initialize` request body for paying `order`."""
+    return {
+        "amount": str(order.total_price),  # Ensure amount is a string
+        "currency": "ETB",
+        "email": user.email,
+        "first_name": user.first_name if user.first_name else "Customer",
+        "last_name": user.last_name if user.last_name else "Name",
+        "tx_ref": tx_ref,
+        "callback_url": settings.BACKEND_CALLBACK_URL,
+        "return_url": settings.FRONTEND_RETURN_URL,
+        "customization": {
+            "title": f"Shop Order {order.id}",  # Short, no special characters
+            "description": f"Payment for order {order.id}",  # Simple, no special characters
+        },
+    }
+
+
+def checkout_fields(data):
+    """
+    The Payment fields for the checkout in the `data` of an initialize
+    response. A checkout_url is handed out again for
+    CHAPA_CHECKOUT_TTL_MINUTES; without one there is nothing to reuse.
+    """
+    checkout_url = data.get("checkout_url", "")
+    if not checkout_url:
+        return {"checkout_url": "", "checkout_expires_at": None}
+    ttl = timedelta(minutes=settings.CHAPA_CHECKOUT_TTL_MINUTES)
+    return {"checkout_url": checkout_url, "checkout_expires_at": timezone.now() + ttl}
+
+
+class GatewayMetrics:
+    """
+    In-process call counters and latencies per gateway operation. Each
+    worker process keeps its own; they reset on restart.
+    """
+
+    def __init__(self, samples=LATENCY_SAMPLES):
+        self.samples = samples
+        self._lock = threading.Lock()
+        self._operations = {}
+
+    def record(self, operation, seconds, error=False, retries=0):
+        with self._lock:
+            stats = self._operations.setdefault(
+                operation,
+                {
+                    "calls": 0,
+                    "errors": 0,
+                    "retries": 0,
+                    "total_seconds": 0.0,
+                    "max_seconds": 0.0,
+                    "latencies": deque(maxlen=self.samples),
+                },
+            )
+            stats["calls"] += 1
+            stats["errors"] += int(error)
+            stats["retries"] += retries
+            stats["total_seconds"] += seconds
+            stats["max_seconds"] = max(stats["max_seconds"], seconds)
+            stats["latencies"].append(seconds)
+
+    def snapshot(self):
+        with self._lock:
+            operations = {
+                name: {**stats, "latencies": sorted(stats["latencies"])}
+                for name, stats in self._operations.items()
+            }
+
+        report = {}
+        for name, stats in operations.items():
+            latencies = stats.pop("latencies")
+            report[name] = {
+                **stats,
+                "mean_seconds": stats["total_seconds"] / stats["calls"],
+                "p50_seconds": _percentile(latencies, 50),
+                "p95_seconds": _percentile(latencies, 95),
+                "p99_seconds": _percentile(latencies, 99),
+            }
+        return report
+
+
+def _percentile(ordered, percent):
+    index = max(0, -(-len(ordered) * percent // 100) - 1)  # Nearest rank
+    return ordered[index]
+
+
+class ChapaClient:
+    """
+    A thin client for the Chapa API over one keep-alive session.
+
+    Connections to Chapa are pooled and reused across requests instead of
+    paying a TCP and TLS handshake per call. Every call has a connect and a
+    read timeout. GET calls (verify) are retried on connection errors and
+    on 429/5xx responses with exponential backoff; POST calls are never
+    retried once sent, since the gateway may have acted on them. Calls go
+    through a Bulkhead and a CircuitBreaker (see payment.resilience), which
+    refuse them with GatewayUnavailable while Chapa is struggling.
+
+    Calls return the decoded JSON body and raise the usual
+    `requests.exceptions` (HTTPError for 4xx/5xx, Timeout, ...).
+    """
+
+    def __init__(
+        self,
+        base_url,
+        secret_key,
+        pool_size=10,
+        connect_timeout=3.05,
+        read_timeout=10,
+        verify_retries=3,
+        retry_backoff=0.2,
+        bulkhead=None,
+        breaker=None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.metrics = GatewayMetrics()
+        self.bulkhead = bulkhead or Bulkhead(pool_size)
+        self.breaker = breaker or CircuitBreaker()
+
+        retry = Retry(
+            total=verify_retries,
+            backoff_factor=retry_backoff,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset({"GET"}),
+            raise_on_status=False,
+            respect_retry_after_header=True,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=pool_size, max_retries=retry
+        )
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers["Authorization"] = f"Bearer {secret_key}"
+
+    def initialize(self, payload):
+        """Starts a hosted checkout; see the `transaction/initialize` API."""
+        return self._request(
+            "initialize", "POST", "/transaction/initialize", json=payload
+        )
+
+    def verify(self, tx_ref):
+        """Fetches the authoritative status of a transaction."""
+        return self._request("verify", "GET", f"/transaction/verify/{tx_ref}")
+
+    def _request(self, operation, method, path, **kwargs):
+        with guarded(self.breaker, self.bulkhead):
+            started = time.perf_counter()
+            error, retries = True, 0
+            try:
+                response = self.session.request(
+                    method, self.base_url + path, timeout=self.timeout, **kwargs
+                )
+                retries = _retry_count(response)
+                response.raise_for_status()
+                data = response.json()
+                error = False
+                return data
+            finally:
+                self.metrics.record(
+                    operation,
+                    time.perf_counter() - started,
+                    error=error,
+                    retries=retries,
+                )
+
+
+def _retry_count(response):
+    retries = getattr(response.raw, "retries", None)
+    return len(retries.history) if retries is not None else 0
+
+
+@functools.cache
+def get_client():
+    """The process-wide ChapaClient, built from the CHAPA_* settings."""
+    return _build_client(settings.CHAPA_POOL_SIZE, settings.CHAPA_MAX_IN_FLIGHT)
+
+
+@functools.cache
+def get_worker_client(workers):
+    """
+    The ChapaClient of a worker command that makes up to `workers`
+    concurrent calls (process_webhooks, reconcile_payments). Its pool and
+    bulkhead are sized to the command's thread pool, so CHAPA_MAX_IN_FLIGHT,
+    which guards the web workers, never refuses its calls outright; the
+    circuit breaker is still the process's.
+    """
+    return _build_client(max(settings.CHAPA_POOL_SIZE, workers), workers)
+
+
+def _build_client(pool_size, max_in_flight):
+    return ChapaClient(
+        base_url=settings.CHAPA_BASE_URL,
+        secret_key=settings.CHAPA_SECRET_KEY,
+        pool_size=pool_size,
+        connect_timeout=settings.CHAPA_CONNECT_TIMEOUT,
+        read_timeout=settings.CHAPA_READ_TIMEOUT,
+        verify_retries=settings.CHAPA_VERIFY_RETRIES,
+        retry_backoff=settings.CHAPA_RETRY_BACKOFF,
+        bulkhead=Bulkhead(max_in_flight),
+        breaker=get_breaker(),
+    )
+
+
+@functools.cache
+def get_breaker():
+    """
+    The process-wide CircuitBreaker for Chapa, shared by the sync and async
+    clients, built from the CHAPA_BREAKER_* settings.
+    """
+    return CircuitBreaker(
+        error_rate=settings.CHAPA_BREAKER_ERROR_RATE,
+        min_calls=settings.CHAPA_BREAKER_MIN_CALLS,
+        window_seconds=settings.CHAPA_BREAKER_WINDOW_SECONDS,
+        reset_seconds=settings.CHAPA_BREAKER_RESET_SECONDS,
+    )
+
+
+@functools.cache
+def get_async_bulkhead():
+    """The Bulkhead shared by the per-loop async clients."""
+    return Bulkhead(settings.CHAPA_ASYNC_MAX_IN_FLIGHT)
+
+
+class AsyncChapaClient:
+    """
+    The asyncio counterpart of ChapaClient, used by the async payment views.
+
+    Same timeouts, retry policy and guards, over one pooled
+    httpx.AsyncClient, so a call waiting on Chapa suspends a coroutine
+    instead of holding a worker thread. A call that cannot get a pooled
+    connection within the read timeout fails with httpx.PoolTimeout.
+
+    Calls return the decoded JSON body and raise the usual `httpx`
+    exceptions (HTTPStatusError for 4xx/5xx, TimeoutException, ...).
+    """
+
+    def __init__(
+        self,
+        base_url,
+        secret_key,
+        pool_size=100,
+        connect_timeout=3.05,
+        read_timeout=10,
+        verify_retries=3,
+        retry_backoff=0.2,
+        metrics=None,
+        bulkhead=None,
+        breaker=None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.verify_retries = verify_retries
+        self.retry_backoff = retry_backoff
+        self.metrics = metrics or GatewayMetrics()
+        self.bulkhead = bulkhead or Bulkhead(pool_size)
+        self.breaker = breaker or CircuitBreaker()
+        self.http = httpx.AsyncClient(
+            headers={"Authorization": f"Bearer {secret_key}"},
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(
+                max_connections=pool_size, max_keepalive_connections=pool_size
+            ),
+        )
+
+    async def initialize(self, payload):
+        """Starts a hosted checkout; see the `transaction/initialize` API."""
+        return await self._request(
+            "initialize", "POST", "/transaction/initialize", json=payload
+        )
+
+    async def verify(self, tx_ref):
+        """Fetches the authoritative status of a transaction."""
+        return await self._request(
+            "verify",
+            "GET",
+            f"/transaction/verify/{tx_ref}",
+            retries=self.verify_retries,
+        )
+
+    async def _request(self, operation, method, path, retries=0, **kwargs):
+        with guarded(self.breaker, self.bulkhead):
+            started = time.perf_counter()
+            error, attempt = True, 0
+            try:
+                while True:
+                    try:
+                        response = await self.http.request(
+                            method, self.base_url + path, **kwargs
+                        )
+                    except httpx.TransportError:
+                        if attempt >= retries:
+                            raise
+                    else:
+                        if (
+                            response.status_code not in RETRY_STATUSES
+                            or attempt >= retries
+                        ):
+                            break
+                    attempt += 1
+                    await asyncio.sleep(self.retry_backoff * 2 ** (attempt - 1))
+                response.raise_for_status()
+                data = response.json()
+                error = False
+                return data
+            finally:
+                self.metrics.record(
+                    operation,
+                    time.perf_counter() - started,
+                    error=error,
+                    retries=attempt,
+                )
+
+
+# Shared by the per-loop async clients so the metrics view sees one series
+async_metrics = GatewayMetrics()
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client():
+    """
+    The AsyncChapaClient for the running event loop, built from the CHAPA_*
+    settings. httpx connections belong to the loop that opened them, so
+    each loop gets its own client (under uvicorn there is one per process).
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = AsyncChapaClient(
+            base_url=settings.CHAPA_BASE_URL,
+            secret_key=settings.CHAPA_SECRET_KEY,
+            pool_size=settings.CHAPA_ASYNC_POOL_SIZE,
+            connect_timeout=settings.CHAPA_CONNECT_TIMEOUT,
+            read_timeout=settings.CHAPA_READ_TIMEOUT,
+            verify_retries=settings.CHAPA_VERIFY_RETRIES,
+            retry_backoff=settings.CHAPA_RETRY_BACKOFF,
+            metrics=async_metrics,
+            bulkhead=get_async_bulkhead(),
+            breaker=get_breaker(),
+        )
+    return client
+
+
+@receiver(setting_changed)
+def reset_client(setting, **kwargs):
+    # Rebuild the clients when tests override a CHAPA_* setting.
+    if setting.startswith("CHAPA_"):
+        get_client.cache_clear()
+        get_worker_client.cache_clear()
+        get_breaker.cache_clear()
+        get_async_bulkhead.cache_clear()
+        _async_clients.clear()
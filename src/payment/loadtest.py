@@ -0,0 +1,216 @@
+"""
+Drives the order -> initialize -> webhook flow against a running server at
+a fixed concurrency and measures it (see the loadtest_payments command).
+Point the server's CHAPA_BASE_URL at payment.simulator first.
+"""
+
+import json
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from shop.models import Category, OrderStatus, Product
+
+from .chapa import GatewayMetrics
+from .simulator import sign, tx_ref_from_checkout_url
+
+User = get_user_model()
+
+FLOW_STEPS = ("cart", "order", "initialize", "webhook")
+# How long a flow waits for an async checkout to leave the queue
+QUEUED_ORDER_TIMEOUT_SECONDS = 30
+
+
+def create_fixtures(users, products):
+    """
+    Creates (or tops up) the load-test shoppers and products in the local
+    database. Returns an access token per shopper and the product ids.
+    """
+    category, _ = Category.objects.get_or_create(
+        name="Load test", defaults={"description": "Load test products"}
+    )
+    product_ids = []
+    for i in range(products):
+        product, _ = Product.objects.update_or_create(
+            name=f"Load test product {i}",
+            category=category,
+            defaults={"price": "10.00", "stock": 1_000_000},
+        )
+        product_ids.append(product.id)
+
+    tokens = []
+    for i in range(users):
+        email = f"loadtest-{i}@example.com"
+        user = User.objects.filter(email=email).first()
+        if user is None:
+            user = User.objects.create_user(email=email)
+        tokens.append(str(RefreshToken.for_user(user).access_token))
+    return tokens, product_ids
+
+
+class FlowFailed(Exception):
+    pass
+
+
+class PaymentLoadTest:
+    """
+    Runs `flows` checkout-and-pay flows with `concurrency` shoppers in
+    parallel, each on its own keep-alive session, and records per-step
+    latencies. The webhook is posted by the harness itself, signed with
+    `webhook_secret`, so its latency is measured too.
+    """
+
+    def __init__(self, base_url, tokens, product_ids, webhook_secret, timeout=30):
+        self.base_url = base_url.rstrip("/")
+        self.tokens = tokens
+        self.product_ids = product_ids
+        self.webhook_secret = webhook_secret
+        self.timeout = timeout
+        # Keep every sample: the percentiles cover the whole run
+        self.metrics = GatewayMetrics(samples=None)
+        self.responses = defaultdict(Counter)
+        self.completed = 0
+        self.elapsed = 0.0
+        self._lock = threading.Lock()
+
+    def run(self, flows, concurrency):
+        remaining = iter(range(flows))
+
+        def claim():
+            with self._lock:
+                return next(remaining, None) is not None
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            shoppers = [
+                pool.submit(self.shopper, self.tokens[i % len(self.tokens)], claim)
+                for i in range(concurrency)
+            ]
+        self.elapsed = time.perf_counter() - started
+        for shopper in shoppers:
+            shopper.result()  # Re-raise anything other than a failed step
+
+    def shopper(self, token, claim):
+        with requests.Session() as session:
+            session.headers["Authorization"] = f"Bearer {token}"
+            while claim():
+                started = time.perf_counter()
+                try:
+                    self.flow(session)
+                    failed = False
+                except FlowFailed:
+                    failed = True
+                self.metrics.record("flow", time.perf_counter() - started, error=failed)
+                if not failed:
+                    with self._lock:
+                        self.completed += 1
+
+    def flow(self, session):
+        product_id = random.choice(self.product_ids)
+        self.step(
+            session,
+            "cart",
+            "/api/v1/shop/cart-items/",
+            json={"product_id": product_id, "quantity": 1},
+        )
+        order = self.step(session, "order", "/api/v1/shop/orders/", json={})
+        if order["status"] == OrderStatus.queued:
+            self.wait_for_checkout(session, order["id"])
+        checkout = self.step(
+            session,
+            "initialize",
+            "/api/v1/payments/initialize/",
+            json={"order_id": order["id"]},
+        )
+
+        tx_ref = tx_ref_from_checkout_url(checkout["checkout_url"])
+        body = json.dumps(
+            {"tx_ref": tx_ref, "status": "success"}, separators=(",", ":")
+        ).encode()
+        self.step(
+            session,
+            "webhook",
+            "/api/v1/payments/webhook/",
+            data=body,
+            headers={
+                "Authorization": None,  # Chapa's servers have no token
+                "Content-Type": "application/json",
+                "Chapa-Signature": sign(body, self.webhook_secret),
+            },
+        )
+
+    def step(self, session, name, path, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = session.post(
+                self.base_url + path, timeout=self.timeout, **kwargs
+            )
+        except requests.exceptions.RequestException as e:
+            self.record(name, started, type(e).__name__)
+            raise FlowFailed(name)
+        self.record(name, started, response.status_code)
+        if response.status_code >= 300:
+            raise FlowFailed(name)
+        return response.json() if response.content else None
+
+    def record(self, name, started, outcome):
+        self.metrics.record(
+            name,
+            time.perf_counter() - started,
+            error=not (isinstance(outcome, int) and outcome < 300),
+        )
+        with self._lock:
+            self.responses[name][str(outcome)] += 1
+
+    def wait_for_checkout(self, session, order_id):
+        deadline = time.monotonic() + QUEUED_ORDER_TIMEOUT_SECONDS
+        while time.monotonic() < deadline:
+            response = session.get(
+                f"{self.base_url}/api/v1/shop/orders/{order_id}/status/",
+                timeout=self.timeout,
+            )
+            if response.ok and response.json()["status"] != OrderStatus.queued:
+                return
+            time.sleep(0.1)
+        raise FlowFailed("order")
+
+    def report(self, server_workers=None):
+        """
+        The run's figures. `in_flight` is the mean number of requests the
+        server was working on, by Little's law (throughput x mean latency,
+        summed over the steps). Given the server's `server_workers`
+        (processes x threads), `utilization` is the share of them that was
+        busy, and `capacity_flows_per_second` the flow rate they can
+        sustain at the measured latencies.
+        """
+        steps = self.metrics.snapshot()
+        elapsed = self.elapsed or 1e-9
+        busy_seconds = sum(
+            steps[name]["total_seconds"] for name in FLOW_STEPS if name in steps
+        )
+        flow_seconds = sum(
+            steps[name]["mean_seconds"] for name in FLOW_STEPS if name in steps
+        )
+        report = {
+            "flows": steps.get("flow", {}).get("calls", 0),
+            "completed": self.completed,
+            "elapsed_seconds": self.elapsed,
+            "flows_per_second": self.completed / elapsed,
+            "steps": steps,
+            "responses": {
+                name: dict(counts) for name, counts in self.responses.items()
+            },
+            "in_flight": busy_seconds / elapsed,
+        }
+        if server_workers:
+            report["utilization"] = report["in_flight"] / server_workers
+            report["capacity_flows_per_second"] = (
+                server_workers / flow_seconds if flow_seconds else None
+            )
+        return report
@@ -0,0 +1,124 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from payment.loadtest import FLOW_STEPS, PaymentLoadTest, create_fixtures
+
+# Utilization above which requests mostly wait for a free worker
+SATURATION_THRESHOLD = 0.8
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-tests the order -> payment initialize -> webhook flow of a running "
+        "server and reports latency percentiles and worker saturation. Run the "
+        "server against run_chapa_simulator, never the real gateway."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--base-url",
+            default="http://localhost:8000",
+            help="The server under test (default: http://localhost:8000).",
+        )
+        parser.add_argument(
+            "--flows",
+            type=int,
+            default=200,
+            help="Flows to run in total (default: 200).",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=20,
+            help="Shoppers running flows at the same time (default: 20).",
+        )
+        parser.add_argument(
+            "--products",
+            type=int,
+            default=10,
+            help="Products the shoppers pick from, at random (default: 10).",
+        )
+        parser.add_argument(
+            "--server-workers",
+            type=int,
+            help=(
+                "Requests the server can serve at once (processes x threads), "
+                "to report their utilization."
+            ),
+        )
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=30.0,
+            help="Client timeout per request, in seconds (default: 30).",
+        )
+        parser.add_argument(
+            "--json", action="store_true", help="Print the raw report as JSON."
+        )
+
+    def handle(self, *args, **options):
+        if options["flows"] < 1 or options["concurrency"] < 1:
+            raise CommandError("--flows and --concurrency must be at least 1.")
+
+        # One shopper per concurrent flow, so no two flows share a cart.
+        tokens, product_ids = create_fixtures(
+            options["concurrency"], max(options["products"], 1)
+        )
+        load = PaymentLoadTest(
+            options["base_url"],
+            tokens,
+            product_ids,
+            settings.CHAPA_WEBHOOK_SECRET,
+            timeout=options["timeout"],
+        )
+        load.run(options["flows"], options["concurrency"])
+        report = load.report(server_workers=options["server_workers"])
+
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        self.write_report(report, options["server_workers"])
+
+    def write_report(self, report, server_workers):
+        self.stdout.write(
+            f"{'step':<12}{'calls':>7}{'errors':>8}"
+            f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+        )
+        percentiles = ("p50_seconds", "p95_seconds", "p99_seconds", "max_seconds")
+        for name in FLOW_STEPS + ("flow",):
+            stats = report["steps"].get(name)
+            if stats is None:
+                continue
+            self.stdout.write(
+                f"{name:<12}{stats['calls']:>7}{stats['errors']:>8}"
+                + "".join(f"{stats[key] * 1000:>9.0f}" for key in percentiles)
+            )
+        for name, counts in report["responses"].items():
+            outcomes = ", ".join(f"{k}: {n}" for k, n in sorted(counts.items()))
+            self.stdout.write(f"{name} responses: {outcomes}")
+
+        self.stdout.write(
+            f"In flight at the server: {report['in_flight']:.1f} requests on average"
+        )
+        if server_workers:
+            self.stdout.write(
+                f"Worker utilization: {report['utilization']:.0%} of {server_workers}; "
+                f"capacity about {report['capacity_flows_per_second']:.1f} flows/s"
+            )
+            if report["utilization"] > SATURATION_THRESHOLD:
+                self.stdout.write(
+                    self.style.WARNING(
+                        "Workers are saturated: latency is mostly queueing. Add "
+                        "workers or serve payments with the async views."
+                    )
+                )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Completed {report['completed']} of {report['flows']} flows in "
+                f"{report['elapsed_seconds']:.1f}s "
+                f"({report['flows_per_second']:.1f} flows/s)."
+            )
+        )
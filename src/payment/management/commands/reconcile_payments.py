@@ -0,0 +1,113 @@
+import json
+import os
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from payment.reconcile import reconcile_batch, stale_payments
+
+
+class Command(BaseCommand):
+    help = (
+        "Verifies payments left pending (e.g. their webhook was lost) with "
+        "Chapa and applies the outcomes, in batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than",
+            type=int,
+            default=60,
+            help="Only payments pending for at least this many minutes (default: 60).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Payments verified and updated per round (default: 100).",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=8,
+            help="Concurrent verification calls to Chapa (default: 8).",
+        )
+        parser.add_argument(
+            "--state-file",
+            help=(
+                "Where to keep the run's progress. An interrupted run started "
+                "again with the same file resumes after the last finished batch; "
+                "the file is removed once the run completes."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1 or options["workers"] < 1:
+            raise CommandError("--batch-size and --workers must be at least 1.")
+
+        state_file = options["state_file"]
+        state = self.load_state(state_file)
+        if state is not None:
+            cutoff = datetime.fromisoformat(state["cutoff"])
+            cursor = (datetime.fromisoformat(state["created_at"]), state["id"])
+            self.stdout.write(f"Resuming after payment {cursor[1]}.")
+        else:
+            cutoff = timezone.now() - timedelta(minutes=options["older_than"])
+            cursor = None
+
+        totals = Counter()
+        started = time.perf_counter()
+        try:
+            while True:
+                batch = stale_payments(cutoff, cursor, options["batch_size"])
+                if not batch:
+                    break
+                batch_started = time.perf_counter()
+                totals.update(reconcile_batch(batch, options["workers"]))
+                cursor = (batch[-1].created_at, batch[-1].id)
+                self.save_state(state_file, cutoff, cursor)
+
+                elapsed = time.perf_counter() - batch_started
+                self.stdout.write(
+                    f"Verified {len(batch)} payments in {elapsed:.2f}s "
+                    f"({len(batch) / elapsed:.1f}/s)"
+                )
+        finally:
+            connection.close()
+
+        if state_file and os.path.exists(state_file):
+            os.remove(state_file)
+
+        verified = sum(totals.values())
+        elapsed = time.perf_counter() - started
+        rate = verified / elapsed if elapsed else 0
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Reconciled {verified} payments in {elapsed:.2f}s ({rate:.1f}/s): "
+                f"{totals['success']} succeeded, {totals['failed']} failed, "
+                f"{totals['pending']} still pending, {totals['error']} errors."
+            )
+        )
+
+    def load_state(self, state_file):
+        if not state_file or not os.path.exists(state_file):
+            return None
+        with open(state_file) as f:
+            return json.load(f)
+
+    def save_state(self, state_file, cutoff, cursor):
+        if not state_file:
+            return
+        state = {
+            "cutoff": cutoff.isoformat(),
+            "created_at": cursor[0].isoformat(),
+            "id": cursor[1],
+        }
+        # Write then rename, so an interruption never leaves a torn file.
+        with open(f"{state_file}.tmp", "w") as f:
+            json.dump(state, f)
+        os.replace(f"{state_file}.tmp", state_file)
@@ -0,0 +1,83 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from payment.simulator import ChapaSimulator
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs a local Chapa stand-in (initialize, verify and signed webhooks) "
+        "with injected latency, errors and timeouts, for load tests."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument(
+            "--latency",
+            type=float,
+            default=0.2,
+            help="Seconds every call takes (default: 0.2).",
+        )
+        parser.add_argument(
+            "--jitter",
+            type=float,
+            default=0.0,
+            help="Up to this many extra seconds per call, at random (default: 0).",
+        )
+        parser.add_argument(
+            "--error-rate",
+            type=float,
+            default=0.0,
+            help="Share of calls answered with a 500 (default: 0).",
+        )
+        parser.add_argument(
+            "--timeout-rate",
+            type=float,
+            default=0.0,
+            help="Share of calls that hang for --hang-seconds (default: 0).",
+        )
+        parser.add_argument(
+            "--hang-seconds",
+            type=float,
+            default=30.0,
+            help="How long a hung call takes to answer (default: 30).",
+        )
+        parser.add_argument(
+            "--webhook-delay",
+            type=float,
+            help=(
+                "Send a signed webhook to each transaction's callback_url this "
+                "many seconds after initialize (default: no webhooks)."
+            ),
+        )
+        parser.add_argument("--seed", type=int, help="Seed for the fault injection.")
+
+    def handle(self, *args, **options):
+        server = ChapaSimulator(
+            (options["host"], options["port"]),
+            latency=options["latency"],
+            jitter=options["jitter"],
+            error_rate=options["error_rate"],
+            timeout_rate=options["timeout_rate"],
+            hang_seconds=options["hang_seconds"],
+            webhook_delay=options["webhook_delay"],
+            webhook_secret=settings.CHAPA_WEBHOOK_SECRET,
+            seed=options["seed"],
+        )
+        self.stdout.write(
+            f"Chapa simulator listening; set CHAPA_BASE_URL={server.base_url}"
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Initialized {len(server.transactions)} transactions, "
+                f"sent {server.webhooks_sent} webhooks."
+            )
+        )
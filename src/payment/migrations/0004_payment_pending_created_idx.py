@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 06:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment', '0003_webhookevent'),
+        ('shop', '0012_order_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['created_at', 'id'], name='payment_pending_created_idx'),
+        ),
+    ]
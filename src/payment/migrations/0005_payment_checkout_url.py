@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-18 06:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment', '0004_payment_pending_created_idx'),
+        ('shop', '0012_order_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='checkout_expires_at',
+            field=models.DateTimeField(blank=True, help_text='Until when `checkout_url` is handed out again to repeat initializations of the order (see CHAPA_CHECKOUT_TTL_MINUTES).', null=True),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='checkout_url',
+            field=models.URLField(blank=True, default='', max_length=500),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['order', 'checkout_expires_at'], name='payment_open_checkout_idx'),
+        ),
+    ]
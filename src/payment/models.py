@@ -1,9 +1,63 @@
-from django.db import models
+from django.db import models, router
+from django.utils import timezone
 from shop.models import Order, Status
 
 # Create your models here.
 
 
+class PaymentManager(models.Manager):
+    def open_checkout(self, order_id, user):
+        """
+        The pending payment of `user`'s order whose checkout_url has not
+        expired yet, or None. One query on payment_open_checkout_idx.
+        """
+        return (
+            self.filter(
+                order_id=order_id,
+                order__user=user,
+                order__status=Status.pending,
+                status=Status.pending,
+                checkout_expires_at__gt=timezone.now(),
+            )
+            .only("checkout_url")
+            .order_by("-checkout_expires_at")
+            .first()
+        )
+
+    def mark_succeeded(self, transaction_ref):
+        """
+        Moves a pending payment to `success` with one guarded
+        `UPDATE ... WHERE status = 'pending' RETURNING order_id`.
+
+        Returns the payment's order id, or None if there is no such payment
+        or it was already settled, which makes repeat deliveries a no-op.
+        """
+        payments = self.settle([transaction_ref], Status.success)
+        return payments[0].order_id if payments else None
+
+    def settle(self, transaction_refs, status):
+        """
+        Moves the payments among `transaction_refs` that are still pending
+        to `status` in one guarded UPDATE.
+
+        Returns the payments this call moved (only `id` and `order_id`
+        loaded); the others were unknown or already settled.
+        """
+        if not transaction_refs:
+            return []
+
+        table = self.model._meta.db_table
+        placeholders = ", ".join(["%s"] * len(transaction_refs))
+        sql = f"""
+            UPDATE {table}
+            SET status = %s, updated_at = %s
+            WHERE transaction_ref IN ({placeholders}) AND status = %s
+            RETURNING id, order_id
+        """
+        params = [status, timezone.now(), *transaction_refs, Status.pending]
+        return list(self.raw(sql, params, using=router.db_for_write(self.model)))
+
+
 class Payment(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="payments")
     transaction_ref = models.CharField(max_length=255, unique=True)
@@ -13,8 +67,74 @@ class Payment(models.Model):
         choices=Status.choices,
         default=Status.pending,
     )
+    checkout_url = models.URLField(max_length=500, blank=True, default="")
+    checkout_expires_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Until when `checkout_url` is handed out again to repeat "
+        "initializations of the order (see CHAPA_CHECKOUT_TTL_MINUTES).",
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = PaymentManager()
+
+    class Meta:
+        indexes = [
+            # Reconciliation scans the payments still waiting, oldest first
+            models.Index(
+                fields=["created_at", "id"],
+                name="payment_pending_created_idx",
+                condition=models.Q(status="pending"),
+            ),
+            # Repeat initializations look up the order's open checkout
+            models.Index(
+                fields=["order", "checkout_expires_at"],
+                name="payment_open_checkout_idx",
+                condition=models.Q(status="pending"),
+            ),
+        ]
+
+    def __str__(self):
+        return f"Payment {self.transaction_ref} for Order {self.order_id}"
+
+
+class WebhookEvent(models.Model):
+    """
+    Inbox of signed Chapa webhooks, one per transaction. The webhook view
+    only stores the event; the process_webhooks workers verify it with
+    Chapa and apply the payment outcome (see payment.webhooks).
+    """
+
+    class EventStatus(models.TextChoices):
+        pending = "pending", "pending"
+        done = "done", "done"
+        failed = "failed", "failed"
+
+    tx_ref = models.CharField(max_length=255, unique=True)
+    payload = models.JSONField()
+    status = models.CharField(
+        max_length=20, choices=EventStatus.choices, default=EventStatus.pending
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True, default="")
+    next_attempt_at = models.DateTimeField(
+        default=timezone.now,
+        help_text="When a worker may pick the event up (again). Claiming an "
+        "event pushes this out by a lease, so a crashed worker's events return.",
+    )
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The workers' queue: only events still waiting are indexed
+            models.Index(
+                fields=["next_attempt_at"],
+                name="payment_webhook_pending_idx",
+                condition=models.Q(status="pending"),
+            ),
+        ]
+
     def __str__(self):
-        return f"Payment {self.chapa_tx_ref} for Order {self.order.id}"
+        return f"Webhook {self.tx_ref} ({self.status})"
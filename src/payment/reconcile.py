@@ -0,0 +1,105 @@
+import functools
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.db import transaction
+from django.db.models import Q
+
+from shop.models import Order, Status
+
+from .chapa import get_worker_client
+from .models import Payment
+from .resilience import GatewayUnavailable
+from .webhooks import record_paid_order
+
+logger = logging.getLogger(__name__)
+
+
+def stale_payments(cutoff, cursor, batch_size):
+    """
+    The next `batch_size` payments created before `cutoff` that are still
+    pending, oldest first, after `cursor` (the (created_at, id) of the last
+    payment already handled, or None to start over).
+
+    Keyset pagination on the `payment_pending_created_idx` partial index:
+    each batch is an index range scan, however many settled payments the
+    table holds, and payments Chapa still reports as pending are not
+    picked up again in the same run.
+    """
+    payments = Payment.objects.filter(status=Status.pending, created_at__lt=cutoff)
+    if cursor is not None:
+        created_at, pk = cursor
+        payments = payments.filter(
+            Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+        )
+    return list(
+        payments.order_by("created_at", "id").only(
+            "id", "transaction_ref", "created_at"
+        )[:batch_size]
+    )
+
+
+def reconcile_batch(payments, workers):
+    """
+    Verifies `payments` with Chapa using up to `workers` concurrent calls
+    and applies the outcomes: one UPDATE for the payments that succeeded
+    (and one for their orders), one for those that failed.
+
+    Returns a Counter of outcomes: `success`, `failed`, `pending` (Chapa
+    has no final status yet) and `error` (the verify call failed; the
+    payment stays pending for a later run).
+    """
+    # Only the HTTP calls run in the pool; the database work stays on this
+    # thread and its connection.
+    verify = functools.partial(_verify, get_worker_client(workers))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        outcomes = list(pool.map(verify, [p.transaction_ref for p in payments]))
+
+    counts = Counter()
+    refs = {Status.success: [], Status.failed: []}
+    for payment, (verification_data, error) in zip(payments, outcomes):
+        if error is not None:
+            logger.error(
+                "Failed to verify transaction %s with Chapa: %s",
+                payment.transaction_ref,
+                error,
+            )
+            counts["error"] += 1
+            continue
+        outcome = _outcome(verification_data)
+        counts[outcome] += 1
+        if outcome in refs:
+            refs[outcome].append(payment.transaction_ref)
+
+    with transaction.atomic():
+        paid = Payment.objects.settle(refs[Status.success], Status.success)
+        order_ids = [payment.order_id for payment in paid]
+        orders = Order.objects.mark_paid_many(order_ids)
+        for order in orders:
+            record_paid_order(order)
+        if len(orders) < len(order_ids):
+            skipped = set(order_ids) - {order.id for order in orders}
+            logger.warning(
+                "Payments succeeded for orders that were not pending: %s",
+                sorted(skipped),
+            )
+        Payment.objects.settle(refs[Status.failed], Status.failed)
+    return counts
+
+
+def _verify(client, tx_ref):
+    try:
+        return client.verify(tx_ref), None
+    except (requests.exceptions.RequestException, GatewayUnavailable) as e:
+        return None, e
+
+
+def _outcome(verification_data):
+    if verification_data.get("status") != "success":
+        return "pending"
+    transaction_status = (verification_data.get("data") or {}).get("status")
+    if transaction_status in (Status.success, Status.failed):
+        return transaction_status
+    return "pending"
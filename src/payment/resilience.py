@@ -0,0 +1,208 @@
+"""
+Keeps a degraded Chapa from taking the rest of the API down with it.
+
+Every gateway call passes a per-process Bulkhead, which caps how many
+calls may be waiting on Chapa at once, and the process's CircuitBreaker,
+which stops calling Chapa for a while once too many recent calls failed.
+Both refuse a call with GatewayUnavailable (503 with Retry-After) instead
+of letting it tie up a worker until it times out.
+"""
+
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class GatewayUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "The payment provider is unavailable. Please try again later."
+    default_code = "gateway_unavailable"
+
+    def __init__(self, detail=None, wait=1):
+        super().__init__(detail)
+        self.wait = wait  # Sent as Retry-After by DRF's exception handler
+
+
+def is_gateway_failure(error):
+    """
+    Whether a failed call counts against Chapa's health: timeouts,
+    connection errors, 429 and 5xx do; a 4xx about our own request does not.
+    Works for both `requests` and `httpx` errors.
+    """
+    response = getattr(error, "response", None)
+    status_code = getattr(response, "status_code", None)
+    if status_code is None:
+        return True
+    return status_code == 429 or status_code >= 500
+
+
+class Bulkhead:
+    """Admits at most `limit` concurrent calls; the rest are refused at once."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.in_flight = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self.in_flight >= self.limit:
+                self.rejected += 1
+                raise GatewayUnavailable(
+                    "Too many payments are in progress. Please try again shortly."
+                )
+            self.in_flight += 1
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "in_flight": self.in_flight,
+                "rejected": self.rejected,
+            }
+
+
+class CircuitBreaker:
+    """
+    Closed: calls go through, and their outcomes over the last
+    `window_seconds` are tracked. Once at least `min_calls` were made and
+    the share that failed reaches `error_rate`, the breaker opens.
+
+    Open: calls are refused for `reset_seconds`. After that it is half open
+    and lets a single trial call through; its success closes the breaker,
+    its failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        error_rate=0.5,
+        min_calls=10,
+        window_seconds=30,
+        reset_seconds=30,
+        clock=time.monotonic,
+    ):
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self.state = self.CLOSED
+        self.opened_at = None
+        self.trips = 0
+        self.rejected = 0
+        self._outcomes = deque()  # (time, failed)
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raises GatewayUnavailable unless a call may go through now."""
+        with self._lock:
+            if self.state == self.OPEN:
+                remaining = self.opened_at + self.reset_seconds - self.clock()
+                if remaining > 0:
+                    self.rejected += 1
+                    raise GatewayUnavailable(wait=math.ceil(remaining))
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN:
+                if self._probing:
+                    self.rejected += 1
+                    raise GatewayUnavailable(wait=1)
+                self._probing = True
+
+    def cancel_call(self):
+        """Undoes before_call for a call that was not made or not finished."""
+        with self._lock:
+            self._probing = False
+
+    def record(self, failed):
+        with self._lock:
+            now = self.clock()
+            if self.state == self.HALF_OPEN:
+                self._probing = False
+                if failed:
+                    self._open(now)
+                else:
+                    self.state = self.CLOSED
+                    self._outcomes.clear()
+                return
+
+            if self.state == self.OPEN:
+                return  # Started before the breaker opened
+            self._outcomes.append((now, failed))
+            self._forget(now)
+            calls = len(self._outcomes)
+            failures = sum(failed for _, failed in self._outcomes)
+            if calls >= self.min_calls and failures / calls >= self.error_rate:
+                self._open(now)
+
+    def snapshot(self):
+        with self._lock:
+            self._forget(self.clock())
+            calls = len(self._outcomes)
+            failures = sum(failed for _, failed in self._outcomes)
+            retry_after = None
+            if self.state == self.OPEN:
+                retry_after = max(
+                    0.0, self.opened_at + self.reset_seconds - self.clock()
+                )
+            return {
+                "state": self.state,
+                "calls": calls,
+                "failures": failures,
+                "error_rate": failures / calls if calls else 0.0,
+                "trips": self.trips,
+                "rejected": self.rejected,
+                "retry_after_seconds": retry_after,
+            }
+
+    def _open(self, now):
+        self.state = self.OPEN
+        self.opened_at = now
+        self.trips += 1
+        self._outcomes.clear()
+
+    def _forget(self, now):
+        while self._outcomes and self._outcomes[0][0] <= now - self.window_seconds:
+            self._outcomes.popleft()
+
+
+@contextmanager
+def guarded(breaker, bulkhead):
+    """
+    Runs one gateway call under `breaker` and `bulkhead`, recording its
+    outcome. Refusals raise GatewayUnavailable before any call is made.
+    """
+    breaker.before_call()
+    try:
+        bulkhead.acquire()
+    except GatewayUnavailable:
+        breaker.cancel_call()
+        raise
+
+    failed = None
+    try:
+        yield
+        failed = False
+    except Exception as e:
+        failed = is_gateway_failure(e)
+        raise
+    finally:
+        bulkhead.release()
+        if failed is None:
+            breaker.cancel_call()  # Cancelled mid-call; nothing was learned
+        else:
+            breaker.record(failed)
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from shop.models import Order, Status
+from .models import Payment
 
 
 class InitializePaymentSerializer(serializers.Serializer):
@@ -19,6 +20,13 @@ class InitializePaymentSerializer(serializers.Serializer):
         if not request or not hasattr(request, "user"):
             raise serializers.ValidationError("Serializer requires a request context.")
 
+        # A repeat "pay" on an order whose checkout is still open gets the
+        # same checkout back, without re-validating the order or calling Chapa.
+        checkout = Payment.objects.open_checkout(order_id, request.user)
+        if checkout is not None:
+            attrs["checkout"] = checkout
+            return attrs
+
         # 1. Validate existence and ownership
         try:
             order = Order.objects.get(id=order_id, user=request.user)
@@ -0,0 +1,195 @@
+"""
+A local stand-in for the Chapa API, for load tests and offline development
+(see the run_chapa_simulator and loadtest_payments commands).
+
+It serves `transaction/initialize` and `transaction/verify/{tx_ref}` under
+/v1, like the real gateway, and can POST signed webhooks to the callback_url
+of each initialized transaction. Latency, server errors and hung responses
+are injected at configurable rates. Every simulated customer pays at once,
+so verify reports `success` for any initialized transaction.
+"""
+
+import hashlib
+import hmac
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import requests
+
+
+def sign(body, secret):
+    """The `Chapa-Signature` of a webhook body."""
+    secret = secret.encode("utf-8")
+    return hmac.new(secret, body, hashlib.sha256).hexdigest()
+
+
+class ChapaSimulatorHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real gateway
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path != "/v1/transaction/initialize":
+            return self.respond(404, {"message": "Not found", "status": "failed"})
+        if not self.server.inject_faults():
+            return self.respond(
+                500, {"message": "Simulated gateway error", "status": "failed"}
+            )
+
+        payload = json.loads(body or b"{}")
+        tx_ref = payload.get("tx_ref")
+        if not tx_ref:
+            return self.respond(
+                400, {"message": "tx_ref is required", "status": "failed"}
+            )
+        self.server.initialize(tx_ref, payload)
+        host = self.headers.get("Host", "localhost")
+        self.respond(
+            200,
+            {
+                "message": "Hosted Link",
+                "status": "success",
+                "data": {"checkout_url": f"http://{host}/checkout/{tx_ref}"},
+            },
+        )
+
+    def do_GET(self):
+        prefix = "/v1/transaction/verify/"
+        if not self.path.startswith(prefix):
+            return self.respond(404, {"message": "Not found", "status": "failed"})
+        if not self.server.inject_faults():
+            return self.respond(
+                500, {"message": "Simulated gateway error", "status": "failed"}
+            )
+
+        tx_ref = self.path[len(prefix) :]
+        transaction = self.server.transactions.get(tx_ref)
+        if transaction is None:
+            return self.respond(
+                404,
+                {
+                    "message": "Invalid transaction or Transaction not found",
+                    "status": "failed",
+                    "data": None,
+                },
+            )
+        self.respond(
+            200,
+            {
+                "message": "Payment details",
+                "status": "success",
+                "data": {
+                    "tx_ref": tx_ref,
+                    "status": "success",
+                    "amount": transaction.get("amount"),
+                    "currency": transaction.get("currency"),
+                },
+            },
+        )
+
+    def respond(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class ChapaSimulator(ThreadingHTTPServer):
+    """
+    The simulator server; `serve_forever()` it from a thread or the
+    run_chapa_simulator command and point CHAPA_BASE_URL at `base_url`.
+
+    Each request first waits `latency` seconds (plus up to `jitter`). Then,
+    with probability `timeout_rate`, it hangs for `hang_seconds` before it
+    answers, which trips the client's read timeout; with probability
+    `error_rate` it answers 500. With `webhook_delay` set, every initialized
+    transaction is followed that many seconds later by a webhook to its
+    callback_url, signed with `webhook_secret`.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address=("127.0.0.1", 0),
+        latency=0.0,
+        jitter=0.0,
+        error_rate=0.0,
+        timeout_rate=0.0,
+        hang_seconds=30.0,
+        webhook_delay=None,
+        webhook_secret=None,
+        seed=None,
+    ):
+        super().__init__(address, ChapaSimulatorHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.hang_seconds = hang_seconds
+        self.webhook_delay = webhook_delay
+        self.webhook_secret = webhook_secret
+        self.transactions = {}
+        self.webhooks_sent = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def inject_faults(self):
+        """Sleeps the configured latency; returns False to answer with a 500."""
+        with self._lock:
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            hang = self._random.random() < self.timeout_rate
+            fail = self._random.random() < self.error_rate
+        time.sleep(delay + (self.hang_seconds if hang else 0))
+        return not fail
+
+    def initialize(self, tx_ref, payload):
+        with self._lock:
+            self.transactions[tx_ref] = payload
+        callback_url = payload.get("callback_url")
+        if self.webhook_delay is not None and callback_url:
+            timer = threading.Timer(
+                self.webhook_delay, self.send_webhook, [tx_ref, callback_url]
+            )
+            timer.daemon = True
+            timer.start()
+
+    def send_webhook(self, tx_ref, callback_url):
+        body = json.dumps(
+            {"tx_ref": tx_ref, "status": "success"}, separators=(",", ":")
+        ).encode()
+        try:
+            requests.post(
+                callback_url,
+                data=body,
+                headers={
+                    "Content-Type": "application/json",
+                    "Chapa-Signature": sign(body, self.webhook_secret),
+                },
+                timeout=10,
+            )
+        except requests.exceptions.RequestException:
+            return  # Chapa gives up too; reconcile_payments picks these up
+        with self._lock:
+            self.webhooks_sent += 1
+
+    def handle_error(self, request, client_address):
+        pass  # The client hung up first, e.g. after a timeout
+
+
+def tx_ref_from_checkout_url(checkout_url):
+    """The tx_ref a simulator checkout_url was issued for."""
+    return urlsplit(checkout_url).path.rsplit("/", 1)[-1]
@@ -0,0 +1,29 @@
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from shop.models import Order
+from payment.models import Payment, WebhookEvent
+import pytest
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class TestPaymentAdmin(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            email="admin@example.com", password="password"
+        )
+        self.client.force_login(self.admin)
+        order = Order.objects.create(user=self.admin, total_price="10.00")
+        Payment.objects.create(
+            order=order, transaction_ref="tx-admin", amount="10.00"
+        )
+        WebhookEvent.objects.create(tx_ref="tx-admin", payload={})
+
+    def test_changelists_render(self):
+        for model in ["payment", "webhookevent"]:
+            response = self.client.get(f"/admin/payment/{model}/")
+            self.assertEqual(response.status_code, 200)
+        self.assertContains(
+            self.client.get("/admin/payment/payment/"), "Payment tx-admin for Order"
+        )
@@ -0,0 +1,149 @@
+from django.test import TestCase, AsyncRequestFactory
+from django.contrib.auth import get_user_model
+from django.conf import settings
+from unittest.mock import AsyncMock, patch
+from rest_framework_simplejwt.tokens import RefreshToken
+import hmac
+import hashlib
+import json
+import httpx
+from shop.models import Category, Product, Order, OrderItem, Status
+from payment.models import Payment, WebhookEvent
+from payment.async_views import initialize_payment, payment_webhook
+import pytest
+
+User = get_user_model()
+
+CHECKOUT = {"status": "success", "data": {"checkout_url": "https://checkout.chapa.co/t"}}
+
+
+@pytest.mark.django_db
+class TestAsyncPaymentViews(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="async@example.com", password="password"
+        )
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+        self.factory = AsyncRequestFactory()
+
+        category = Category.objects.create(name="Audio", description="Sound")
+        product = Product.objects.create(
+            name="Headphones", price="40.00", stock=5, category=category
+        )
+        self.order = Order.objects.create(
+            user=self.user, total_price="40.00", status=Status.pending
+        )
+        OrderItem.objects.create(
+            order=self.order, product=product, quantity=1, price="40.00"
+        )
+
+    def initialize_request(self, token=None, **headers):
+        if token is None:
+            token = self.token
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        return self.factory.post(
+            "/api/v1/payments/initialize/",
+            {"order_id": self.order.id},
+            content_type="application/json",
+            headers=headers,
+        )
+
+    @patch("payment.chapa.AsyncChapaClient.initialize", new_callable=AsyncMock)
+    async def test_initialize_creates_a_pending_payment(self, mock_initialize):
+        mock_initialize.return_value = CHECKOUT
+
+        response = await initialize_payment(self.initialize_request())
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), CHECKOUT["data"])
+        payment = await Payment.objects.aget(order=self.order)
+        self.assertEqual(payment.status, Status.pending)
+        payload = mock_initialize.call_args.args[0]
+        self.assertEqual(payload["tx_ref"], payment.transaction_ref)
+        self.assertEqual(payload["email"], "async@example.com")
+
+    async def test_initialize_requires_a_valid_token(self):
+        response = await initialize_payment(self.initialize_request(token=""))
+        self.assertEqual(response.status_code, 401)
+
+        response = await initialize_payment(self.initialize_request(token="junk"))
+        self.assertEqual(response.status_code, 401)
+
+    @patch("payment.chapa.AsyncChapaClient.initialize", new_callable=AsyncMock)
+    async def test_gateway_failures_map_to_the_sync_view_statuses(self, mock_initialize):
+        mock_initialize.side_effect = httpx.ReadTimeout("slow")
+        response = await initialize_payment(self.initialize_request())
+        self.assertEqual(response.status_code, 504)
+
+        mock_initialize.side_effect = httpx.ConnectError("refused")
+        response = await initialize_payment(self.initialize_request())
+        self.assertEqual(response.status_code, 503)
+
+        self.assertFalse(await Payment.objects.filter(order=self.order).aexists())
+
+    @patch("payment.chapa.AsyncChapaClient.initialize", new_callable=AsyncMock)
+    async def test_idempotency_key_replays_the_first_response(self, mock_initialize):
+        mock_initialize.return_value = CHECKOUT
+        headers = {"Idempotency-Key": "pay-once"}
+
+        first = await initialize_payment(self.initialize_request(**headers))
+        second = await initialize_payment(self.initialize_request(**headers))
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        self.assertEqual(mock_initialize.await_count, 1)
+        self.assertEqual(await Payment.objects.filter(order=self.order).acount(), 1)
+
+    @patch("payment.chapa.AsyncChapaClient.initialize", new_callable=AsyncMock)
+    async def test_repeat_initialization_reuses_the_open_checkout(self, mock_initialize):
+        mock_initialize.return_value = CHECKOUT
+
+        first = await initialize_payment(self.initialize_request())
+        second = await initialize_payment(self.initialize_request())
+
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(json.loads(second.content), json.loads(first.content))
+        self.assertEqual(mock_initialize.await_count, 1)
+
+    @patch("payment.chapa.AsyncChapaClient.initialize", new_callable=AsyncMock)
+    async def test_a_response_without_a_checkout_url_is_passed_through(
+        self, mock_initialize
+    ):
+        mock_initialize.return_value = {"status": "success", "data": {"tx_ref": "x"}}
+
+        response = await initialize_payment(self.initialize_request())
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), {"tx_ref": "x"})
+        payment = await Payment.objects.aget(order=self.order)
+        self.assertIsNone(payment.checkout_expires_at)
+
+    async def test_webhook_checks_the_signature_and_queues_the_event(self):
+        body = json.dumps({"tx_ref": "tx-async", "status": "success"}).encode()
+        secret = settings.CHAPA_WEBHOOK_SECRET.encode("utf-8")
+
+        response = await payment_webhook(
+            self.factory.post(
+                "/api/v1/payments/webhook/",
+                body,
+                content_type="application/json",
+                headers={"Chapa-Signature": "forged"},
+            )
+        )
+        self.assertEqual(response.status_code, 403)
+
+        response = await payment_webhook(
+            self.factory.post(
+                "/api/v1/payments/webhook/",
+                body,
+                content_type="application/json",
+                headers={
+                    "Chapa-Signature": hmac.new(secret, body, hashlib.sha256).hexdigest()
+                },
+            )
+        )
+        self.assertEqual(response.status_code, 200)
+        event = await WebhookEvent.objects.aget(tx_ref="tx-async")
+        self.assertEqual(event.status, WebhookEvent.EventStatus.pending)
@@ -0,0 +1,181 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import requests
+from asgiref.sync import async_to_sync
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from django.contrib.auth import get_user_model
+from payment.chapa import AsyncChapaClient, ChapaClient, get_client
+import pytest
+
+User = get_user_model()
+
+
+class StubChapaHandler(BaseHTTPRequestHandler):
+    """Serves the responses queued on the server, in order, per path."""
+
+    protocol_version = "HTTP/1.1"  # Keep-alive
+
+    def do_GET(self):
+        self.respond()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.respond()
+
+    def respond(self):
+        self.server.calls.append((self.command, self.path, self.client_address[1]))
+        status, body, delay = self.server.responses[self.path].pop(0)
+        time.sleep(delay)
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubChapaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass  # The client hung up first, e.g. after a timeout
+
+
+@pytest.mark.django_db
+class TestChapaClient(TestCase):
+    def setUp(self):
+        self.server = StubChapaServer(("127.0.0.1", 0), StubChapaHandler)
+        self.server.calls = []
+        self.server.responses = {}
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}/v1"
+
+    def chapa(self, **options):
+        options.setdefault("retry_backoff", 0)
+        client = ChapaClient(self.base_url, "test-key", **options)
+        self.addCleanup(client.session.close)
+        return client
+
+    def queue(self, path, *responses):
+        self.server.responses[f"/v1{path}"] = [
+            response + (0,) if len(response) == 2 else response
+            for response in responses
+        ]
+
+    def test_verify_is_retried_on_a_5xx(self):
+        self.queue(
+            "/transaction/verify/tx-1",
+            (503, {"message": "busy"}),
+            (200, {"status": "success", "data": {"status": "success"}}),
+        )
+        client = self.chapa()
+
+        data = client.verify("tx-1")
+
+        self.assertEqual(data["data"]["status"], "success")
+        self.assertEqual(len(self.server.calls), 2)
+        stats = client.metrics.snapshot()["verify"]
+        self.assertEqual((stats["calls"], stats["errors"], stats["retries"]), (1, 0, 1))
+
+    def test_initialize_is_never_retried(self):
+        self.queue("/transaction/initialize", (503, {"message": "busy"}))
+        client = self.chapa()
+
+        with self.assertRaises(requests.exceptions.HTTPError):
+            client.initialize({"tx_ref": "tx-2"})
+
+        self.assertEqual(len(self.server.calls), 1)
+        self.assertEqual(client.metrics.snapshot()["initialize"]["errors"], 1)
+
+    def test_connections_are_kept_alive(self):
+        ok = (200, {"status": "success", "data": {"status": "success"}})
+        self.queue("/transaction/verify/tx-3", ok, ok, ok)
+        client = self.chapa()
+
+        for _ in range(3):
+            client.verify("tx-3")
+
+        ports = {port for _, _, port in self.server.calls}
+        self.assertEqual(len(ports), 1)
+
+    def test_slow_responses_time_out(self):
+        self.queue("/transaction/initialize", (200, {"status": "success"}, 0.5))
+        client = self.chapa(read_timeout=0.1)
+
+        with self.assertRaises(requests.exceptions.Timeout):
+            client.initialize({"tx_ref": "tx-4"})
+
+    def test_metrics_endpoint_reports_the_shared_client(self):
+        self.queue(
+            "/transaction/verify/tx-5",
+            (200, {"status": "success", "data": {"status": "success"}}),
+        )
+        with override_settings(CHAPA_BASE_URL=self.base_url, CHAPA_RETRY_BACKOFF=0):
+            get_client().verify("tx-5")
+
+            admin = User.objects.create_superuser(
+                email="ops@example.com", password="password"
+            )
+            api = APIClient()
+            api.force_authenticate(user=admin)
+            response = api.get("/api/v1/payments/metrics/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["chapa"]["verify"]["calls"], 1)
+
+    def test_async_verify_is_retried_on_a_5xx(self):
+        self.queue(
+            "/transaction/verify/tx-6",
+            (502, {"message": "bad gateway"}),
+            (200, {"status": "success", "data": {"status": "success"}}),
+        )
+
+        async def verify():
+            client = AsyncChapaClient(self.base_url, "test-key", retry_backoff=0)
+            async with client.http:
+                return await client.verify("tx-6"), client.metrics.snapshot()
+
+        data, metrics = async_to_sync(verify)()
+
+        self.assertEqual(data["data"]["status"], "success")
+        self.assertEqual(metrics["verify"]["retries"], 1)
+
+    def test_async_initialize_raises_on_an_error_status(self):
+        self.queue("/transaction/initialize", (503, {"message": "busy"}))
+
+        async def initialize():
+            client = AsyncChapaClient(self.base_url, "test-key")
+            async with client.http:
+                await client.initialize({"tx_ref": "tx-7"})
+
+        with self.assertRaises(httpx.HTTPStatusError):
+            async_to_sync(initialize)()
+        self.assertEqual(len(self.server.calls), 1)
+
+    def test_async_calls_wait_on_the_gateway_concurrently(self):
+        slow = (200, {"status": "success", "data": {"status": "success"}}, 0.3)
+        self.queue("/transaction/verify/tx-8", *[slow] * 20)
+
+        async def verify_all():
+            client = AsyncChapaClient(self.base_url, "test-key")
+            async with client.http:
+                await asyncio.gather(*[client.verify("tx-8") for _ in range(20)])
+
+        started = time.perf_counter()
+        async_to_sync(verify_all)()
+
+        # Twenty 0.3s calls overlap instead of taking 6s back to back.
+        self.assertLess(time.perf_counter() - started, 3)
+        self.assertEqual(len(self.server.calls), 20)
@@ -0,0 +1,120 @@
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from io import StringIO
+
+import requests
+from django.conf import settings
+from django.core.management import call_command
+from django.test import LiveServerTestCase, TestCase, override_settings
+from payment.chapa import ChapaClient
+from payment.models import Payment, WebhookEvent
+from payment.simulator import ChapaSimulator, tx_ref_from_checkout_url
+from payment.webhooks import read_event
+import pytest
+
+
+def start(server):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+class CallbackHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.deliveries.append((dict(self.headers), body))
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+        self.server.delivered.set()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.mark.django_db
+class TestChapaSimulator(TestCase):
+    def simulator(self, **options):
+        simulator = start(
+            ChapaSimulator(webhook_secret=settings.CHAPA_WEBHOOK_SECRET, **options)
+        )
+        self.addCleanup(simulator.server_close)
+        self.addCleanup(simulator.shutdown)
+        return simulator
+
+    def chapa(self, simulator, **options):
+        client = ChapaClient(simulator.base_url, "test-key", retry_backoff=0, **options)
+        self.addCleanup(client.session.close)
+        return client
+
+    def test_initialized_transactions_verify_as_paid(self):
+        client = self.chapa(self.simulator())
+
+        data = client.initialize({"tx_ref": "tx-sim-1", "amount": "10.00"})
+        checkout_url = data["data"]["checkout_url"]
+        self.assertEqual(tx_ref_from_checkout_url(checkout_url), "tx-sim-1")
+
+        data = client.verify("tx-sim-1")
+        self.assertEqual(data["data"]["status"], "success")
+
+        with self.assertRaises(requests.exceptions.HTTPError):
+            client.verify("tx-unknown")
+
+    def test_errors_and_timeouts_are_injected(self):
+        client = self.chapa(self.simulator(error_rate=1), verify_retries=0)
+        with self.assertRaises(requests.exceptions.HTTPError):
+            client.initialize({"tx_ref": "tx-sim-2"})
+
+        client = self.chapa(
+            self.simulator(timeout_rate=1, hang_seconds=0.5), read_timeout=0.1
+        )
+        with self.assertRaises(requests.exceptions.Timeout):
+            client.initialize({"tx_ref": "tx-sim-3"})
+
+    def test_webhooks_are_signed_like_chapa_signs_them(self):
+        callback = start(HTTPServer(("127.0.0.1", 0), CallbackHandler))
+        callback.deliveries, callback.delivered = [], threading.Event()
+        self.addCleanup(callback.server_close)
+        self.addCleanup(callback.shutdown)
+        client = self.chapa(self.simulator(webhook_delay=0))
+
+        client.initialize(
+            {
+                "tx_ref": "tx-sim-4",
+                "callback_url": f"http://127.0.0.1:{callback.server_port}/hook",
+            }
+        )
+
+        self.assertTrue(callback.delivered.wait(5))
+        headers, body = callback.deliveries[0]
+        headers = {name.lower(): value for name, value in headers.items()}
+        self.assertEqual(read_event(headers, body)[1], "tx-sim-4")
+
+
+@pytest.mark.django_db(transaction=True)
+class TestPaymentLoadTest(LiveServerTestCase):
+    def test_flows_run_end_to_end_against_the_simulator(self):
+        simulator = start(ChapaSimulator(latency=0.01))
+        self.addCleanup(simulator.server_close)
+        self.addCleanup(simulator.shutdown)
+        out = StringIO()
+
+        # One shopper: the test server shares a single SQLite connection
+        # across its threads.
+        with override_settings(CHAPA_BASE_URL=simulator.base_url):
+            call_command(
+                "loadtest_payments",
+                base_url=self.live_server_url,
+                flows=4,
+                concurrency=1,
+                products=1,
+                server_workers=1,
+                stdout=out,
+            )
+
+        output = out.getvalue()
+        self.assertIn("Completed 4 of 4 flows", output)
+        self.assertIn("Worker utilization", output)
+        self.assertEqual(len(simulator.transactions), 4)
+        self.assertEqual(Payment.objects.count(), 4)
+        self.assertEqual(WebhookEvent.objects.count(), 4)
@@ -0,0 +1,112 @@
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+import requests
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from shop.models import Order, Status
+from payment.chapa import ChapaClient
+from payment.models import Payment
+import pytest
+
+User = get_user_model()
+
+
+def chapa_verify(tx_ref):
+    outcome = tx_ref.split("-")[1]
+    if outcome == "error":
+        raise requests.exceptions.ConnectionError("refused")
+    return {"status": "success", "data": {"status": outcome}}
+
+
+@pytest.mark.django_db
+class TestReconcilePayments(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="reconcile@example.com", password="password"
+        )
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.state_file = os.path.join(tmp.name, "reconcile.json")
+
+    def pending_payment(self, tx_ref, minutes_ago=120):
+        order = Order.objects.create(user=self.user, total_price="10.00")
+        payment = Payment.objects.create(
+            order=order, transaction_ref=tx_ref, amount="10.00"
+        )
+        created_at = timezone.now() - timedelta(minutes=minutes_ago)
+        Payment.objects.filter(pk=payment.pk).update(created_at=created_at)
+        return payment
+
+    def reconcile(self, **options):
+        out = StringIO()
+        with patch.object(ChapaClient, "verify", side_effect=chapa_verify) as verify:
+            call_command("reconcile_payments", stdout=out, **options)
+        return verify, out.getvalue()
+
+    def test_outcomes_are_applied_and_counted(self):
+        paid = self.pending_payment("tx-success-1")
+        declined = self.pending_payment("tx-failed-1")
+        waiting = self.pending_payment("tx-pending-1")
+        unreachable = self.pending_payment("tx-error-1")
+        recent = self.pending_payment("tx-success-2", minutes_ago=5)
+
+        verify, out = self.reconcile(batch_size=2)
+
+        self.assertEqual(verify.call_count, 4)
+        statuses = dict(Payment.objects.values_list("transaction_ref", "status"))
+        self.assertEqual(statuses[paid.transaction_ref], Status.success)
+        self.assertEqual(statuses[declined.transaction_ref], Status.failed)
+        self.assertEqual(statuses[waiting.transaction_ref], Status.pending)
+        self.assertEqual(statuses[unreachable.transaction_ref], Status.pending)
+        self.assertEqual(statuses[recent.transaction_ref], Status.pending)
+
+        self.assertEqual(Order.objects.get(pk=paid.order_id).status, Status.success)
+        self.assertEqual(Order.objects.get(pk=declined.order_id).status, Status.pending)
+        self.assertIn("1 succeeded, 1 failed, 1 still pending, 1 errors", out)
+        self.assertIn("/s)", out)
+
+    def test_a_batch_is_settled_in_a_fixed_number_of_updates(self):
+        for i in range(5):
+            self.pending_payment(f"tx-success-{i}")
+            self.pending_payment(f"tx-failed-{i}")
+
+        with CaptureQueriesContext(connection) as queries:
+            self.reconcile(batch_size=10)
+
+        updates = [
+            q["sql"]
+            for q in queries.captured_queries
+            if q["sql"].lstrip().startswith("UPDATE")
+            and ("payment_payment" in q["sql"] or "shop_order" in q["sql"])
+        ]
+        # Payments to success, their orders to paid, payments to failed.
+        self.assertEqual(len(updates), 3)
+        self.assertEqual(Order.objects.filter(status=Status.success).count(), 5)
+
+    def test_an_interrupted_run_resumes_after_the_last_batch(self):
+        first = self.pending_payment("tx-pending-1", minutes_ago=180)
+        self.pending_payment("tx-pending-2", minutes_ago=150)
+        with open(self.state_file, "w") as f:
+            json.dump(
+                {
+                    "cutoff": timezone.now().isoformat(),
+                    "created_at": Payment.objects.get(pk=first.pk).created_at.isoformat(),
+                    "id": first.pk,
+                },
+                f,
+            )
+
+        verify, out = self.reconcile(state_file=self.state_file)
+
+        verify.assert_called_once_with("tx-pending-2")
+        self.assertIn(f"Resuming after payment {first.pk}", out)
+        self.assertFalse(os.path.exists(self.state_file))
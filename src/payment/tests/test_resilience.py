@@ -0,0 +1,161 @@
+from unittest.mock import patch
+
+import requests
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from django.contrib.auth import get_user_model
+from shop.models import Category, Product, Order, OrderItem, Status
+from payment.chapa import get_breaker
+from payment.models import Payment
+from payment.resilience import (
+    Bulkhead,
+    CircuitBreaker,
+    GatewayUnavailable,
+    guarded,
+    is_gateway_failure,
+)
+import pytest
+
+User = get_user_model()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def http_error(status_code):
+    response = requests.Response()
+    response.status_code = status_code
+    return requests.exceptions.HTTPError(response=response)
+
+
+class TestCircuitBreaker(TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(
+            error_rate=0.5,
+            min_calls=4,
+            window_seconds=10,
+            reset_seconds=30,
+            clock=self.clock,
+        )
+        self.bulkhead = Bulkhead(limit=5)
+
+    def call(self, error=None):
+        with guarded(self.breaker, self.bulkhead):
+            if error is not None:
+                raise error
+
+    def fail(self, times):
+        for _ in range(times):
+            with self.assertRaises(requests.exceptions.Timeout):
+                self.call(requests.exceptions.Timeout())
+
+    def test_opens_at_the_error_rate_and_fails_fast(self):
+        self.call()
+        self.call()
+        self.fail(1)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+        self.fail(1)  # 2 of 4 calls failed
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+        self.clock.now += 10
+        with self.assertRaises(GatewayUnavailable) as refused:
+            self.call()
+        self.assertEqual(refused.exception.wait, 20)
+        self.assertEqual(self.breaker.snapshot()["rejected"], 1)
+
+    def test_failures_outside_the_window_are_forgotten(self):
+        self.fail(3)
+        self.clock.now += 11
+        self.call()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_client_errors_do_not_count_against_the_gateway(self):
+        self.assertFalse(is_gateway_failure(http_error(400)))
+        self.assertTrue(is_gateway_failure(http_error(503)))
+        self.assertTrue(is_gateway_failure(http_error(429)))
+
+        for _ in range(4):
+            with self.assertRaises(requests.exceptions.HTTPError):
+                self.call(http_error(400))
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_one_trial_call_decides_after_the_reset_timeout(self):
+        self.fail(4)
+        self.clock.now += 30
+
+        # The trial call is in flight: everyone else is still refused.
+        with guarded(self.breaker, self.bulkhead):
+            self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+            with self.assertRaises(GatewayUnavailable):
+                self.call()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+        self.fail(4)
+        self.clock.now += 30
+        self.fail(1)
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(self.breaker.snapshot()["trips"], 3)
+
+    def test_bulkhead_refuses_calls_past_the_limit(self):
+        bulkhead = Bulkhead(limit=1)
+        with guarded(self.breaker, bulkhead):
+            with self.assertRaises(GatewayUnavailable):
+                with guarded(self.breaker, bulkhead):
+                    pass
+        self.assertEqual(
+            bulkhead.snapshot(), {"limit": 1, "in_flight": 0, "rejected": 1}
+        )
+
+        with guarded(self.breaker, bulkhead):
+            pass  # The slot was given back
+
+
+@pytest.mark.django_db
+@override_settings(CHAPA_BREAKER_MIN_CALLS=1, CHAPA_BREAKER_RESET_SECONDS=30)
+class TestOpenBreaker(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser(
+            email="breaker@example.com", password="password"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        category = Category.objects.create(name="Garden", description="Outdoors")
+        product = Product.objects.create(
+            name="Rake", price="12.00", stock=5, category=category
+        )
+        self.order = Order.objects.create(
+            user=self.user, total_price="12.00", status=Status.pending
+        )
+        OrderItem.objects.create(
+            order=self.order, product=product, quantity=1, price="12.00"
+        )
+        get_breaker().record(failed=True)
+
+    def test_initialize_fails_fast_with_retry_after(self):
+        with patch("requests.Session.request") as request:
+            response = self.client.post(
+                "/api/v1/payments/initialize/",
+                {"order_id": self.order.id},
+                format="json",
+            )
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "30")
+        request.assert_not_called()
+        self.assertFalse(Payment.objects.exists())
+
+    def test_metrics_expose_the_breaker_state(self):
+        response = self.client.get("/api/v1/payments/metrics/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["circuit_breaker"]["state"], "open")
+        self.assertEqual(response.data["circuit_breaker"]["trips"], 1)
+        self.assertEqual(response.data["bulkheads"]["chapa"]["in_flight"], 0)
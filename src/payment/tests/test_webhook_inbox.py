@@ -0,0 +1,194 @@
+import hmac
+import hashlib
+import json
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+import requests
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from django.contrib.auth import get_user_model
+from shop.models import Order, Status
+from payment.chapa import ChapaClient
+from payment.models import Payment, WebhookEvent
+from payment.resilience import GatewayUnavailable
+from payment.webhooks import apply_verification, process_webhook_batch
+from analytics.models import DailyProductSales
+import pytest
+
+User = get_user_model()
+
+VERIFIED = {"status": "success", "data": {"status": "success"}}
+
+
+@pytest.mark.django_db
+class TestWebhookInbox(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        user = User.objects.create_user(email="payer@example.com", password="password")
+        self.order = Order.objects.create(user=user, total_price="10.00")
+        self.payment = Payment.objects.create(
+            order=self.order, transaction_ref="tx-inbox", amount="10.00"
+        )
+
+    def deliver(self, payload):
+        body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        secret = settings.CHAPA_WEBHOOK_SECRET.encode("utf-8")
+        return self.client.post(
+            "/api/v1/payments/webhook/",
+            data=payload,
+            format="json",
+            HTTP_CHAPA_SIGNATURE=hmac.new(secret, body, hashlib.sha256).hexdigest(),
+        )
+
+    def test_repeated_deliveries_collapse_into_one_event(self):
+        for _ in range(3):
+            response = self.deliver({"tx_ref": "tx-inbox", "status": "success"})
+            self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(WebhookEvent.objects.count(), 1)
+        with patch.object(ChapaClient, "verify", return_value=VERIFIED) as verify:
+            call_command("process_webhooks", once=True, stdout=StringIO())
+        verify.assert_called_once_with("tx-inbox")
+
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, Status.success)
+        event = WebhookEvent.objects.get()
+        self.assertEqual(event.status, WebhookEvent.EventStatus.done)
+
+    def test_unsigned_deliveries_are_not_queued(self):
+        response = self.client.post(
+            "/api/v1/payments/webhook/",
+            data={"tx_ref": "tx-inbox"},
+            format="json",
+            HTTP_CHAPA_SIGNATURE="forged",
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(WebhookEvent.objects.exists())
+
+    @override_settings(WEBHOOK_MAX_ATTEMPTS=2, WEBHOOK_RETRY_BACKOFF_SECONDS=60)
+    def test_failed_verification_is_retried_with_backoff_then_given_up(self):
+        self.deliver({"tx_ref": "tx-inbox", "status": "success"})
+        down = requests.exceptions.ConnectionError("Chapa is down")
+
+        with patch.object(ChapaClient, "verify", side_effect=down):
+            self.assertEqual(process_webhook_batch(batch_size=10, workers=2), 1)
+            event = WebhookEvent.objects.get()
+            self.assertEqual(event.attempts, 1)
+            self.assertGreater(event.next_attempt_at, timezone.now())
+
+            # Not due yet
+            self.assertEqual(process_webhook_batch(batch_size=10, workers=2), 0)
+
+            WebhookEvent.objects.update(next_attempt_at=timezone.now())
+            process_webhook_batch(batch_size=10, workers=2)
+
+        event.refresh_from_db()
+        self.assertEqual(event.status, WebhookEvent.EventStatus.failed)
+        self.assertIn("Chapa is down", event.last_error)
+
+        # A fresh delivery re-arms the event
+        self.deliver({"tx_ref": "tx-inbox", "status": "success"})
+        event.refresh_from_db()
+        self.assertEqual(event.status, WebhookEvent.EventStatus.pending)
+        self.assertEqual(event.attempts, 0)
+
+    @override_settings(WEBHOOK_MAX_ATTEMPTS=1)
+    def test_refused_calls_do_not_use_up_attempts(self):
+        self.deliver({"tx_ref": "tx-inbox", "status": "success"})
+
+        refused = GatewayUnavailable(wait=30)
+        with patch.object(ChapaClient, "verify", side_effect=refused):
+            process_webhook_batch(batch_size=10, workers=2)
+
+        event = WebhookEvent.objects.get()
+        self.assertEqual(event.status, WebhookEvent.EventStatus.pending)
+        self.assertEqual(event.attempts, 0)
+        retry_at = timezone.now() + timedelta(seconds=25)
+        self.assertGreater(event.next_attempt_at, retry_at)
+
+    @override_settings(CHAPA_MAX_IN_FLIGHT=2)
+    def test_workers_beyond_the_web_in_flight_cap_are_not_refused(self):
+        for i in range(4):
+            order = Order.objects.create(user=self.order.user, total_price="1.00")
+            Payment.objects.create(order=order, transaction_ref=f"tx-{i}", amount="1")
+            self.deliver({"tx_ref": f"tx-{i}", "status": "success"})
+
+        # Every call waits until all four are in flight at once.
+        all_in_flight = threading.Barrier(4, timeout=5)
+
+        def request(*args, **kwargs):
+            all_in_flight.wait()
+            response = requests.Response()
+            response.status_code = 200
+            response._content = json.dumps(VERIFIED).encode()
+            return response
+
+        with patch("requests.Session.request", side_effect=request):
+            self.assertEqual(process_webhook_batch(batch_size=10, workers=4), 4)
+
+        statuses = set(WebhookEvent.objects.values_list("status", flat=True))
+        self.assertEqual(statuses, {WebhookEvent.EventStatus.done})
+
+    def test_an_event_that_fails_to_apply_does_not_abort_the_batch(self):
+        other = Payment.objects.create(
+            order=Order.objects.create(user=self.order.user, total_price="5.00"),
+            transaction_ref="tx-other",
+            amount="5.00",
+        )
+        self.deliver({"tx_ref": "tx-inbox", "status": "success"})
+        self.deliver({"tx_ref": other.transaction_ref, "status": "success"})
+
+        with patch.object(ChapaClient, "verify", return_value=VERIFIED), patch(
+            "payment.webhooks.apply_verification",
+            side_effect=[RuntimeError("database went away"), None],
+        ):
+            self.assertEqual(process_webhook_batch(batch_size=10, workers=2), 2)
+
+        failed, applied = WebhookEvent.objects.order_by("id")
+        self.assertEqual(failed.status, WebhookEvent.EventStatus.pending)
+        self.assertEqual(failed.attempts, 1)
+        self.assertIn("database went away", failed.last_error)
+        self.assertEqual(applied.status, WebhookEvent.EventStatus.done)
+
+    def test_a_verification_without_data_is_not_applied(self):
+        apply_verification("tx-inbox", {"status": "success", "data": None})
+
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, Status.pending)
+
+    def test_transition_is_guarded_and_repeats_are_no_ops(self):
+        with CaptureQueriesContext(connection) as first:
+            apply_verification("tx-inbox", VERIFIED)
+        statements = [query["sql"].split()[0] for query in first.captured_queries]
+        # Payment and order move with no read first
+        self.assertEqual(statements[1:3], ["UPDATE", "UPDATE"])
+
+        self.order.refresh_from_db()
+        self.payment.refresh_from_db()
+        self.assertEqual(self.order.status, Status.success)
+        self.assertEqual(self.payment.status, Status.success)
+
+        with CaptureQueriesContext(connection) as repeat:
+            apply_verification("tx-inbox", VERIFIED)
+        statements = [query["sql"].split()[0] for query in repeat.captured_queries]
+        self.assertEqual(statements.count("UPDATE"), 1)
+        self.assertNotIn("SELECT", statements)
+        self.assertNotIn("INSERT", statements)
+
+    def test_a_payment_for_an_order_that_is_no_longer_pending_is_not_counted(self):
+        Order.objects.filter(pk=self.order.pk).update(status=Status.failed)
+
+        apply_verification("tx-inbox", VERIFIED)
+
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, Status.failed)
+        self.assertFalse(DailyProductSales.objects.exists())
+
@@ -1,11 +1,21 @@
+from django.conf import settings
 from django.urls import path
-from .views import InitializePaymentView, PaymentWebhookView
+from . import async_views
+from .views import GatewayMetricsView, InitializePaymentView, PaymentWebhookView
+
+if settings.PAYMENT_ASYNC_VIEWS:
+    initialize_view = async_views.initialize_payment
+    webhook_view = async_views.payment_webhook
+else:
+    initialize_view = InitializePaymentView.as_view()
+    webhook_view = PaymentWebhookView.as_view()
 
 urlpatterns = [
     path(
         "initialize/",
-        InitializePaymentView.as_view(),
+        initialize_view,
         name="initialize-payment",
     ),
-    path("webhook/", PaymentWebhookView.as_view(), name="payment-webhook"),
+    path("webhook/", webhook_view, name="payment-webhook"),
+    path("metrics/", GatewayMetricsView.as_view(), name="payment-metrics"),
 ]
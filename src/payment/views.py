@@ -1,22 +1,27 @@
-import hmac
-import hashlib
-import json
 import requests
-import uuid
 import logging
 
 logger = logging.getLogger(__name__)
 
-from django.conf import settings
 from drf_spectacular.utils import extend_schema, OpenApiResponse
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.permissions import IsAuthenticated, AllowAny
-from django.db import transaction
+from rest_framework.permissions import IsAdminUser, IsAuthenticated, AllowAny
 
+from shop.idempotency import IDEMPOTENCY_KEY_PARAMETER, idempotent
 from shop.models import Status
+from .chapa import (
+    async_metrics,
+    checkout_fields,
+    get_async_bulkhead,
+    get_breaker,
+    get_client,
+    initialize_payload,
+    new_tx_ref,
+)
 from .models import Payment
+from .webhooks import WebhookRejected, read_event, store_event
 from .serializers import InitializePaymentSerializer
 
 
@@ -32,6 +37,7 @@ class InitializePaymentView(APIView):
         description="""
         Creates a payment record in a 'pending' state and requests a checkout URL from the Chapa payment gateway.
         The frontend should redirect the user to the returned 'checkout_url'.
+        Repeating the request while that checkout is still open returns the same URL.
         """,
         request=InitializePaymentSerializer,
         responses={
@@ -54,52 +60,38 @@ class InitializePaymentView(APIView):
             ),
             401: OpenApiResponse(description="Authentication required"),
             404: OpenApiResponse(description="Order not found"),
+            503: OpenApiResponse(
+                description="Payment provider unavailable; retry after Retry-After"
+            ),
         },
+        parameters=[IDEMPOTENCY_KEY_PARAMETER],
         tags=["Payment"],  # Group this endpoint under a 'Payment' tag in Swagger UI
     )
+    @idempotent
     def post(self, request, *args, **kwargs):
 
         serializer = InitializePaymentSerializer(
             data=request.data, context={"request": request}
         )
         serializer.is_valid(raise_exception=True)
+
+        # The order's checkout is still open: hand out the same link again.
+        checkout = serializer.validated_data.get("checkout")
+        if checkout is not None:
+            return Response(
+                {"checkout_url": checkout.checkout_url}, status=status.HTTP_200_OK
+            )
         order = serializer.validated_data["order"]
 
         # 3. Generate a unique transaction reference
-        tx_ref = f"nexus-{order.id}-{uuid.uuid4().hex}"
+        tx_ref = new_tx_ref(order)
 
         # 4. Prepare the payload for the Chapa API
-        user = request.user
-
-        payload = {
-            "amount": str(order.total_price),  # Ensure amount is a string
-            "currency": "ETB",
-            "email": user.email,
-            "first_name": user.first_name if user.first_name else "Customer",
-            "last_name": user.last_name if user.last_name else "Name",
-            "tx_ref": tx_ref,
-            "callback_url": settings.BACKEND_CALLBACK_URL,
-            "return_url": settings.FRONTEND_RETURN_URL,
-            "customization": {
-                "title": f"Shop Order {order.id}",  # Short, no special characters
-                "description": f"Payment for order {order.id}",  # Simple, no special characters
-            },
-        }
+        payload = initialize_payload(order, request.user, tx_ref)
 
-        # 5. Make the request to Chapa's API
-        headers = {
-            "Authorization": f"Bearer {settings.CHAPA_SECRET_KEY}",
-            "Content-Type": "application/json",
-        }
+        # 5. Make the request to Chapa's API (pooled, with timeouts)
         try:
-            response = requests.post(
-                "https://api.chapa.co/v1/transaction/initialize",
-                json=payload,
-                headers=headers,
-                timeout=10,  # avoids hanging forever if Chapa is slow
-            )
-            response.raise_for_status()  # raises HTTPError if response status >= 400
-            response_data = response.json()
+            response_data = get_client().initialize(payload)
         except requests.exceptions.HTTPError as e:
 
             chapa_error_details = e.response.text
@@ -140,6 +132,7 @@ class InitializePaymentView(APIView):
                 transaction_ref=tx_ref,
                 amount=order.total_price,
                 status=Status.pending,
+                **checkout_fields(response_data["data"]),
             )
             return Response(response_data["data"], status=status.HTTP_200_OK)
         else:
@@ -170,7 +163,8 @@ class PaymentWebhookView(APIView):
         summary="Chapa Payment Webhook",
         description="""
         Endpoint for Chapa to send asynchronous notifications about payment status.
-        This endpoint verifies the signature and updates the order status.
+        This endpoint verifies the signature and queues the event; the order status
+        is updated once a worker has verified the transaction with Chapa.
         **This should only be called by Chapa's servers.**
         """,
         request={
@@ -192,88 +186,50 @@ class PaymentWebhookView(APIView):
         tags=["Payment"],
     )
     def post(self, request, *args, **kwargs):
-        # 1. Verify the webhook signature for security
-        signature = request.headers.get("chapa-signature")
-        x_signature = request.headers.get("x-chapa-signature")
-        body = request.body
-
-        if not signature and not x_signature:
-            return Response(
-                {"error": "Missing signature header."},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-
-        # Recompute the hash and compare
-        secret = settings.CHAPA_WEBHOOK_SECRET.encode("utf-8")
-        x_computed_hash = hmac.new(secret, secret, hashlib.sha256).hexdigest()
-        computed_hash = hmac.new(secret, body, hashlib.sha256).hexdigest()
-
-        valid = False
-        if signature and hmac.compare_digest(computed_hash, signature):
-            valid = True
-        elif x_signature and hmac.compare_digest(x_computed_hash, x_signature):
-            valid = True
-
-        if not valid:
-            return Response(
-                {"error": "Invalid signature."}, status=status.HTTP_403_FORBIDDEN
-            )
-
-        # 2. Parse the payload and get the transaction reference
-        try:
-            event_data = json.loads(body)
-            tx_ref = event_data.get("tx_ref")
-        except json.JSONDecodeError:
-            return Response(
-                {"error": "Invalid JSON payload."}, status=status.HTTP_400_BAD_REQUEST
-            )
-
-        if not tx_ref:
-            return Response(
-                {
-                    "error": "Transaction reference (tx_ref) not found in webhook payload."
-                },
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-
-        # 3. Verify the transaction status with Chapa's API (Source of Truth)
-        headers = {"Authorization": f"Bearer {settings.CHAPA_SECRET_KEY}"}
+        # 1. Verify the webhook signature and read the transaction reference
         try:
-            verify_url = f"https://api.chapa.co/v1/transaction/verify/{tx_ref}"
-            response = requests.get(verify_url, headers=headers)
-            response.raise_for_status()
-            verification_data = response.json()
-        except requests.exceptions.RequestException as e:
-            # If verification fails, we should not proceed. Acknowledge the webhook to prevent retries
-            # but log the error for manual investigation.
-            # Log error: f"Failed to verify transaction {tx_ref} with Chapa: {e}"
-            return Response(status=status.HTTP_200_OK)
+            event_data, tx_ref = read_event(request.headers, request.body)
+        except WebhookRejected as e:
+            return Response({"error": e.message}, status=e.status_code)
 
-        # 4. Update the database if verification is successful
-        if (
-            verification_data.get("status") == "success"
-            and verification_data["data"]["status"] == "success"
-        ):
-            try:
-                payment = Payment.objects.get(transaction_ref=tx_ref)
+        # 2. Queue it for the process_webhooks workers, which verify the
+        # transaction with Chapa (the source of truth) and update the order.
+        # Answering right away keeps a slow Chapa API from holding this
+        # worker and from triggering webhook retries.
+        store_event(tx_ref, event_data)
 
-                # Use a database transaction to ensure atomicity
-                with transaction.atomic():
-                    # Update payment status to 'Completed'
-                    payment.status = Status.success
-                    payment.save()
-
-                    # Update the related order's status (you may need to add a 'payment_status' field to your Order model)
-                    order = payment.order
+        # 3. Acknowledge receipt of the webhook with a 200 OK
+        return Response(status=status.HTTP_200_OK)
 
-                    order.status = Status.success
-                    order.save()
 
-                    # here you can trigger other post-payment logic, like sending a confirmation email.
+class GatewayMetricsView(APIView):
+    """
+    Reports call counts, errors, retries and latency of the Chapa clients.
+    """
 
-            except Payment.DoesNotExist:
-                # The webhook is for a transaction not in our system. Log it and ignore.
-                pass
+    permission_classes = [IsAdminUser]
 
-        # 5. Acknowledge receipt of the webhook with a 200 OK
-        return Response(status=status.HTTP_200_OK)
+    @extend_schema(
+        summary="Payment gateway metrics",
+        description=(
+            "[Admin Only] Per-operation call counts, errors, retries and latency "
+            "percentiles of the Chapa clients (`chapa_async` is the client of the "
+            "async payment views), the circuit breaker's state and the in-flight "
+            "calls per client. Figures are for the worker process "
+            "that serves the request and reset when it restarts."
+        ),
+        responses={200: OpenApiResponse(description="Metrics per operation.")},
+        tags=["Payment"],
+    )
+    def get(self, request, *args, **kwargs):
+        return Response(
+            {
+                "chapa": get_client().metrics.snapshot(),
+                "chapa_async": async_metrics.snapshot(),
+                "circuit_breaker": get_breaker().snapshot(),
+                "bulkheads": {
+                    "chapa": get_client().bulkhead.snapshot(),
+                    "chapa_async": get_async_bulkhead().snapshot(),
+                },
+            }
+        )
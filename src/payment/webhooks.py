@@ -0,0 +1,229 @@
+import functools
+import hashlib
+import hmac
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from analytics.rollups import record_order
+from shop.models import Order, ProductPopularity
+
+from .chapa import get_worker_client
+from .models import Payment, WebhookEvent
+from .resilience import GatewayUnavailable
+
+logger = logging.getLogger(__name__)
+
+EventStatus = WebhookEvent.EventStatus
+
+
+class WebhookRejected(Exception):
+    """A webhook delivery that is unsigned, forged or malformed."""
+
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def read_event(headers, body):
+    """
+    Checks the delivery's Chapa signature and parses it.
+
+    Returns (event_data, tx_ref); raises WebhookRejected with the status
+    code to answer otherwise.
+    """
+    signature = headers.get("chapa-signature")
+    x_signature = headers.get("x-chapa-signature")
+
+    if not signature and not x_signature:
+        raise WebhookRejected("Missing signature header.", 400)
+
+    # Recompute the hash and compare
+    secret = settings.CHAPA_WEBHOOK_SECRET.encode("utf-8")
+    x_computed_hash = hmac.new(secret, secret, hashlib.sha256).hexdigest()
+    computed_hash = hmac.new(secret, body, hashlib.sha256).hexdigest()
+
+    valid = False
+    if signature and hmac.compare_digest(computed_hash, signature):
+        valid = True
+    elif x_signature and hmac.compare_digest(x_computed_hash, x_signature):
+        valid = True
+
+    if not valid:
+        raise WebhookRejected("Invalid signature.", 403)
+
+    try:
+        event_data = json.loads(body)
+        tx_ref = event_data.get("tx_ref")
+    except json.JSONDecodeError:
+        raise WebhookRejected("Invalid JSON payload.", 400)
+
+    if not tx_ref:
+        raise WebhookRejected(
+            "Transaction reference (tx_ref) not found in webhook payload.", 400
+        )
+    return event_data, tx_ref
+
+
+def store_event(tx_ref, payload):
+    """
+    Puts a signed webhook in the inbox. Deliveries for a transaction that
+    is already waiting collapse into its event; a delivery for one that was
+    already handled re-arms it, so a later status change is not lost.
+    """
+    event, created = WebhookEvent.objects.get_or_create(
+        tx_ref=tx_ref, defaults={"payload": payload}
+    )
+    if not created and event.status != EventStatus.pending:
+        WebhookEvent.objects.filter(pk=event.pk).exclude(
+            status=EventStatus.pending
+        ).update(
+            status=EventStatus.pending,
+            payload=payload,
+            attempts=0,
+            last_error="",
+            next_attempt_at=timezone.now(),
+        )
+
+
+def process_webhook_batch(batch_size, workers):
+    """
+    Claims up to `batch_size` due events, verifies them with Chapa using
+    up to `workers` concurrent calls, and applies the outcomes.
+
+    Claiming is a short SKIP LOCKED transaction that pushes the events'
+    `next_attempt_at` out by WEBHOOK_CLAIM_LEASE_SECONDS, so several
+    workers can drain the inbox side by side and no database transaction
+    is held open across a call to Chapa. Events whose verification fails
+    are retried with exponential backoff, up to WEBHOOK_MAX_ATTEMPTS; calls
+    refused while Chapa is unavailable are put off without using up an
+    attempt.
+
+    Returns the number of events processed.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        events = list(
+            WebhookEvent.objects.select_for_update(skip_locked=True)
+            .filter(status=EventStatus.pending, next_attempt_at__lte=now)
+            .order_by("next_attempt_at")[:batch_size]
+        )
+        if not events:
+            return 0
+        lease = timedelta(seconds=settings.WEBHOOK_CLAIM_LEASE_SECONDS)
+        WebhookEvent.objects.filter(pk__in=[event.pk for event in events]).update(
+            next_attempt_at=now + lease
+        )
+
+    # Only the HTTP calls run in the pool; the database work stays on this
+    # thread and its connection.
+    verify = functools.partial(_verify, get_worker_client(workers))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        outcomes = list(pool.map(verify, events))
+
+    for event, (verification_data, error) in zip(events, outcomes):
+        if isinstance(error, GatewayUnavailable):
+            # Chapa was not called; try again once the breaker allows it.
+            _defer(event, error)
+            continue
+        if error is not None:
+            logger.error(
+                "Failed to verify transaction %s with Chapa: %s", event.tx_ref, error
+            )
+            _retry_later(event, error)
+            continue
+        try:
+            _apply(event, verification_data)
+        except Exception as e:
+            # One bad event must not strand the rest of the batch under its
+            # lease; it is retried with backoff like a failed verification.
+            logger.exception("Failed to apply webhook for transaction %s", event.tx_ref)
+            _retry_later(event, e)
+    return len(events)
+
+
+def _verify(client, event):
+    try:
+        return client.verify(event.tx_ref), None
+    except (requests.exceptions.RequestException, GatewayUnavailable) as e:
+        return None, e
+
+
+def _apply(event, verification_data):
+    with transaction.atomic():
+        apply_verification(event.tx_ref, verification_data)
+        event.status = EventStatus.done
+        event.processed_at = timezone.now()
+        event.save(update_fields=["status", "processed_at"])
+
+
+def _defer(event, error):
+    event.last_error = str(error)
+    event.next_attempt_at = timezone.now() + timedelta(seconds=error.wait)
+    event.save(update_fields=["last_error", "next_attempt_at"])
+
+
+def _retry_later(event, error):
+    event.attempts += 1
+    event.last_error = str(error)
+    if event.attempts >= settings.WEBHOOK_MAX_ATTEMPTS:
+        event.status = EventStatus.failed
+        event.processed_at = timezone.now()
+    else:
+        backoff = settings.WEBHOOK_RETRY_BACKOFF_SECONDS * 2 ** (event.attempts - 1)
+        event.next_attempt_at = timezone.now() + timedelta(seconds=backoff)
+    event.save(
+        update_fields=[
+            "attempts",
+            "last_error",
+            "status",
+            "processed_at",
+            "next_attempt_at",
+        ]
+    )
+
+
+def apply_verification(tx_ref, verification_data):
+    """
+    Applies Chapa's verified outcome of a transaction to its payment and
+    order: two guarded UPDATEs in one transaction, with no read first. A
+    repeat of an already applied outcome changes nothing.
+    """
+    if not (
+        verification_data.get("status") == "success"
+        and (verification_data.get("data") or {}).get("status") == "success"
+    ):
+        return
+
+    with transaction.atomic():
+        order_id = Payment.objects.mark_succeeded(tx_ref)
+        if order_id is None:
+            # Unknown to us, or already settled by an earlier delivery.
+            return
+
+        order = Order.objects.mark_paid(order_id)
+        if order is None:
+            logger.warning(
+                "Payment %s succeeded but order %s was not pending", tx_ref, order_id
+            )
+            return
+
+        record_paid_order(order)
+
+
+def record_paid_order(order):
+    """
+    Counts the sale of an order that just moved to paid. Call it exactly
+    once, inside the transaction that made the transition.
+    """
+    record_order(order)
+    ProductPopularity.objects.record_sale(order)
+
+    # here you can trigger other post-payment logic, like sending a confirmation email.
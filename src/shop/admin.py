@@ -1,8 +1,17 @@
 from django.contrib import admin
-from .models import Category, Product, Cart, CartItem, Order, OrderItem
+from .models import (
+    Category,
+    Product,
+    InventoryStripe,
+    Cart,
+    CartItem,
+    Order,
+    OrderItem,
+)
 
 admin.site.register(Category)
 admin.site.register(Product)
+admin.site.register(InventoryStripe)
 admin.site.register(Cart)
 admin.site.register(CartItem)
 admin.site.register(Order)
@@ -0,0 +1,202 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from rest_framework.response import Response
+
+CATALOG_VERSION_KEY = "shop:catalog-version"
+STOCK_KEY = "shop:stock:{}"
+
+
+def get_catalog_version():
+    """
+    Returns the current catalog version, the namespace for every cached
+    catalog response. Bumping it orphans all previously cached entries.
+    """
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # Seed from the clock rather than 1 so an evicted counter can never
+        # fall back onto a version whose entries are still in the cache.
+        cache.add(CATALOG_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        # The counter was evicted; a fresh seed is just as good as a bump.
+        get_catalog_version()
+
+
+def stock_levels(product_ids):
+    """
+    Returns {product_id: stock} for `product_ids`, each level cached on its
+    own for CATALOG_STOCK_CACHE_TIMEOUT seconds. Products missing from the
+    cache are read in one query; deleted products are left out.
+    """
+    from .models import Product
+
+    keys = {product_id: STOCK_KEY.format(product_id) for product_id in product_ids}
+    cached = cache.get_many(keys.values())
+    levels = {pid: cached[key] for pid, key in keys.items() if key in cached}
+    missing = [product_id for product_id in keys if product_id not in levels]
+    if missing:
+        fresh = dict(
+            Product.objects.filter(pk__in=missing).values_list("id", "stock")
+        )
+        cache_stock_levels(fresh)
+        levels.update(fresh)
+    return levels
+
+
+def cache_stock_levels(levels):
+    cache.set_many(
+        {STOCK_KEY.format(pid): stock for pid, stock in levels.items()},
+        settings.CATALOG_STOCK_CACHE_TIMEOUT,
+    )
+
+
+def catalog_cache_key(request, basename, action, lookup=None):
+    """
+    Builds the cache key for a catalog response from the view, the object
+    lookup (for detail routes) and the full, order-independent query string
+    (category, search, page, cursor...). The host is included because
+    paginated responses embed absolute next/previous links.
+    """
+    query = request.get_host() + "?" + "&".join(
+        f"{name}={value}"
+        for name, values in sorted(request.query_params.lists())
+        for value in sorted(values)
+    )
+    digest = hashlib.md5(query.encode("utf-8")).hexdigest()
+    return f"shop:catalog:{get_catalog_version()}:{basename}:{action}:{lookup}:{digest}"
+
+
+class CatalogCacheMixin:
+    """
+    Serves `list` and `retrieve` from the shared cache and answers
+    conditional GETs (If-None-Match) with a 304.
+
+    Catalog responses do not depend on the requesting user, so a cache hit
+    skips the ORM and the serializers entirely. Entries are namespaced by
+    the catalog version, which shop.signals bumps whenever a Product or
+    Category is saved or deleted.
+
+    Stock moves with every sale, so it is not held to that version: views
+    that set `stock_field` overlay each product's current level onto the
+    cached rows (see stock_levels), and checkouts never invalidate the
+    catalog.
+
+    On a miss the ETag comes from a single aggregate over the filtered
+    queryset (latest `updated_at` plus row count), and a 304 is returned
+    before anything is serialized. No Last-Modified is sent: deleting a row
+    changes the count but can leave the latest `updated_at` where it was,
+    so If-Modified-Since would answer 304 for a list that lost a product.
+    """
+
+    # Timestamps whose maximum changes whenever the rendered data does.
+    # Views that embed related rows add those rows' `updated_at` here.
+    validator_fields = ("updated_at",)
+    # Field of each rendered product holding its stock, refreshed on hits.
+    stock_field = None
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def get_etag(self, lookup=None):
+        """Returns the ETag for the current request."""
+        queryset = self.filter_queryset(self.get_queryset())
+        latest = {
+            f"latest_{i}": Max(field) for i, field in enumerate(self.validator_fields)
+        }
+        try:
+            if lookup is not None:
+                queryset = queryset.filter(**{self.lookup_field: lookup})
+            stats = queryset.aggregate(count=Count("pk"), **latest)
+        except (TypeError, ValueError, ValidationError):
+            # A malformed lookup; let the handler produce its usual 404.
+            return None
+
+        timestamps = [stats[name] for name in latest if stats[name] is not None]
+        fingerprint = ":".join(
+            [self.basename, self.action, str(stats["count"])]
+            + [ts.isoformat() for ts in timestamps]
+        )
+        # Weak: the same data may be rendered as JSON or the browsable API.
+        return f'W/"{hashlib.md5(fingerprint.encode("utf-8")).hexdigest()}"'
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        lookup = kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        key = catalog_cache_key(request, self.basename, self.action, lookup)
+
+        entry = cache.get(key)
+        if entry is not None:
+            data, etag = entry["data"], entry["etag"]
+            if self.stock_field is not None:
+                data, etag = self.refresh_stock(data, etag)
+        else:
+            etag = self.get_etag(lookup)
+
+        if etag is not None:
+            not_modified = get_conditional_response(request, etag=etag)
+            if not_modified is not None:
+                not_modified["ETag"] = etag
+                return not_modified
+
+        if entry is not None:
+            response = Response(data)
+        else:
+            response = handler(request, *args, **kwargs)
+            if response.status_code == 200:
+                entry = {"etag": etag, "data": response.data}
+                cache.set(key, entry, self.get_cache_timeout())
+                if self.stock_field is not None:
+                    cache_stock_levels(
+                        {
+                            row["id"]: row[self.stock_field]
+                            for row in self.rendered_products(response.data)
+                        }
+                    )
+
+        if response.status_code == 200 and etag is not None:
+            response["ETag"] = etag
+        return response
+
+    def get_cache_timeout(self):
+        return settings.CATALOG_CACHE_TIMEOUT
+
+    def rendered_products(self, data):
+        if isinstance(data, dict):
+            return data.get("results", [data])
+        return data
+
+    def refresh_stock(self, data, etag):
+        """
+        Overlays current stock levels onto the products of a cached
+        response. Returns the data and an ETag that also covers the levels
+        that moved since it was cached.
+        """
+        products = self.rendered_products(data)
+        levels = stock_levels([row["id"] for row in products])
+        moved = sorted(
+            (row["id"], levels[row["id"]])
+            for row in products
+            if row["id"] in levels and row[self.stock_field] != levels[row["id"]]
+        )
+        if not moved:
+            return data, etag
+
+        for row in products:
+            if row["id"] in levels:
+                row[self.stock_field] = levels[row["id"]]
+        fingerprint = f"{etag}:{moved}"
+        return data, f'W/"{hashlib.md5(fingerprint.encode("utf-8")).hexdigest()}"'
@@ -0,0 +1,298 @@
+import random
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import OperationalError, connections, router, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .models import (
+    CartItem,
+    CheckoutJob,
+    InventoryStripe,
+    Order,
+    OrderItem,
+    OrderStatus,
+    Product,
+    Status,
+)
+
+# SQLSTATE raised by PostgreSQL for both NOWAIT and lock_timeout failures
+LOCK_NOT_AVAILABLE = "55P03"
+
+
+class CheckoutConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = (
+        "Some items in your cart are being checked out by other customers. "
+        "Please try again."
+    )
+    default_code = "checkout_conflict"
+    wait = 1  # Sent as Retry-After by DRF's exception handler
+
+
+class CheckoutUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Checkout is busy right now. Please try again shortly."
+    default_code = "checkout_unavailable"
+    wait = 2
+
+
+class OutOfStock(Exception):
+    """A cart line asks for more units than are in stock."""
+
+    def __init__(self, product_name):
+        super().__init__(f"Not enough stock for {product_name}.")
+        self.product_name = product_name
+
+
+def place_order(user, cart, quantities):
+    """
+    Turns the cart lines ({product_id: quantity}) into a pending order,
+    taking the units out of stock, and empties the cart.
+
+    Raises OutOfStock if any line cannot be fulfilled (nothing is changed),
+    or CheckoutConflict / CheckoutUnavailable if the product rows could not
+    be locked under the configured CHECKOUT_LOCK_STRATEGY.
+    """
+    try:
+        return run_with_lock_policy(
+            lambda nowait: _place_order(user, cart, quantities, nowait)
+        )
+    except OutOfStock:
+        # Name the short product now that the transaction has rolled back.
+        products = list(Product.objects.filter(id__in=quantities).order_by("id"))
+        available = {p.id: p.stock for p in products}
+        available.update(
+            InventoryStripe.objects.totals([p.id for p in products if p.is_striped])
+        )
+        product = next(
+            (p for p in products if available[p.id] < quantities[p.id]), None
+        )
+        raise OutOfStock(product.name if product else "an item in your cart")
+
+
+def _place_order(user, cart, quantities, nowait):
+    # Hot products keep their stock in stripes and are never row-locked here.
+    striped = dict(
+        Product.objects.filter(pk__in=quantities, stock_stripes__gt=0).values_list(
+            "pk", "price"
+        )
+    )
+    plain = {pid: qty for pid, qty in quantities.items() if pid not in striped}
+
+    Product.objects.lock_in_order(plain, nowait=nowait)
+
+    # One conditional UPDATE takes every line out of stock and returns the
+    # prices of the rows it touched. Row locks are held only for the few
+    # statements left in this transaction, whatever the basket size.
+    prices = Product.objects.decrement_stock(plain)
+    if len(prices) != len(plain):
+        raise OutOfStock(None)
+
+    # Product order keeps the stripe fallback's waits deadlock-free.
+    for product_id in sorted(striped):
+        if not InventoryStripe.objects.take(
+            product_id, quantities[product_id], nowait=nowait
+        ):
+            raise OutOfStock(None)
+    prices.update(striped)
+
+    products = (
+        Product.objects.select_related("category")
+        .only("name", "image", "category__name")
+        .in_bulk(quantities)
+    )
+    total_price = sum(
+        prices[product_id] * quantity for product_id, quantity in quantities.items()
+    )
+    order = Order.objects.create(
+        user=user, total_price=total_price, status=Status.pending
+    )
+    OrderItem.objects.bulk_create(
+        OrderItem(
+            order=order,
+            product_id=product_id,
+            quantity=quantity,
+            price=prices[product_id],
+            **OrderItem.snapshot(products[product_id]),
+        )
+        for product_id, quantity in quantities.items()
+    )
+    CartItem.objects.filter(cart=cart).delete()
+    return order
+
+
+def run_with_lock_policy(work):
+    """
+    Runs `work(nowait)` in a transaction under CHECKOUT_LOCK_STRATEGY.
+
+    - "block": wait for row locks, but give up after CHECKOUT_LOCK_TIMEOUT_MS
+      and raise CheckoutUnavailable (503) rather than pin the worker.
+    - "nowait": fail immediately on a held lock and retry up to
+      CHECKOUT_LOCK_RETRIES times with jittered exponential backoff, then
+      raise CheckoutConflict (409).
+    """
+    nowait = settings.CHECKOUT_LOCK_STRATEGY == "nowait"
+    attempts = 1 + settings.CHECKOUT_LOCK_RETRIES if nowait else 1
+
+    for attempt in range(attempts):
+        try:
+            with transaction.atomic():
+                if not nowait:
+                    _set_lock_timeout(settings.CHECKOUT_LOCK_TIMEOUT_MS)
+                return work(nowait)
+        except OperationalError as exc:
+            if getattr(exc.__cause__, "sqlstate", None) != LOCK_NOT_AVAILABLE:
+                raise
+        if attempt + 1 < attempts:
+            backoff = settings.CHECKOUT_LOCK_RETRY_BACKOFF_MS * 2**attempt
+            time.sleep(random.uniform(0.5, 1.5) * backoff / 1000)
+
+    raise CheckoutConflict() if nowait else CheckoutUnavailable()
+
+
+def _set_lock_timeout(timeout_ms):
+    connection = connections[router.db_for_write(Product)]
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            # Scoped to the current transaction
+            cursor.execute(
+                "SELECT set_config('lock_timeout', %s, true)", [f"{timeout_ms}ms"]
+            )
+
+
+def enqueue_order(user, cart, cart_items):
+    """
+    Asynchronous checkout: records the cart as a `queued` order and hands it
+    to the `process_checkouts` workers. No product rows are locked here, so
+    the request returns immediately however contended the products are.
+
+    `cart_items` must have their products and categories loaded. Prices are
+    fixed now; the worker only decides whether the stock is there.
+    """
+    with transaction.atomic():
+        order = Order.objects.create(
+            user=user,
+            total_price=sum(item.product.price * item.quantity for item in cart_items),
+            status=OrderStatus.queued,
+        )
+        OrderItem.objects.bulk_create(
+            OrderItem(
+                order=order,
+                product_id=item.product_id,
+                quantity=item.quantity,
+                price=item.product.price,
+                **OrderItem.snapshot(item.product),
+            )
+            for item in cart_items
+        )
+        CartItem.objects.filter(cart=cart).delete()
+        CheckoutJob.objects.create(order=order)
+    return order
+
+
+def process_checkout_batch(batch_size):
+    """
+    Claims up to `batch_size` queued checkouts and settles them together.
+
+    Jobs are claimed with SKIP LOCKED, so any number of workers can drain
+    the queue side by side. Instead of one stock update per order, the
+    batch's demand is summed per product: each product row (or, for a
+    striped product, its stripes) is locked once in primary-key order,
+    orders are accepted first-come first-served while their lines still
+    fit, and one set-based UPDATE takes the accepted units out of stock.
+    Accepted orders move to `pending` (awaiting payment), the rest to
+    `failed`.
+
+    Returns the number of jobs processed.
+    """
+    JobStatus = CheckoutJob.JobStatus
+
+    with transaction.atomic():
+        jobs = list(
+            CheckoutJob.objects.select_for_update(skip_locked=True)
+            .filter(status=JobStatus.queued)
+            .order_by("id")[:batch_size]
+        )
+        if not jobs:
+            return 0
+
+        items = OrderItem.objects.filter(order_id__in=[job.order_id for job in jobs])
+        lines = defaultdict(lambda: defaultdict(int))
+        for order_id, product_id, quantity in items.values_list(
+            "order_id", "product_id", "quantity"
+        ):
+            lines[order_id][product_id] += quantity
+
+        product_ids = {pid for order_lines in lines.values() for pid in order_lines}
+        product_ids.discard(None)  # Lines whose product has since been deleted
+        products = {
+            product.pk: product
+            for product in Product.objects.filter(pk__in=product_ids).only(
+                "name", "stock_stripes"
+            )
+        }
+        striped = [pid for pid, product in products.items() if product.is_striped]
+        # Same primary-key lock order as Product.objects.lock_in_order(). A
+        # product striped since the read above is left out, and its lines
+        # are rejected rather than taken from the wrong counter.
+        available = dict(
+            Product.objects.select_for_update()
+            .filter(pk__in=product_ids.difference(striped), stock_stripes=0)
+            .order_by("pk")
+            .values_list("pk", "stock")
+        )
+        available.update(InventoryStripe.objects.totals(striped, lock=True))
+        remaining = dict(available)
+
+        accepted, rejected = [], []
+        for job in jobs:
+            order_lines = lines[job.order_id]
+            fits = all(
+                remaining.get(pid, 0) >= quantity
+                for pid, quantity in order_lines.items()
+            )
+            if fits:
+                for pid, quantity in order_lines.items():
+                    remaining[pid] -= quantity
+                accepted.append(job)
+            else:
+                short = next(
+                    pid
+                    for pid, quantity in order_lines.items()
+                    if remaining.get(pid, 0) < quantity
+                )
+                job.error = (
+                    f"Not enough stock for {products[short].name}."
+                    if short in products
+                    else "A product in this order is no longer available."
+                )
+                rejected.append(job)
+
+        taken = {
+            pid: available[pid] - left
+            for pid, left in remaining.items()
+            if available[pid] != left
+        }
+        Product.objects.decrement_stock(
+            {pid: qty for pid, qty in taken.items() if pid not in striped}
+        )
+        for pid in sorted(set(taken).intersection(striped)):
+            # The stripes are already locked and hold enough in total.
+            InventoryStripe.objects.take(pid, taken[pid])
+
+        now = timezone.now()
+        Order.objects.filter(pk__in=[job.order_id for job in accepted]).update(
+            status=Status.pending, updated_at=now
+        )
+        Order.objects.filter(pk__in=[job.order_id for job in rejected]).update(
+            status=Status.failed, updated_at=now
+        )
+        for job in jobs:
+            job.status = JobStatus.failed if job.error else JobStatus.done
+            job.processed_at = now
+        CheckoutJob.objects.bulk_update(jobs, ["status", "error", "processed_at"])
+    return len(jobs)
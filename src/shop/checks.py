@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+PER_PROCESS_CACHES = ("django.core.cache.backends.locmem.LocMemCache",)
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Catalog invalidation bumps a version stored in the cache, so every worker
+    must see the same cache: with a per-process one, the other workers keep
+    serving stale catalog responses until CATALOG_CACHE_TIMEOUT.
+    """
+    backend = settings.CACHES["default"]["BACKEND"]
+    if settings.WEB_CONCURRENCY > 1 and backend in PER_PROCESS_CACHES:
+        return [
+            Error(
+                f"WEB_CONCURRENCY is {settings.WEB_CONCURRENCY} but the default "
+                "cache is per-process, so catalog changes only invalidate the "
+                "worker that made them.",
+                hint="Set CACHE_URL to a shared cache, e.g. redis://redis:6379/1.",
+                id="shop.E001",
+            )
+        ]
+    return []
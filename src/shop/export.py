@@ -0,0 +1,127 @@
+import csv
+import json
+from datetime import datetime, time, timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from .models import Order, OrderItem
+
+# Orders fetched per round trip of the server-side cursor. Their items are
+# prefetched one chunk at a time, so memory is bounded by this, not by the
+# size of the export.
+CHUNK_SIZE = 2000
+
+CSV_HEADER = [
+    "order_id",
+    "created_at",
+    "user_email",
+    "status",
+    "total_price",
+    "item_id",
+    "product_id",
+    "product_name",
+    "category_name",
+    "quantity",
+    "unit_price",
+]
+
+CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def export_orders(start=None, end=None, status=None, chunk_size=CHUNK_SIZE):
+    """
+    Streams every matching order, oldest first, with its user and line items,
+    for orders placed from the `start` day through the `end` day.
+    """
+    orders = Order.objects.select_related("user").prefetch_related(
+        Prefetch(
+            "order_items",
+            queryset=OrderItem.objects.order_by("id").only(
+                "order_id",
+                "product_id",
+                "product_name",
+                "category_name",
+                "quantity",
+                "price",
+            ),
+        )
+    )
+    if start is not None:
+        orders = orders.filter(created_at__gte=_start_of(start))
+    if end is not None:
+        orders = orders.filter(created_at__lt=_start_of(end + timedelta(days=1)))
+    if status is not None:
+        orders = orders.filter(status=status)
+    return orders.order_by("created_at", "id").iterator(chunk_size=chunk_size)
+
+
+def _start_of(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+class Echo:
+    """A file-like object that hands back what is written, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(orders):
+    """One CSV row per order line; orders without lines get a single row."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+    for order in orders:
+        head = [
+            order.id,
+            order.created_at.isoformat(),
+            order.user.email,
+            order.status,
+            order.total_price,
+        ]
+        items = order.order_items.all()
+        if not items:
+            yield writer.writerow(head + [""] * (len(CSV_HEADER) - len(head)))
+        for item in items:
+            yield writer.writerow(
+                head
+                + [
+                    item.id,
+                    item.product_id or "",
+                    item.product_name,
+                    item.category_name,
+                    item.quantity,
+                    item.price,
+                ]
+            )
+
+
+def ndjson_lines(orders):
+    """One JSON document per order, with its lines nested, per line of output."""
+    for order in orders:
+        document = {
+            "id": order.id,
+            "created_at": order.created_at,
+            "user_email": order.user.email,
+            "status": order.status,
+            "total_price": order.total_price,
+            "order_items": [
+                {
+                    "id": item.id,
+                    "product_id": item.product_id,
+                    "product_name": item.product_name,
+                    "category_name": item.category_name,
+                    "quantity": item.quantity,
+                    "unit_price": item.price,
+                }
+                for item in order.order_items.all()
+            ],
+        }
+        yield json.dumps(document, cls=DjangoJSONEncoder) + "\n"
+
+
+WRITERS = {"csv": csv_lines, "ndjson": ndjson_lines}
@@ -1,6 +1,14 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from django.db import connections
+from django.db.models import F, Q
 from django_filters import rest_framework as filters
+from rest_framework.filters import BaseFilterBackend, SearchFilter
 from shop.models import Product
 
+# Must match the text search configuration used by the
+# shop_product_search_vector_update() trigger (see migration 0004).
+SEARCH_CONFIG = "english"
+
 
 class ProductFilter(filters.FilterSet):
 
@@ -10,3 +18,64 @@ class ProductFilter(filters.FilterSet):
     class Meta:
         model = Product
         fields = ['category']
+
+
+class ProductSearchFilter(SearchFilter):
+    """
+    Relevance-ranked product search.
+
+    On PostgreSQL, matches the precomputed weighted `search_vector` (name
+    ranked above description) or a trigram similarity on the name for
+    typo tolerance, both served by GIN indexes, and orders by rank.
+    Other databases fall back to DRF's ILIKE search over `search_fields`.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        if connections[queryset.db].vendor != "postgresql":
+            return super().filter_queryset(request, queryset, view)
+
+        search_terms = self.get_search_terms(request)
+        if not search_terms:
+            return queryset
+
+        text = " ".join(search_terms)
+        query = SearchQuery(text, config=SEARCH_CONFIG, search_type="websearch")
+        return (
+            queryset.annotate(
+                rank=SearchRank(F("search_vector"), query)
+                + TrigramSimilarity("name", text)
+            )
+            .filter(Q(search_vector=query) | Q(name__trigram_similar=text))
+            .order_by("-rank", "id")
+        )
+
+
+class PopularityOrderingFilter(BaseFilterBackend):
+    """
+    `?ordering=popular` lists the products that have sold, best-sellers
+    first by their decayed sales score (see ProductPopularity). The order
+    comes straight off the `shop_popularity_score_idx` index, so no sales
+    are aggregated per request.
+    """
+
+    ordering_param = "ordering"
+
+    def filter_queryset(self, request, queryset, view):
+        if request.query_params.get(self.ordering_param) != "popular":
+            return queryset
+        return (
+            queryset.filter(popularity__isnull=False)
+            .annotate(popularity_score=F("popularity__score"))
+            .order_by("-popularity_score", "-id")
+        )
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.ordering_param,
+                "required": False,
+                "in": "query",
+                "description": "`popular`: best-selling products first.",
+                "schema": {"type": "string", "enum": ["popular"]},
+            }
+        ]
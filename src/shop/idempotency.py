@@ -0,0 +1,183 @@
+import functools
+import hashlib
+import json
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+from django.utils import timezone
+from drf_spectacular.utils import OpenApiParameter
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = "Idempotency-Key"
+POLL_INTERVAL_SECONDS = 0.1
+
+# Documents the header on endpoints decorated with @idempotent
+IDEMPOTENCY_KEY_PARAMETER = OpenApiParameter(
+    name=HEADER,
+    type=str,
+    location=OpenApiParameter.HEADER,
+    required=False,
+    description=(
+        "Optional client-generated key (e.g. a UUID). Retries sent with the "
+        "same key get the original response instead of repeating the operation."
+    ),
+)
+
+
+def idempotent(view_method):
+    """
+    Makes a POST handler safe to retry with an `Idempotency-Key` header.
+
+    The first request with a given key (per user) runs normally and its
+    response is stored. Retries within IDEMPOTENCY_KEY_TTL_HOURS get that
+    response back without running the handler again; a retry that arrives
+    while the first request is still running waits up to
+    IDEMPOTENCY_WAIT_SECONDS for it to finish. A claim whose request never
+    finished (its worker was killed) is taken over after
+    IDEMPOTENCY_LEASE_SECONDS. Requests without the header are not affected.
+    """
+
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+
+        if len(key) > IdempotencyKey._meta.get_field("key").max_length:
+            return Response(
+                {"error": f"{HEADER} must be at most 255 characters."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        fingerprint = _fingerprint(request)
+        record, created = _claim(request.user, key, fingerprint)
+        if not created:
+            return _replay(record, fingerprint)
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except Exception:
+            # Nothing worth replaying; let the client retry for real.
+            record.delete()
+            raise
+
+        if response.status_code >= 500:
+            record.delete()
+        else:
+            # An update rather than save(): if the lease ran out and another
+            # request took the key over, there is no row left to write to.
+            IdempotencyKey.objects.filter(pk=record.pk).update(
+                response_status=response.status_code, response_body=response.data
+            )
+        return response
+
+    return wrapper
+
+
+def async_idempotent(view):
+    """
+    @idempotent for the plain async views in payment.async_views, which
+    take the request first and return a JsonResponse. The key is claimed
+    and recorded through sync_to_async; the semantics are the same.
+    """
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return await view(request, *args, **kwargs)
+
+        if len(key) > IdempotencyKey._meta.get_field("key").max_length:
+            return JsonResponse(
+                {"error": f"{HEADER} must be at most 255 characters."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        fingerprint = _fingerprint(request)
+        record, created = await sync_to_async(_claim)(request.user, key, fingerprint)
+        if not created:
+            return _replay(record, fingerprint, JsonResponse)
+
+        try:
+            response = await view(request, *args, **kwargs)
+        except Exception:
+            await record.adelete()
+            raise
+
+        if response.status_code >= 500:
+            await record.adelete()
+        else:
+            await IdempotencyKey.objects.filter(pk=record.pk).aupdate(
+                response_status=response.status_code,
+                response_body=json.loads(response.content),
+            )
+        return response
+
+    return wrapper
+
+
+def _fingerprint(request):
+    return hashlib.sha256(
+        b"\n".join([request.method.encode(), request.path.encode(), request.body])
+    ).hexdigest()
+
+
+def _claim(user, key, fingerprint):
+    """
+    Returns (record, created). Only one concurrent request can create the
+    record thanks to the (user, key) unique constraint; the others get the
+    in-flight or completed record back. Expired records, and in-flight ones
+    whose lease has run out, are replaced.
+    """
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+
+    while True:
+        record, created = IdempotencyKey.objects.get_or_create(
+            user=user, key=key, defaults={"request_fingerprint": fingerprint}
+        )
+        if created:
+            return record, True
+        now = timezone.now()
+        if record.response_status is None:
+            cutoff = now - timedelta(seconds=settings.IDEMPOTENCY_LEASE_SECONDS)
+        else:
+            cutoff = now - timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+        if record.created_at < cutoff:
+            # Conditional, so only one of several waiting retries wins it.
+            IdempotencyKey.objects.filter(
+                pk=record.pk,
+                response_status=record.response_status,
+                created_at__lt=cutoff,
+            ).delete()
+            continue
+        if record.response_status is not None or time.monotonic() >= deadline:
+            return record, False
+
+        # Coalesce onto the request that is already running: wait for it to
+        # finish (or fail and release the key) and look again.
+        time.sleep(POLL_INTERVAL_SECONDS)
+
+
+def _replay(record, fingerprint, response_class=Response):
+    if record.request_fingerprint != fingerprint:
+        return response_class(
+            {"error": f"This {HEADER} was already used for a different request."},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    if record.response_status is None:
+        return response_class(
+            {"error": f"A request with this {HEADER} is still being processed."},
+            status=status.HTTP_409_CONFLICT,
+            headers={"Retry-After": "1"},
+        )
+    return response_class(
+        record.response_body,
+        status=record.response_status,
+        headers={"Idempotent-Replayed": "true"},
+    )
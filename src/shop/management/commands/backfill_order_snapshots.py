@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+
+from shop.models import OrderItem
+
+
+class Command(BaseCommand):
+    help = (
+        "Fills the product snapshot (name, category, image) of order lines "
+        "placed before snapshots were recorded, in small batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of order lines updated per statement (default: 1000).",
+        )
+
+    def handle(self, *args, **options):
+        # Lines whose product was deleted have nothing left to copy.
+        pending = (
+            OrderItem.objects.filter(product_name="", product__isnull=False)
+            .select_related("product__category")
+            .only(
+                "product_name",
+                "category_name",
+                "product_image",
+                "product__name",
+                "product__image",
+                "product__category__name",
+            )
+            .order_by("pk")
+        )
+
+        # Walk the primary key instead of OFFSET so every batch is an index
+        # range scan, and each UPDATE stays short.
+        total, last_pk = 0, 0
+        while True:
+            batch = list(pending.filter(pk__gt=last_pk)[: options["batch_size"]])
+            if not batch:
+                break
+            for item in batch:
+                for field, value in OrderItem.snapshot(item.product).items():
+                    setattr(item, field, value)
+            OrderItem.objects.bulk_update(
+                batch, ["product_name", "category_name", "product_image"]
+            )
+            total += len(batch)
+            last_pk = batch[-1].pk
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Backfilled snapshots of {total} order lines.")
+        )
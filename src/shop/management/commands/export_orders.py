@@ -0,0 +1,45 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from shop.export import CHUNK_SIZE, WRITERS, export_orders
+from shop.models import OrderStatus
+
+
+class Command(BaseCommand):
+    help = "Writes orders with their line items as CSV or NDJSON, streaming."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--start", type=date.fromisoformat, help="First day, YYYY-MM-DD."
+        )
+        parser.add_argument(
+            "--end", type=date.fromisoformat, help="Last day, inclusive, YYYY-MM-DD."
+        )
+        parser.add_argument("--status", choices=OrderStatus.values)
+        parser.add_argument("--output-format", choices=sorted(WRITERS), default="csv")
+        parser.add_argument("--file", help="Path to write to (default: standard output).")
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=CHUNK_SIZE,
+            help=f"Orders fetched per cursor round trip (default: {CHUNK_SIZE}).",
+        )
+
+    def handle(self, *args, **options):
+        orders = export_orders(
+            start=options["start"],
+            end=options["end"],
+            status=options["status"],
+            chunk_size=options["chunk_size"],
+        )
+        lines = WRITERS[options["output_format"]](orders)
+
+        if options["file"] is None:
+            for line in lines:
+                self.stdout.write(line, ending="")
+            return
+
+        with open(options["file"], "w", newline="", encoding="utf-8") as out:
+            out.writelines(lines)
+        self.stderr.write(self.style.SUCCESS(f"Wrote {options['file']}."))
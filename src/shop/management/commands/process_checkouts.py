@@ -0,0 +1,76 @@
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from shop.checkout import process_checkout_batch
+
+
+class Command(BaseCommand):
+    help = "Settles queued (asynchronous) checkouts with a pool of worker threads."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="Number of worker threads, each with its own connection (default: 4).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=50,
+            help="Checkouts claimed and settled per transaction (default: 50).",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=0.5,
+            help="Seconds an idle worker waits before polling again (default: 0.5).",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Drain the queue and exit instead of polling forever.",
+        )
+
+    def handle(self, *args, **options):
+        self.processed = 0
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+
+        threads = [
+            threading.Thread(target=self.work, args=(options,), daemon=True)
+            for _ in range(options["workers"])
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=1)
+        except KeyboardInterrupt:
+            self.stopping.set()
+            for thread in threads:
+                thread.join()
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Processed {self.processed} queued checkouts.")
+        )
+
+    def work(self, options):
+        try:
+            while not self.stopping.is_set():
+                # Claims are SKIP LOCKED, so workers never wait on each other.
+                count = process_checkout_batch(options["batch_size"])
+                with self.lock:
+                    self.processed += count
+                if count:
+                    continue
+                if options["once"]:
+                    return
+                self.stopping.wait(options["poll_interval"])
+        finally:
+            # Each thread opened its own connection; don't leak it.
+            connection.close()
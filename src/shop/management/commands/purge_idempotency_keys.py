@@ -0,0 +1,43 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from shop.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = "Deletes expired idempotency keys in small batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of keys deleted per statement (default: 1000).",
+        )
+        parser.add_argument(
+            "--older-than-hours",
+            type=int,
+            default=settings.IDEMPOTENCY_KEY_TTL_HOURS,
+            help="Age in hours after which a key is purged (default: the TTL).",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options["older_than_hours"])
+        expired = IdempotencyKey.objects.filter(created_at__lt=cutoff).order_by("pk")
+
+        # Short DELETEs by primary key, driven by the created_at index, keep
+        # each statement's locks and WAL small on a busy table.
+        total = 0
+        while True:
+            batch = list(expired.values_list("pk", flat=True)[: options["batch_size"]])
+            if not batch:
+                break
+            deleted, _ = IdempotencyKey.objects.filter(pk__in=batch).delete()
+            total += deleted
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Purged {total} expired idempotency keys.")
+        )
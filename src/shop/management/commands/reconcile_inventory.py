@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from shop.cache import bump_catalog_version
+from shop.models import InventoryStripe
+
+
+class Command(BaseCommand):
+    help = "Copies each striped product's stripe total onto Product.stock."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=float,
+            help="Keep running, reconciling every INTERVAL seconds.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            with transaction.atomic():
+                changed = InventoryStripe.objects.reconcile()
+                if changed:
+                    # bulk_update() sends no signals.
+                    transaction.on_commit(bump_catalog_version)
+
+            self.stdout.write(
+                self.style.SUCCESS(f"Reconciled stock of {changed} striped products.")
+            )
+            if options["interval"] is None:
+                return
+            time.sleep(options["interval"])
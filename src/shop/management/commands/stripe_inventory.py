@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from shop.models import InventoryStripe, Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Splits a hot product's stock across N inventory stripes so concurrent "
+        "checkouts stop queueing on its row (0 stripes folds it back)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("product_id", type=int, help="Product to (re)stripe.")
+        parser.add_argument(
+            "--stripes",
+            type=int,
+            required=True,
+            help="Number of stripes; roughly the concurrent buyers to serve.",
+        )
+        parser.add_argument(
+            "--stock",
+            type=int,
+            help="New total stock to spread (default: keep the current total).",
+        )
+
+    def handle(self, *args, **options):
+        if options["stripes"] < 0:
+            raise CommandError("--stripes must be 0 or more.")
+        if options["stock"] is not None and options["stock"] < 0:
+            raise CommandError("--stock must be 0 or more.")
+
+        try:
+            product = Product.objects.get(pk=options["product_id"])
+        except Product.DoesNotExist:
+            raise CommandError(f"Product {options['product_id']} does not exist.")
+
+        with transaction.atomic():
+            product = InventoryStripe.objects.restripe(
+                product, options["stripes"], stock=options["stock"]
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{product.name}: {product.stock} units over "
+                f"{product.stock_stripes} stripes."
+            )
+        )
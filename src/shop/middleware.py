@@ -0,0 +1,51 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.utils.functional import SimpleLazyObject
+
+from .models import Cart
+
+
+def get_cart(request):
+    """
+    Returns the authenticated user's cart, creating it if needed, and memoizes
+    it on the request so it is resolved at most once per request.
+    """
+    if not hasattr(request, "_cached_cart"):
+        user = request.user
+        if user.is_authenticated:
+            request._cached_cart, _ = Cart.objects.get_or_create(user=user)
+        else:
+            request._cached_cart = None
+    return request._cached_cart
+
+
+class CartMiddleware:
+    """
+    Attaches a lazily resolved `request.cart`.
+
+    Nothing is queried unless a view touches `request.cart`. DRF views see the
+    same attribute through their Request wrapper, and by the time they touch
+    it DRF has already written the token-authenticated user back onto the
+    underlying request.
+
+    Runs in either mode, so under ASGI it does not push the request into a
+    thread. Resolving the cart queries the ORM, so async views must not touch
+    `request.cart`.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request.cart = SimpleLazyObject(lambda: get_cart(request))
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        request.cart = SimpleLazyObject(lambda: get_cart(request))
+        return await self.get_response(request)
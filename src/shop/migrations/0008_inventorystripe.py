@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-18 06:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0007_checkoutjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='stock_stripes',
+            field=models.PositiveSmallIntegerField(default=0, help_text="Number of InventoryStripe rows holding this product's stock. 0 keeps the stock on this row; set it with the stripe_inventory command."),
+        ),
+        migrations.CreateModel(
+            name='InventoryStripe',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveSmallIntegerField()),
+                ('stock', models.PositiveIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory_stripes', to='shop.product')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('product', 'index'), name='shop_inventorystripe_product_index'), models.CheckConstraint(condition=models.Q(('stock__gte', 0)), name='shop_inventorystripe_stock_gte_0')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-18 07:28
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0012_order_created_idx'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='product',
+            name='shop_product_stock_gte_0',
+        ),
+    ]
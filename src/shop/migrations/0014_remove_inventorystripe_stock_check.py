@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-18 07:31
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0013_remove_product_stock_check'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='inventorystripe',
+            name='shop_inventorystripe_stock_gte_0',
+        ),
+    ]
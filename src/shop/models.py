@@ -1,9 +1,20 @@
-from django.db import models
+import logging
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from django.conf import settings
+from django.db import connections, models, router
+from django.db.models import F, Sum, Value
+from django.db.models.functions import Coalesce
+from django.contrib.postgres.search import SearchVectorField
+from django.utils import timezone
 from django.utils.text import slugify
 from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
 
 User = get_user_model()
 
+logger = logging.getLogger(__name__)
+
 # Create your models here.
 
 
@@ -13,6 +24,16 @@ class Status(models.TextChoices):
     failed = "failed", "failed"
 
 
+class OrderStatus(models.TextChoices):
+    """Status plus the states only an order goes through."""
+
+    pending = "pending", "pending"
+    success = "success", "success"
+    failed = "failed", "failed"
+    # Accepted for asynchronous checkout, stock not yet reserved
+    queued = "queued", "queued"
+
+
 class Category(models.Model):
     name = models.CharField(max_length=155, null=False, blank=False, unique=True)
     slug = models.SlugField(
@@ -38,6 +59,59 @@ class Category(models.Model):
         return self.name
 
 
+class ProductManager(models.Manager):
+    def lock_in_order(self, product_ids, nowait=False):
+        """
+        Row-locks the given products in primary-key order.
+
+        Every checkout acquires its locks in the same order, so two baskets
+        that share products queue behind each other instead of deadlocking.
+        Must be called inside a transaction.
+        """
+        return list(
+            self.select_for_update(nowait=nowait)
+            .filter(pk__in=product_ids)
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+
+    def decrement_stock(self, quantities):
+        """
+        Takes `quantities` ({product_id: units}) out of stock in one statement.
+
+        Runs a single set-based
+        `UPDATE ... SET stock = stock - v.qty FROM (VALUES ...) v WHERE stock >= v.qty`
+        and returns {product_id: price} for the rows it changed, read under
+        the same row locks. A product without enough stock is simply not
+        updated, so callers detect overselling by comparing the number of
+        returned rows with the number of requested products, and must roll
+        back the transaction when they differ.
+
+        Striped products are never updated here; their units are taken from
+        InventoryStripe rows instead.
+        """
+        if not quantities:
+            return {}
+
+        table = self.model._meta.db_table
+        values = ", ".join(["(%s, %s)"] * len(quantities))
+        sql = f"""
+            WITH requested (id, qty) AS (VALUES {values})
+            UPDATE {table}
+            SET stock = {table}.stock - requested.qty, updated_at = %s
+            FROM requested
+            WHERE {table}.id = requested.id AND {table}.stock >= requested.qty
+                AND {table}.stock_stripes = 0
+            RETURNING {table}.id, {table}.price
+        """
+        params = [value for item in sorted(quantities.items()) for value in item]
+        params.append(timezone.now())
+
+        # raw() applies the model's field converters to the RETURNING columns.
+        rows = self.raw(sql, params, using=router.db_for_write(self.model))
+        return {product.id: product.price for product in rows}
+
+
 class Product(models.Model):
     name = models.CharField(max_length=155)
     description = models.TextField()
@@ -53,22 +127,332 @@ class Product(models.Model):
         default=0, help_text="The number of units available in stock."
     )
     image = models.URLField(max_length=1024, blank=True, null=True)
+    stock_stripes = models.PositiveSmallIntegerField(
+        default=0,
+        help_text="Number of InventoryStripe rows holding this product's stock. "
+        "0 keeps the stock on this row; set it with the stripe_inventory command.",
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        help_text="Weighted name/description tsvector, maintained by a database trigger on PostgreSQL.",
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ProductManager()
+
+    class Meta:
+        indexes = [
+            # Keyset pagination key for the catalog (see ProductCursorPagination)
+            models.Index(
+                fields=["created_at", "id"], name="shop_product_created_id_idx"
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
+    @property
+    def is_striped(self):
+        return self.stock_stripes > 0
+
+
+class InventoryStripeManager(models.Manager):
+    def take(self, product_id, quantity, nowait=False):
+        """
+        Takes `quantity` units of a striped product out of stock.
+
+        Picks a random stripe that can cover the whole quantity, skipping
+        stripes locked by other checkouts, so concurrent buyers of the same
+        product spread over different rows instead of queueing on one. Only
+        when no free stripe is big enough are all the product's stripes
+        locked (in index order) and drained one after another.
+
+        Returns False, changing nothing, if the stripes together do not hold
+        `quantity` units. Must be called inside a transaction.
+        """
+        stripe_id = (
+            self.select_for_update(skip_locked=True)
+            .filter(product_id=product_id, stock__gte=quantity)
+            .order_by("?")
+            .values_list("pk", flat=True)
+            .first()
+        )
+        if stripe_id is not None:
+            self.filter(pk=stripe_id).update(stock=F("stock") - quantity)
+            return True
+
+        stripes = list(
+            self.select_for_update(nowait=nowait)
+            .filter(product_id=product_id, stock__gt=0)
+            .order_by("index")
+        )
+        if sum(stripe.stock for stripe in stripes) < quantity:
+            return False
+        changed = []
+        for stripe in stripes:
+            units = min(stripe.stock, quantity)
+            stripe.stock -= units
+            quantity -= units
+            changed.append(stripe)
+            if not quantity:
+                break
+        self.bulk_update(changed, ["stock"])
+        return True
+
+    def totals(self, product_ids, lock=False):
+        """
+        Returns {product_id: units} summed over the products' stripes. With
+        `lock`, every stripe is row-locked (in product, index order) first.
+        """
+        stripes = self.filter(product_id__in=product_ids)
+        if lock:
+            stripes = stripes.select_for_update().order_by("product_id", "index")
+        totals = dict.fromkeys(product_ids, 0)
+        for product_id, stock in stripes.values_list("product_id", "stock"):
+            totals[product_id] += stock
+        return totals
+
+    def restripe(self, product, stripes, stock=None):
+        """
+        Spreads the product's stock evenly over `stripes` rows (0 folds it
+        back onto the product row). The current total is kept unless a new
+        `stock` is given. Must be called inside a transaction.
+        """
+        product = Product.objects.select_for_update().get(pk=product.pk)
+        if stock is None:
+            if product.is_striped:
+                stock = self.totals([product.pk], lock=True)[product.pk]
+            else:
+                stock = product.stock
+
+        self.filter(product=product).delete()
+        self.bulk_create(
+            InventoryStripe(
+                product=product,
+                index=index,
+                stock=stock // stripes + (1 if index < stock % stripes else 0),
+            )
+            for index in range(stripes)
+        )
+        product.stock = stock
+        product.stock_stripes = stripes
+        product.save(update_fields=["stock", "stock_stripes", "updated_at"])
+        return product
+
+    def reconcile(self):
+        """
+        Copies each striped product's stripe total onto `Product.stock`, the
+        figure shown in the catalog and checked when adding to the cart.
+        Returns the number of products whose stock changed.
+        """
+        products = list(
+            Product.objects.filter(stock_stripes__gt=0).only("stock", "updated_at")
+        )
+        totals = self.totals([product.pk for product in products])
+        changed = []
+        for product in products:
+            if product.stock != totals[product.pk]:
+                product.stock = totals[product.pk]
+                product.updated_at = timezone.now()
+                changed.append(product)
+        Product.objects.bulk_update(changed, ["stock", "updated_at"])
+        return len(changed)
+
+
+class InventoryStripe(models.Model):
+    """
+    One slice of a hot product's stock. Checkouts of a striped product take
+    units from a random stripe rather than from `Product.stock`, so buyers of
+    the same product no longer serialize on a single row lock; throughput
+    scales with the number of stripes. `Product.stock` is then a periodically
+    reconciled total (see the reconcile_inventory command).
+    """
+
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="inventory_stripes"
+    )
+    index = models.PositiveSmallIntegerField()
+    stock = models.PositiveIntegerField(default=0)
+
+    objects = InventoryStripeManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["product", "index"], name="shop_inventorystripe_product_index"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} stripe {self.index}: {self.stock}"
+
+
+class ProductPopularityManager(models.Manager):
+    # 2 ** 1024 overflows a float. Capping the exponent well below that
+    # leaves room for the scores to add up.
+    MAX_DECAY_EXPONENT = 512
+
+    def decay_weight(self, at):
+        """
+        Forward-decay weight of a sale made at `at`: 2 ** (age / half-life),
+        where age is measured from the fixed POPULARITY_EPOCH. A sale one
+        half-life newer weighs twice as much, so ranking the accumulated
+        scores ranks recency-weighted sales without ever rewriting old rows.
+
+        Past MAX_DECAY_EXPONENT half-lives the weight stops growing, so
+        recording a sale never fails; move POPULARITY_EPOCH forward and run
+        `rebuild_popularity` to restore the decay.
+        """
+        epoch = datetime.combine(settings.POPULARITY_EPOCH, time.min, dt_timezone.utc)
+        half_life = timedelta(days=settings.POPULARITY_HALF_LIFE_DAYS)
+        exponent = (at - epoch) / half_life
+        if exponent > self.MAX_DECAY_EXPONENT:
+            logger.warning(
+                "Sales are %d half-lives past POPULARITY_EPOCH; move it forward "
+                "and run rebuild_popularity.",
+                exponent,
+            )
+            exponent = self.MAX_DECAY_EXPONENT
+        return 2.0**exponent
+
+    def record_sale(self, order):
+        """Adds the units of a paid order to its products' scores."""
+        quantities = (
+            order.order_items.exclude(product=None)
+            .values_list("product_id")
+            .annotate(units=Sum("quantity"))
+        )
+        # The cached popular ordering catches up on its own, shorter timeout
+        # (POPULARITY_CACHE_TIMEOUT) rather than on a catalog version bump.
+        self.increment(dict(quantities), timezone.now())
+
+    def increment(self, quantities, at):
+        """
+        Adds `quantities` ({product_id: units}) sold at `at` to the scores in
+        one INSERT ... ON CONFLICT DO UPDATE.
+        """
+        if not quantities:
+            return
+
+        table = self.model._meta.db_table
+        weight = self.decay_weight(at)
+        values = ", ".join(["(%s, %s, %s)"] * len(quantities))
+        sql = f"""
+            INSERT INTO {table} (product_id, score, updated_at)
+            VALUES {values}
+            ON CONFLICT (product_id) DO UPDATE
+            SET score = {table}.score + EXCLUDED.score,
+                updated_at = EXCLUDED.updated_at
+        """
+        params = [
+            value
+            for product_id, units in sorted(quantities.items())
+            for value in (product_id, units * weight, at)
+        ]
+
+        connection = connections[router.db_for_write(self.model)]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+
+class ProductPopularity(models.Model):
+    """
+    Exponentially decayed sales score of a product, behind the catalog's
+    `?ordering=popular`. Scores only ever grow; see decay_weight().
+    """
+
+    product = models.OneToOneField(
+        Product, on_delete=models.CASCADE, primary_key=True, related_name="popularity"
+    )
+    score = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ProductPopularityManager()
+
+    class Meta:
+        verbose_name_plural = "Product popularity"
+        indexes = [
+            # Best-sellers first (see PopularityOrderingFilter)
+            models.Index(
+                fields=["-score", "-product"], name="shop_popularity_score_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}: {self.score}"
+
+
+class CartQuerySet(models.QuerySet):
+    def with_total_price(self):
+        """Annotates `total_price`, the sum of price x quantity over the cart's items."""
+        return self.annotate(
+            total_price=Coalesce(
+                Sum(
+                    F("cart_items__product__price") * F("cart_items__quantity"),
+                    output_field=models.DecimalField(max_digits=12, decimal_places=2),
+                ),
+                Value(Decimal("0.00")),
+                output_field=models.DecimalField(max_digits=12, decimal_places=2),
+            )
+        )
+
+    def with_items(self):
+        """Prefetches the cart's items together with their products in one query."""
+        return self.prefetch_related(
+            models.Prefetch(
+                "cart_items",
+                queryset=CartItem.objects.select_related("product").order_by("id"),
+            )
+        )
+
 
 class Cart(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="cart")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CartQuerySet.as_manager()
+
     def __str__(self):
         return f"Cart for {self.user.username}"
 
 
+class CartItemManager(models.Manager):
+    def add_or_increment(self, cart, product_id, quantity):
+        """
+        Adds `quantity` of a product to the cart in a single statement.
+
+        Inserts the line, or bumps the existing line's quantity, only while
+        the resulting quantity still fits in the product's stock. Because the
+        check and the write happen in one INSERT ... ON CONFLICT DO UPDATE,
+        concurrent adds to the same cart line cannot lose updates or push the
+        line past the available stock.
+
+        Returns the id of the cart item, or None if the product does not exist
+        or does not have enough stock.
+        """
+        item_table = self.model._meta.db_table
+        product_table = Product._meta.db_table
+        sql = f"""
+            INSERT INTO {item_table} (cart_id, product_id, quantity)
+            SELECT %s, product.id, %s
+            FROM {product_table} AS product
+            WHERE product.id = %s AND product.stock >= %s
+            ON CONFLICT (cart_id, product_id) DO UPDATE
+            SET quantity = {item_table}.quantity + EXCLUDED.quantity
+            WHERE {item_table}.quantity + EXCLUDED.quantity <= (
+                SELECT stock FROM {product_table} WHERE id = EXCLUDED.product_id
+            )
+            RETURNING id
+        """
+        with connections[router.db_for_write(self.model)].cursor() as cursor:
+            cursor.execute(sql, [cart.id, quantity, product_id, quantity])
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+
 class CartItem(models.Model):
     quantity = models.PositiveIntegerField(default=1)
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name="cart_items")
@@ -76,6 +460,8 @@ class CartItem(models.Model):
         Product, on_delete=models.CASCADE, related_name="cart_items"
     )
 
+    objects = CartItemManager()
+
     class Meta:
         unique_together = ("cart", "product")
 
@@ -83,19 +469,108 @@ class CartItem(models.Model):
         return f"{self.quantity} x {self.product.name}"
 
 
+class OrderManager(models.Manager):
+    def mark_paid(self, order_id):
+        """
+        Moves a pending order to `success` with one guarded
+        `UPDATE ... WHERE status = 'pending' RETURNING ...`.
+
+        Returns the order (only `id` and `created_at` loaded) if this call
+        made the transition, or None if the order was not pending.
+        """
+        orders = self.mark_paid_many([order_id])
+        return orders[0] if orders else None
+
+    def mark_paid_many(self, order_ids):
+        """
+        Batch form of mark_paid: one guarded UPDATE for all of `order_ids`.
+        Returns the orders this call moved to `success`.
+        """
+        if not order_ids:
+            return []
+
+        table = self.model._meta.db_table
+        placeholders = ", ".join(["%s"] * len(order_ids))
+        sql = f"""
+            UPDATE {table}
+            SET status = %s, updated_at = %s
+            WHERE id IN ({placeholders}) AND status = %s
+            RETURNING id, created_at
+        """
+        params = [Status.success, timezone.now(), *order_ids, Status.pending]
+        return list(self.raw(sql, params, using=router.db_for_write(self.model)))
+
+
 class Order(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="orders")
     total_price = models.DecimalField(max_digits=11, decimal_places=2)
     status = models.CharField(
-        max_length=20, choices=Status.choices, default=Status.pending
+        max_length=20, choices=OrderStatus.choices, default=OrderStatus.pending
     )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = OrderManager()
+
+    class Meta:
+        indexes = [
+            # A user's order history, newest first (see OrderCursorPagination)
+            models.Index(
+                fields=["user", "-created_at", "-id"],
+                name="shop_order_user_created_idx",
+            ),
+            # Date-range scans across all users (exports, reports)
+            models.Index(fields=["created_at", "id"], name="shop_order_created_idx"),
+        ]
+
     def __str__(self):
         return f"Order {self.id} by {self.user.username}"
 
 
+class CheckoutJob(models.Model):
+    """
+    A queued checkout, processed by the `process_checkouts` worker when
+    CHECKOUT_MODE is "async".
+    """
+
+    class JobStatus(models.TextChoices):
+        queued = "queued", "queued"
+        done = "done", "done"
+        failed = "failed", "failed"
+
+    order = models.OneToOneField(
+        Order, on_delete=models.CASCADE, related_name="checkout_job"
+    )
+    status = models.CharField(
+        max_length=20, choices=JobStatus.choices, default=JobStatus.queued
+    )
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Workers claim the oldest queued jobs with SKIP LOCKED.
+            models.Index(
+                fields=["id"],
+                condition=models.Q(status="queued"),
+                name="shop_checkoutjob_queued_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Checkout job for order {self.order_id} ({self.status})"
+
+
+class OrderItemQuerySet(models.QuerySet):
+    def with_product_stock(self):
+        """
+        Annotates `product_stock`, the live stock of the line's product (None
+        once the product is deleted); it is not part of the snapshot.
+        """
+        return self.annotate(product_stock=F("product__stock"))
+
+
 class OrderItem(models.Model):
     quantity = models.PositiveIntegerField(default=1)
     price = models.DecimalField(max_digits=10, decimal_places=2)
@@ -105,6 +580,52 @@ class OrderItem(models.Model):
     product = models.ForeignKey(
         Product, on_delete=models.SET_NULL, null=True, related_name="order_items"
     )
+    # Snapshot of the product as it was sold, so orders render from the order
+    # tables alone and survive later edits or deletion of the product.
+    product_name = models.CharField(max_length=155, blank=True, default="")
+    category_name = models.CharField(max_length=155, blank=True, default="")
+    product_image = models.URLField(max_length=1024, blank=True, null=True)
+
+    objects = OrderItemQuerySet.as_manager()
+
+    @staticmethod
+    def snapshot(product):
+        """The snapshot fields for a line of `product` (with its category loaded)."""
+        return {
+            "product_name": product.name,
+            "category_name": product.category.name,
+            "product_image": product.image,
+        }
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_name or 'Deleted Product'}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    The stored outcome of a request sent with an `Idempotency-Key` header,
+    replayed to retries of the same request (see shop.idempotency).
+    """
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="idempotency_keys"
+    )
+    key = models.CharField(max_length=255)
+    request_fingerprint = models.CharField(
+        max_length=64, help_text="SHA-256 of the method, path and body."
+    )
+    response_status = models.PositiveSmallIntegerField(
+        null=True, blank=True, help_text="Empty while the first request is in flight."
+    )
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "key"], name="shop_idempotencykey_user_key"
+            ),
+        ]
 
     def __str__(self):
-        return f"{self.quantity} x {self.product.name if self.product else 'Deleted Product'}"
+        return f"Idempotency key {self.key} for {self.user}"
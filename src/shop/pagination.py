@@ -0,0 +1,27 @@
+from rest_framework.pagination import CursorPagination
+
+
+class ProductCursorPagination(CursorPagination):
+    """
+    Keyset pagination for the product catalog.
+
+    Pages are addressed by an opaque cursor over the `(created_at, id)` key
+    instead of an OFFSET, and no COUNT(*) is issued, so fetching page 500
+    costs the same as fetching page 1. Backed by the
+    `shop_product_created_id_idx` composite index.
+    """
+
+    ordering = ("created_at", "id")
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+
+class OrderCursorPagination(CursorPagination):
+    """
+    Keyset pagination for a user's order history, newest first, backed by
+    the `shop_order_user_created_idx` index on (user, -created_at, -id).
+    """
+
+    ordering = ("-created_at", "-id")
+    page_size_query_param = "page_size"
+    max_page_size = 100
@@ -1,10 +1,20 @@
+from django.conf import settings
 from django.db import transaction
-from django.db.models import F
+from django.db.models import Prefetch, prefetch_related_objects
 from drf_spectacular.utils import extend_schema_field
-from decimal import Decimal
 from rest_framework import serializers
-from .models import Product, Category, Cart, CartItem, OrderItem, Order, Status
-from django.db import transaction
+from .checkout import OutOfStock, enqueue_order, place_order
+from .models import (
+    Product,
+    Category,
+    Cart,
+    CartItem,
+    InventoryStripe,
+    OrderItem,
+    Order,
+    OrderStatus,
+    Status,
+)
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -26,6 +36,18 @@ class ProductWriteSerializer(serializers.ModelSerializer):
         model = Product
         fields = ["name", "description", "price", "stock", "category", "image"]
 
+    def update(self, instance, validated_data):
+        if not instance.is_striped or "stock" not in validated_data:
+            return super().update(instance, validated_data)
+
+        # A striped product's stock lives in its stripes; restock those.
+        stock = validated_data.pop("stock")
+        with transaction.atomic():
+            instance = super().update(instance, validated_data)
+            return InventoryStripe.objects.restripe(
+                instance, instance.stock_stripes, stock=stock
+            )
+
 
 class ProductListSerializer(serializers.ModelSerializer):
     # Use a simpler representation for the category in lists
@@ -46,10 +68,36 @@ class ProductDetailSerializer(serializers.ModelSerializer):
         fields = ["id", "name", "description", "price", "stock", "category", "image"]
 
 
+class OrderedProductSerializer(serializers.Serializer):
+    """
+    The product of an order line, in ProductListSerializer's shape: name,
+    category and image as they were when the order was placed, the price
+    the line was sold at, and the product's current stock (from the
+    `with_product_stock()` annotation).
+    """
+
+    id = serializers.IntegerField(source="product_id")
+    name = serializers.CharField(source="product_name")
+    price = serializers.DecimalField(max_digits=10, decimal_places=2)
+    stock = serializers.IntegerField(source="product_stock")
+    category = serializers.CharField(source="category_name")
+    image = serializers.URLField(source="product_image", allow_null=True)
+
+    def get_attribute(self, instance):
+        # A deleted product renders as null.
+        if instance.product_id is None:
+            return None
+        return super().get_attribute(instance)
+
+
 class OrderItemSerializer(serializers.ModelSerializer):
-    """Read-only serializer for items within an order."""
+    """
+    Read-only serializer for items within an order. Renders from the line's
+    snapshot, so no category rows are read; expects its queryset to come
+    from OrderItem.objects.with_product_stock().
+    """
 
-    product = ProductListSerializer(read_only=True)
+    product = OrderedProductSerializer(source="*", read_only=True, allow_null=True)
 
     class Meta:
         model = OrderItem
@@ -67,6 +115,35 @@ class OrderSerializer(serializers.ModelSerializer):
         fields = ["id", "user", "created_at", "total_price", "status", "order_items"]
 
 
+class OrderSummarySerializer(serializers.ModelSerializer):
+    """Order history row without the items; expects an `item_count` annotation."""
+
+    item_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Order
+        fields = ["id", "created_at", "total_price", "status", "item_count"]
+
+
+class OrderStatusSerializer(serializers.ModelSerializer):
+    """A lightweight view of an order's checkout progress, cheap to poll."""
+
+    error = serializers.CharField(source="checkout_job.error", read_only=True)
+
+    class Meta:
+        model = Order
+        fields = ["id", "status", "error"]
+
+
+class OrderExportQuerySerializer(serializers.Serializer):
+    """Validates the query string of the order export."""
+
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    status = serializers.ChoiceField(choices=OrderStatus.choices, required=False)
+    output = serializers.ChoiceField(choices=["csv", "ndjson"], default="csv")
+
+
 class CreateOrderSerializer(serializers.ModelSerializer):
     """
     Handles the creation of an order from a cart. Inherits from ModelSerializer
@@ -84,57 +161,36 @@ class CreateOrderSerializer(serializers.ModelSerializer):
         fields = ["id", "user", "created_at", "total_price", "status", "order_items"]
         read_only_fields = fields  # Mark all as read-only for the output
 
+    def to_representation(self, instance):
+        prefetch_related_objects(
+            [instance],
+            Prefetch(
+                "order_items",
+                queryset=OrderItem.objects.with_product_stock().order_by("id"),
+            ),
+        )
+        return super().to_representation(instance)
+
     # We move the logic from `save()` to `create()`
     def create(self, validated_data):
         cart = self.context["cart"]
         user = self.context["user"]
-        cart_items = cart.cart_items.all()
+        cart_items = list(cart.cart_items.select_related("product__category"))
 
         if not cart_items:
             raise serializers.ValidationError(
                 "Your cart is empty. Cannot create an order."
             )
 
-        with transaction.atomic():
-            # (Using the more robust version of this logic)
-            product_ids = [item.product_id for item in cart_items]
-            products = Product.objects.select_for_update().filter(id__in=product_ids)
-            product_map = {p.id: p for p in products}
-
-            total_price = sum(
-                product_map[item.product_id].price * item.quantity
-                for item in cart_items
-            )
+        if settings.CHECKOUT_MODE == "async":
+            return enqueue_order(user, cart, cart_items)
 
-            # The ModelSerializer's .create() method is expected to create and return the instance
-            order = Order.objects.create(
-                user=user, total_price=total_price, status=Status.pending
-            )
-
-            order_items_to_create = []
-            for item in cart_items:
-                product = product_map[item.product_id]
-                if item.quantity > product.stock:
-                    raise serializers.ValidationError(
-                        f"Not enough stock for {product.name}."
-                    )
-
-                order_items_to_create.append(
-                    OrderItem(
-                        order=order,
-                        product=product,
-                        quantity=item.quantity,
-                        price=product.price,
-                    )
-                )
-                product.stock = F("stock") - item.quantity
-                product.save(update_fields=["stock"])
-
-            OrderItem.objects.bulk_create(order_items_to_create)
+        quantities = {item.product_id: item.quantity for item in cart_items}
 
-            cart_items.delete()
-
-            return order
+        try:
+            return place_order(user, cart, quantities)
+        except OutOfStock as exc:
+            raise serializers.ValidationError(str(exc))
 
 
 class CartItemProductSerializer(serializers.ModelSerializer):
@@ -160,60 +216,66 @@ class CartItemSerializer(serializers.ModelSerializer):
 
     def validate(self, data):
         """
-        Validates against available product stock before creating or updating.
+        Validates the new quantity against available product stock on update.
+        Adding items goes through AddCartItemSerializer instead.
         """
-        quantity_requested = data["quantity"]
-        product = data["product"]
-
-        # Check if this is an update (self.instance exists) or a create
-        if self.instance:
-            # This is a PATCH request (update).
-            # The validation is simple: the new quantity cannot exceed the total stock.
-            if quantity_requested > product.stock:
-                raise serializers.ValidationError(
-                    f"Not enough stock for {product.name}. "
-                    f"Available: {product.stock}, Requested: {quantity_requested}"
-                )
-        else:
-            # This is a POST request (create).
-            # We need to check if the item is already in the cart.
-            current_quantity_in_cart = 0
-            try:
-                cart_item = CartItem.objects.get(
-                    cart=self.context["cart"], product=product
-                )
-                current_quantity_in_cart = cart_item.quantity
-            except CartItem.DoesNotExist:
-                pass  # Item is not in the cart yet.
+        quantity_requested = data.get("quantity", self.instance.quantity)
+        product = data.get("product", self.instance.product)
 
-            total_requested_quantity = current_quantity_in_cart + quantity_requested
-            if total_requested_quantity > product.stock:
-                raise serializers.ValidationError(
-                    f"Not enough stock for {product.name}. "
-                    f"Available: {product.stock}, Requested: {total_requested_quantity}"
-                )
+        if quantity_requested > product.stock:
+            raise serializers.ValidationError(
+                f"Not enough stock for {product.name}. "
+                f"Available: {product.stock}, Requested: {quantity_requested}"
+            )
 
         return data
 
-    def create(self, validated_data):
-        # Get the user's cart from the context passed by the view
-        cart = self.context["cart"]
-        product = validated_data.get("product")
-        quantity = validated_data.get("quantity")
 
-        # Use get_or_create to find or create a cart item
-        # This prevents the IntegrityError
-        cart_item, created = CartItem.objects.get_or_create(
-            cart=cart, product=product, defaults={"quantity": quantity}
-        )
+class AddCartItemSerializer(serializers.ModelSerializer):
+    """
+    Adds a product to the cart, or increases the quantity if it is already
+    there, with a single upsert that also enforces the stock limit.
+    """
 
-        # If the item was not created, it means it already existed.
-        # In this case, we update its quantity.
-        if not created:
-            cart_item.quantity += quantity
-            cart_item.save()
+    product_id = serializers.IntegerField(write_only=True)
 
-        return cart_item
+    class Meta:
+        model = CartItem
+        fields = ["product_id", "quantity"]
+        extra_kwargs = {"quantity": {"min_value": 1}}
+
+    def create(self, validated_data):
+        cart = validated_data["cart"]
+        product_id = validated_data["product_id"]
+        quantity = validated_data.get("quantity", 1)
+
+        cart_item_id = CartItem.objects.add_or_increment(cart, product_id, quantity)
+        if cart_item_id is None:
+            # Only the failure path pays for the extra reads needed to explain it.
+            product = Product.objects.filter(pk=product_id).first()
+            if product is None:
+                raise serializers.ValidationError(
+                    {
+                        "product_id": [
+                            f'Invalid pk "{product_id}" - object does not exist.'
+                        ]
+                    }
+                )
+            in_cart = (
+                CartItem.objects.filter(cart=cart, product=product)
+                .values_list("quantity", flat=True)
+                .first()
+                or 0
+            )
+            raise serializers.ValidationError(
+                f"Not enough stock for {product.name}. "
+                f"Available: {product.stock}, Requested: {in_cart + quantity}"
+            )
+
+        return CartItem.objects.select_related("product").get(pk=cart_item_id)
+
+    def to_representation(self, instance):
+        return CartItemSerializer(instance, context=self.context).data
 
 
 class CartSerializer(serializers.ModelSerializer):
@@ -230,8 +292,12 @@ class CartSerializer(serializers.ModelSerializer):
 
     @extend_schema_field(serializers.DecimalField(max_digits=10, decimal_places=2))
     def get_total_price(self, cart: Cart):
-
-        if not cart.cart_items.exists():
-            return Decimal("0.00")
-
-        return sum(item.product.price * item.quantity for item in cart.cart_items.all())
+        # Computed by the database; see CartQuerySet.with_total_price().
+        total_price = getattr(cart, "total_price", None)
+        if total_price is None:
+            total_price = (
+                Cart.objects.with_total_price()
+                .values_list("total_price", flat=True)
+                .get(pk=cart.pk)
+            )
+        return total_price
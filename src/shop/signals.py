@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import bump_catalog_version
+from .models import Cart, Category, Product
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_catalog_cache(sender, **kwargs):
+    # Bump once the change is committed; bumping earlier would let a
+    # concurrent read re-cache the old rows under the new version.
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def create_cart_for_new_user(sender, instance, created, **kwargs):
+    # Every user gets a cart at signup, so resolving request.cart later is a
+    # plain lookup rather than a get-or-create race.
+    if created:
+        Cart.objects.get_or_create(user=instance)
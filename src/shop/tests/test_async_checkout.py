@@ -0,0 +1,81 @@
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from django.contrib.auth import get_user_model
+from shop.checkout import process_checkout_batch
+from shop.models import (
+    Category,
+    Product,
+    Cart,
+    CartItem,
+    CheckoutJob,
+    OrderStatus,
+    Status,
+)
+import pytest
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+@override_settings(CHECKOUT_MODE="async")
+class TestAsyncCheckout(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Games", description="Play")
+        self.console = Product.objects.create(
+            name="Console", price="300.00", stock=3, category=self.category
+        )
+
+    def shopper(self, email, quantity):
+        user = User.objects.create_user(email=email, password="password")
+        client = APIClient()
+        client.force_authenticate(user=user)
+        cart = Cart.objects.get(user=user)
+        CartItem.objects.create(cart=cart, product=self.console, quantity=quantity)
+        return client
+
+    def test_checkout_is_queued_without_touching_stock(self):
+        client = self.shopper("first@example.com", 2)
+
+        response = client.post("/api/v1/shop/orders/", format="json")
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data["status"], OrderStatus.queued)
+        self.assertEqual(float(response.data["total_price"]), 600.00)
+
+        self.console.refresh_from_db()
+        self.assertEqual(self.console.stock, 3)
+        self.assertTrue(CheckoutJob.objects.filter(order_id=response.data["id"]).exists())
+
+    def test_batch_accepts_orders_in_arrival_order_while_stock_lasts(self):
+        first = self.shopper("first@example.com", 2)
+        second = self.shopper("second@example.com", 2)
+        third = self.shopper("third@example.com", 1)
+        ids = [
+            client.post("/api/v1/shop/orders/", format="json").data["id"]
+            for client in (first, second, third)
+        ]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(process_checkout_batch(batch_size=10), 3)
+        self.assertEqual(process_checkout_batch(batch_size=10), 0)
+
+        self.console.refresh_from_db()
+        self.assertEqual(self.console.stock, 0)
+
+        statuses = [
+            client.get(f"/api/v1/shop/orders/{order_id}/status/").data
+            for client, order_id in zip((first, second, third), ids)
+        ]
+        self.assertEqual(statuses[0]["status"], Status.pending)
+        self.assertEqual(statuses[1]["status"], Status.failed)
+        self.assertIn("Not enough stock for Console", statuses[1]["error"])
+        self.assertEqual(statuses[2]["status"], Status.pending)
+
+    def test_status_is_private_to_the_owner(self):
+        order_id = (
+            self.shopper("owner@example.com", 1)
+            .post("/api/v1/shop/orders/", format="json")
+            .data["id"]
+        )
+        other = self.shopper("other@example.com", 1)
+        response = other.get(f"/api/v1/shop/orders/{order_id}/status/")
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,153 @@
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.handlers.asgi import ASGIHandler
+from django.test import RequestFactory, TestCase, override_settings
+from rest_framework.test import APIClient
+from django.contrib.auth import get_user_model
+from shop.middleware import CartMiddleware
+from shop.models import Category, Product, Cart, CartItem
+import pytest
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class TestAddToCart(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="shopper@example.com", password="password"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        self.category = Category.objects.create(name="Kitchen", description="Cooking")
+        self.product = Product.objects.create(
+            name="Kettle", price="30.00", stock=5, category=self.category
+        )
+
+    def add(self, product_id, quantity):
+        return self.client.post(
+            "/api/v1/shop/cart-items/",
+            {"product_id": product_id, "quantity": quantity},
+            format="json",
+        )
+
+    def test_adding_the_same_product_increments_one_line(self):
+        response = self.add(self.product.id, 2)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["product"]["name"], "Kettle")
+        self.assertEqual(response.data["quantity"], 2)
+
+        response = self.add(self.product.id, 3)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["quantity"], 5)
+
+        cart = Cart.objects.get(user=self.user)
+        self.assertEqual(CartItem.objects.filter(cart=cart).count(), 1)
+
+    def test_increment_past_stock_is_rejected_and_leaves_the_line_alone(self):
+        self.add(self.product.id, 4)
+
+        response = self.add(self.product.id, 2)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Not enough stock for Kettle", str(response.data))
+        self.assertIn("Requested: 6", str(response.data))
+        self.assertEqual(CartItem.objects.get(product=self.product).quantity, 4)
+
+    def test_unknown_product_and_bad_quantity_are_rejected(self):
+        response = self.add(999999, 1)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("product_id", response.data)
+
+        response = self.add(self.product.id, 0)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("quantity", response.data)
+
+    def test_quantity_can_be_updated_within_stock(self):
+        item_id = self.add(self.product.id, 1).data["id"]
+
+        response = self.client.patch(
+            f"/api/v1/shop/cart-items/{item_id}/", {"quantity": 5}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.patch(
+            f"/api/v1/shop/cart-items/{item_id}/", {"quantity": 6}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_cart_is_created_at_signup(self):
+        self.assertTrue(Cart.objects.filter(user=self.user).exists())
+
+    def test_cart_is_resolved_at_most_once_per_request(self):
+        # Cart lookup, upsert, and re-read of the line with its product.
+        with self.assertNumQueries(3):
+            self.add(self.product.id, 1)
+
+        # Listing joins through the cart instead of looking it up.
+        with self.assertNumQueries(2):
+            self.client.get("/api/v1/shop/cart-items/")
+
+
+@pytest.mark.django_db
+class TestCartRead(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="bulk@example.com", password="password"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.cart = Cart.objects.get(user=self.user)
+        self.category = Category.objects.create(name="Pantry", description="Food")
+
+    def fill_cart(self, count):
+        for i in range(count):
+            product = Product.objects.create(
+                name=f"Item {i}", price="2.50", stock=100, category=self.category
+            )
+            CartItem.objects.create(cart=self.cart, product=product, quantity=2)
+
+    def test_empty_cart_total_is_zero(self):
+        response = self.client.get(f"/api/v1/shop/cart/{self.cart.id}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(float(response.data["total_price"]), 0.0)
+
+    def test_cart_read_uses_a_constant_number_of_queries(self):
+        self.fill_cart(1)
+        with self.assertNumQueries(2):
+            response = self.client.get(f"/api/v1/shop/cart/{self.cart.id}/")
+        self.assertEqual(float(response.data["total_price"]), 5.0)
+
+        self.fill_cart(29)
+        with self.assertNumQueries(2):
+            response = self.client.get(f"/api/v1/shop/cart/{self.cart.id}/")
+        self.assertEqual(len(response.data["cart_items"]), 30)
+        self.assertEqual(float(response.data["total_price"]), 150.0)
+
+
+@pytest.mark.django_db
+class TestCartMiddlewareUnderASGI(TestCase):
+    def test_asgi_middleware_stack_needs_no_sync_adaptation(self):
+        middleware = [
+            name
+            for name in settings.MIDDLEWARE
+            if name != "whitenoise.middleware.WhiteNoiseMiddleware"
+        ]
+        # Django logs every middleware it has to wrap in sync_to_async.
+        with override_settings(MIDDLEWARE=middleware, DEBUG=True):
+            with self.assertNoLogs("django.request", "DEBUG"):
+                ASGIHandler()
+
+    def test_async_path_attaches_the_lazy_cart(self):
+        async def get_response(request):
+            return request
+
+        middleware = CartMiddleware(get_response)
+        request = RequestFactory().get("/")
+        request.user = AnonymousUser()
+
+        self.assertTrue(iscoroutinefunction(middleware))
+        request = async_to_sync(middleware)(request)
+        self.assertFalse(request.cart)
+        self.assertIsNone(request._cached_cart)
@@ -0,0 +1,143 @@
+from django.test import TestCase, override_settings
+from django.core.cache import cache
+from django.core.checks import run_checks
+from rest_framework.test import APIClient
+from shop.cache import STOCK_KEY, get_catalog_version
+from shop.models import Category, Product
+import pytest
+
+
+@pytest.mark.django_db
+class TestCatalogCache(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.category = Category.objects.create(name="Garden", description="Outdoors")
+        self.product = Product.objects.create(
+            name="Shovel", price="12.00", stock=4, category=self.category
+        )
+
+    def test_repeated_reads_are_served_from_cache(self):
+        first = self.client.get("/api/v1/shop/products/?category=garden")
+        self.assertEqual(first.status_code, 200)
+
+        with self.assertNumQueries(0):
+            second = self.client.get("/api/v1/shop/products/?category=garden")
+        self.assertEqual(second.data, first.data)
+
+        self.client.get(f"/api/v1/shop/products/{self.product.id}/")
+        with self.assertNumQueries(0):
+            self.client.get(f"/api/v1/shop/products/{self.product.id}/")
+
+    def test_query_string_is_part_of_the_key(self):
+        self.client.get("/api/v1/shop/products/?category=garden")
+        response = self.client.get("/api/v1/shop/products/?category=kitchen")
+        self.assertEqual(response.data["count"], 0)
+
+    def test_product_and_category_changes_invalidate_the_cache(self):
+        self.client.get("/api/v1/shop/products/")
+        self.client.get("/api/v1/shop/categories/")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.price = "15.00"
+            self.product.save()
+        response = self.client.get("/api/v1/shop/products/")
+        self.assertEqual(response.data["results"][0]["price"], "15.00")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.name = "Yard"
+            self.category.save()
+        response = self.client.get("/api/v1/shop/categories/")
+        self.assertEqual(response.data["results"][0]["name"], "Yard")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.delete()
+        response = self.client.get("/api/v1/shop/products/")
+        self.assertEqual(response.data["count"], 0)
+
+    def test_matching_etag_returns_not_modified(self):
+        response = self.client.get("/api/v1/shop/products/")
+        etag = response["ETag"]
+        self.assertNotIn("Last-Modified", response)
+
+        # A cold cache still answers from the aggregate alone.
+        cache.clear()
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                "/api/v1/shop/products/", HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+        response = self.client.get(
+            f"/api/v1/shop/products/{self.product.id}/", HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_changes_with_the_data(self):
+        etag = self.client.get("/api/v1/shop/products/")["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.name = "Yard"
+            self.category.save()
+        response = self.client.get("/api/v1/shop/products/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_if_modified_since_does_not_hide_a_deleted_product(self):
+        Product.objects.create(
+            name="Hoe", price="9.00", stock=2, category=self.category
+        )
+        self.client.get("/api/v1/shop/products/")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.delete()
+        response = self.client.get(
+            "/api/v1/shop/products/",
+            HTTP_IF_MODIFIED_SINCE="Fri, 01 Jan 2100 00:00:00 GMT",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["count"], 1)
+
+    def test_sales_update_stock_without_invalidating_the_catalog(self):
+        first = self.client.get("/api/v1/shop/products/")
+        version = get_catalog_version()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.decrement_stock({self.product.id: 3})
+        self.assertEqual(get_catalog_version(), version)
+
+        # Cached stock levels stand for CATALOG_STOCK_CACHE_TIMEOUT...
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/v1/shop/products/")
+        self.assertEqual(response.data["results"][0]["stock"], 4)
+
+        # ...then the cached page is served with the current level.
+        cache.delete(STOCK_KEY.format(self.product.id))
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                "/api/v1/shop/products/", HTTP_IF_NONE_MATCH=first["ETag"]
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["results"][0]["stock"], 1)
+        self.assertNotEqual(response["ETag"], first["ETag"])
+
+        response = self.client.get(
+            "/api/v1/shop/products/", HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_malformed_lookup_is_still_a_404(self):
+        response = self.client.get("/api/v1/shop/products/not-a-number/")
+        self.assertEqual(response.status_code, 404)
+
+    def test_several_workers_need_a_shared_cache(self):
+        backends = "django.core.cache.backends"
+        locmem = {"default": {"BACKEND": f"{backends}.locmem.LocMemCache"}}
+        redis = {"default": {"BACKEND": f"{backends}.redis.RedisCache"}}
+
+        with override_settings(WEB_CONCURRENCY=1, CACHES=locmem):
+            self.assertNotIn("shop.E001", [e.id for e in run_checks()])
+        with override_settings(WEB_CONCURRENCY=4, CACHES=redis):
+            self.assertNotIn("shop.E001", [e.id for e in run_checks()])
+        with override_settings(WEB_CONCURRENCY=4, CACHES=locmem):
+            self.assertIn("shop.E001", [e.id for e in run_checks()])
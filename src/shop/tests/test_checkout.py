@@ -0,0 +1,127 @@
+from unittest.mock import patch
+from django.db import OperationalError
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from django.contrib.auth import get_user_model
+from shop.models import Category, Product, Cart, CartItem, Order
+import pytest
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class TestCheckout(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="buyer@example.com", password="password"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.cart = Cart.objects.get(user=self.user)
+
+        self.category = Category.objects.create(name="Audio", description="Sound")
+        self.speaker = Product.objects.create(
+            name="Speaker", price="80.00", stock=10, category=self.category
+        )
+        self.cable = Product.objects.create(
+            name="Cable", price="5.50", stock=3, category=self.category
+        )
+        CartItem.objects.create(cart=self.cart, product=self.speaker, quantity=2)
+        CartItem.objects.create(cart=self.cart, product=self.cable, quantity=3)
+
+    def test_checkout_decrements_every_line(self):
+        response = self.client.post("/api/v1/shop/orders/", format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(float(response.data["total_price"]), 176.50)
+        self.assertEqual(
+            [item["product"]["category"] for item in response.data["order_items"]],
+            ["Audio", "Audio"],
+        )
+
+        self.speaker.refresh_from_db()
+        self.cable.refresh_from_db()
+        self.assertEqual(self.speaker.stock, 8)
+        self.assertEqual(self.cable.stock, 0)
+        self.assertFalse(CartItem.objects.filter(cart=self.cart).exists())
+
+    def test_oversold_line_rolls_back_the_whole_checkout(self):
+        # Stock dropped after the items were put in the cart
+        Product.objects.filter(pk=self.cable.pk).update(stock=2)
+
+        response = self.client.post("/api/v1/shop/orders/", format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Not enough stock for Cable", str(response.data))
+
+        self.speaker.refresh_from_db()
+        self.assertEqual(self.speaker.stock, 10)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(CartItem.objects.filter(cart=self.cart).count(), 2)
+
+
+class LockNotAvailable(Exception):
+    sqlstate = "55P03"
+
+
+def lock_not_available(*args, **kwargs):
+    # What Django raises when PostgreSQL reports NOWAIT/lock_timeout failure
+    raise OperationalError("could not obtain lock") from LockNotAvailable()
+
+
+@pytest.mark.django_db
+class TestCheckoutLockPolicy(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="racer@example.com", password="password"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        category = Category.objects.create(name="Consoles", description="Games")
+        self.product = Product.objects.create(
+            name="Console", price="300.00", stock=1, category=category
+        )
+        cart = Cart.objects.get(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.product, quantity=1)
+
+    @override_settings(
+        CHECKOUT_LOCK_STRATEGY="nowait",
+        CHECKOUT_LOCK_RETRIES=2,
+        CHECKOUT_LOCK_RETRY_BACKOFF_MS=0,
+    )
+    def test_nowait_retries_then_returns_conflict(self):
+        with patch.object(
+            Product.objects, "lock_in_order", side_effect=lock_not_available
+        ) as lock:
+            response = self.client.post("/api/v1/shop/orders/", format="json")
+
+        self.assertEqual(response.status_code, 409)
+        self.assertIn("Retry-After", response)
+        self.assertEqual(lock.call_count, 3)
+        self.assertTrue(lock.call_args.kwargs["nowait"])
+        self.assertFalse(Order.objects.exists())
+
+    @override_settings(CHECKOUT_LOCK_STRATEGY="nowait", CHECKOUT_LOCK_RETRIES=2)
+    def test_nowait_succeeds_once_the_lock_is_free(self):
+        real_lock = Product.objects.lock_in_order
+        outcomes = [lock_not_available, real_lock]
+
+        def flaky_lock(*args, **kwargs):
+            return outcomes.pop(0)(*args, **kwargs)
+
+        with patch.object(Product.objects, "lock_in_order", side_effect=flaky_lock):
+            response = self.client.post("/api/v1/shop/orders/", format="json")
+
+        self.assertEqual(response.status_code, 201)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 0)
+
+    @override_settings(CHECKOUT_LOCK_STRATEGY="block")
+    def test_lock_timeout_returns_service_unavailable(self):
+        with patch.object(
+            Product.objects, "lock_in_order", side_effect=lock_not_available
+        ) as lock:
+            response = self.client.post("/api/v1/shop/orders/", format="json")
+
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("Retry-After", response)
+        self.assertEqual(lock.call_count, 1)
@@ -0,0 +1,112 @@
+from datetime import timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from django.contrib.auth import get_user_model
+from shop.models import Category, Product, Cart, CartItem, Order, IdempotencyKey
+import pytest
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class TestIdempotentOrderCreation(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="retry@example.com", password="password"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        category = Category.objects.create(name="Bikes", description="Cycling")
+        self.product = Product.objects.create(
+            name="Bell", price="4.00", stock=10, category=category
+        )
+        cart = Cart.objects.get(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.product, quantity=2)
+
+    def post_order(self, key):
+        return self.client.post(
+            "/api/v1/shop/orders/", format="json", HTTP_IDEMPOTENCY_KEY=key
+        )
+
+    def test_retry_replays_the_first_response(self):
+        first = self.post_order("order-attempt-1")
+        self.assertEqual(first.status_code, 201)
+
+        retry = self.post_order("order-attempt-1")
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(retry.data["id"], first.data["id"])
+
+        self.assertEqual(Order.objects.count(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 8)
+
+    def test_keys_are_scoped_to_the_user(self):
+        self.post_order("shared-key")
+
+        other = User.objects.create_user(email="other@example.com", password="pw")
+        self.client.force_authenticate(user=other)
+        response = self.post_order("shared-key")
+        # A fresh request for the other user: their cart is empty.
+        self.assertEqual(response.status_code, 400)
+
+    def test_reusing_a_key_for_a_different_request_is_rejected(self):
+        self.post_order("reused-key")
+        response = self.client.post(
+            "/api/v1/payments/initialize/",
+            {"order_id": 1},
+            format="json",
+            HTTP_IDEMPOTENCY_KEY="reused-key",
+        )
+        self.assertEqual(response.status_code, 422)
+
+    def test_failed_requests_are_not_replayed(self):
+        CartItem.objects.all().delete()
+        self.assertEqual(self.post_order("empty-cart").status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    @override_settings(IDEMPOTENCY_WAIT_SECONDS=0)
+    def test_abandoned_claim_is_reclaimed_after_its_lease(self):
+        # Roll a finished request back to what a worker killed mid-request
+        # leaves behind: an in-flight claim and no order.
+        self.assertEqual(self.post_order("killed-worker").status_code, 201)
+        IdempotencyKey.objects.filter(key="killed-worker").update(
+            response_status=None, response_body=None
+        )
+        Order.objects.all().delete()
+        CartItem.objects.create(
+            cart=Cart.objects.get(user=self.user), product=self.product, quantity=2
+        )
+
+        self.assertEqual(self.post_order("killed-worker").status_code, 409)
+
+        IdempotencyKey.objects.filter(key="killed-worker").update(
+            created_at=timezone.now() - timedelta(seconds=61)
+        )
+        retry = self.post_order("killed-worker")
+        self.assertEqual(retry.status_code, 201)
+        self.assertNotIn("Idempotent-Replayed", retry)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(
+            IdempotencyKey.objects.get(key="killed-worker").response_status, 201
+        )
+
+    def test_purge_removes_only_expired_keys(self):
+        for key in ["old", "new"]:
+            IdempotencyKey.objects.create(
+                user=self.user, key=key, request_fingerprint="x", response_status=201
+            )
+        IdempotencyKey.objects.filter(key="old").update(
+            created_at=timezone.now() - timedelta(days=2)
+        )
+
+        out = StringIO()
+        call_command("purge_idempotency_keys", batch_size=1, stdout=out)
+        self.assertIn("Purged 1", out.getvalue())
+        self.assertEqual(
+            list(IdempotencyKey.objects.values_list("key", flat=True)), ["new"]
+        )
@@ -0,0 +1,109 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from django.contrib.auth import get_user_model
+from shop.checkout import process_checkout_batch
+from shop.models import Category, Product, Cart, CartItem, InventoryStripe, Status
+import pytest
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class TestInventoryStripes(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Sneakers", description="Drop")
+        self.sneaker = Product.objects.create(
+            name="Sneaker", price="120.00", stock=10, category=self.category
+        )
+        call_command(
+            "stripe_inventory", self.sneaker.id, stripes=4, stdout=StringIO()
+        )
+        self.sneaker.refresh_from_db()
+
+    def shopper(self, email, quantity):
+        user = User.objects.create_user(email=email, password="password")
+        client = APIClient()
+        client.force_authenticate(user=user)
+        cart = Cart.objects.get(user=user)
+        CartItem.objects.create(cart=cart, product=self.sneaker, quantity=quantity)
+        return client
+
+    def stripes(self):
+        return list(
+            InventoryStripe.objects.filter(product=self.sneaker)
+            .order_by("index")
+            .values_list("stock", flat=True)
+        )
+
+    def test_stock_is_spread_evenly_over_the_stripes(self):
+        self.assertEqual(self.sneaker.stock_stripes, 4)
+        self.assertEqual(self.stripes(), [3, 3, 2, 2])
+
+    def test_checkout_takes_from_a_stripe_and_leaves_the_product_row(self):
+        response = self.shopper("one@example.com", 2).post(
+            "/api/v1/shop/orders/", format="json"
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(float(response.data["total_price"]), 240.00)
+
+        self.assertEqual(sum(self.stripes()), 8)
+        self.sneaker.refresh_from_db()
+        self.assertEqual(self.sneaker.stock, 10)  # Until reconciled
+
+        call_command("reconcile_inventory", stdout=StringIO())
+        self.sneaker.refresh_from_db()
+        self.assertEqual(self.sneaker.stock, 8)
+
+    def test_a_line_bigger_than_any_stripe_drains_several(self):
+        response = self.shopper("big@example.com", 9).post(
+            "/api/v1/shop/orders/", format="json"
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(sum(self.stripes()), 1)
+
+    def test_overselling_a_striped_product_is_rejected(self):
+        response = self.shopper("greedy@example.com", 11).post(
+            "/api/v1/shop/orders/", format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Not enough stock for Sneaker", str(response.data))
+        self.assertEqual(self.stripes(), [3, 3, 2, 2])
+
+    @override_settings(CHECKOUT_MODE="async")
+    def test_batch_worker_takes_from_the_stripes(self):
+        self.shopper("first@example.com", 6).post("/api/v1/shop/orders/")
+        self.shopper("second@example.com", 6).post("/api/v1/shop/orders/")
+
+        process_checkout_batch(batch_size=10)
+
+        self.assertEqual(sum(self.stripes()), 4)
+        statuses = sorted(
+            self.sneaker.order_items.values_list("order__status", flat=True)
+        )
+        self.assertEqual(statuses, [Status.failed, Status.pending])
+
+    def test_restocking_through_the_api_refills_the_stripes(self):
+        admin = User.objects.create_superuser(
+            email="admin@example.com", password="password"
+        )
+        client = APIClient()
+        client.force_authenticate(user=admin)
+
+        response = client.patch(
+            f"/api/v1/shop/products/{self.sneaker.id}/", {"stock": 20}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.stripes(), [5, 5, 5, 5])
+
+    def test_unstriping_folds_the_stock_back(self):
+        InventoryStripe.objects.filter(product=self.sneaker, index=0).update(stock=0)
+
+        call_command("stripe_inventory", self.sneaker.id, stripes=0, stdout=StringIO())
+
+        self.sneaker.refresh_from_db()
+        self.assertEqual(self.sneaker.stock_stripes, 0)
+        self.assertEqual(self.sneaker.stock, 7)
+        self.assertEqual(self.stripes(), [])
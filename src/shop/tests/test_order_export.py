@@ -0,0 +1,84 @@
+import csv
+import json
+from datetime import datetime, timezone as dt_timezone
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.test import APIClient
+from django.contrib.auth import get_user_model
+from shop.models import Category, Product, Order, OrderItem, Status
+import pytest
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class TestOrderExport(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            email="finance@example.com", password="password"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+
+        self.customer = User.objects.create_user(
+            email="customer@example.com", password="password"
+        )
+        category = Category.objects.create(name="Office", description="Work")
+        self.pen = Product.objects.create(
+            name="Pen", price="2.00", stock=100, category=category
+        )
+        self.march = self.order(datetime(2026, 3, 5, tzinfo=dt_timezone.utc), 3)
+        self.april = self.order(
+            datetime(2026, 4, 1, tzinfo=dt_timezone.utc), 1, status=Status.failed
+        )
+
+    def order(self, created_at, quantity, status=Status.success):
+        order = Order.objects.create(
+            user=self.customer, total_price=quantity * 2, status=status
+        )
+        Order.objects.filter(pk=order.pk).update(created_at=created_at)
+        OrderItem.objects.create(
+            order=order,
+            product=self.pen,
+            quantity=quantity,
+            price="2.00",
+            **OrderItem.snapshot(self.pen),
+        )
+        return order
+
+    def export(self, query):
+        response = self.client.get(f"/api/v1/shop/exports/orders/?{query}")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode()
+
+    def test_csv_export_has_one_row_per_line_and_honours_filters(self):
+        body = self.export("start=2026-03-01&end=2026-03-31")
+        rows = list(csv.DictReader(StringIO(body)))
+        self.assertEqual([row["order_id"] for row in rows], [str(self.march.id)])
+        self.assertEqual(rows[0]["product_name"], "Pen")
+        self.assertEqual(rows[0]["quantity"], "3")
+        self.assertEqual(rows[0]["user_email"], "customer@example.com")
+
+        rows = list(csv.DictReader(StringIO(self.export("status=failed"))))
+        self.assertEqual([row["order_id"] for row in rows], [str(self.april.id)])
+
+    def test_ndjson_export_nests_the_lines(self):
+        documents = [
+            json.loads(line) for line in self.export("output=ndjson").splitlines()
+        ]
+        self.assertEqual([d["id"] for d in documents], [self.march.id, self.april.id])
+        self.assertEqual(documents[0]["order_items"][0]["unit_price"], "2.00")
+
+    def test_export_is_admin_only(self):
+        self.client.force_authenticate(user=self.customer)
+        response = self.client.get("/api/v1/shop/exports/orders/")
+        self.assertEqual(response.status_code, 403)
+
+    def test_command_streams_the_same_export(self):
+        out = StringIO()
+        call_command("export_orders", output_format="ndjson", chunk_size=1, stdout=out)
+        ids = [json.loads(line)["id"] for line in out.getvalue().splitlines()]
+        self.assertEqual(ids, [self.march.id, self.april.id])
@@ -0,0 +1,124 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.test import APIClient
+from django.contrib.auth import get_user_model
+from shop.models import Category, Product, Order, OrderItem, Status
+import pytest
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class TestOrderHistory(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="regular@example.com", password="password"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        self.category = Category.objects.create(name="Books", description="Read")
+        self.products = [
+            Product.objects.create(
+                name=f"Book {i}", price="10.00", stock=100, category=self.category
+            )
+            for i in range(3)
+        ]
+
+    def place_orders(self, count):
+        orders = []
+        for _ in range(count):
+            order = Order.objects.create(
+                user=self.user, total_price="30.00", status=Status.success
+            )
+            OrderItem.objects.bulk_create(
+                OrderItem(
+                    order=order,
+                    product=product,
+                    quantity=1,
+                    price="10.00",
+                    **OrderItem.snapshot(product),
+                )
+                for product in self.products
+            )
+            orders.append(order)
+        return orders
+
+    def test_summary_mode_lists_counts_without_items(self):
+        orders = self.place_orders(3)
+
+        with self.assertNumQueries(1) as queries:
+            response = self.client.get("/api/v1/shop/orders/?mode=summary")
+        self.assertEqual(response.status_code, 200)
+        # Counted per page row, not grouped over all of the user's orders
+        sql = queries.captured_queries[0]["sql"]
+        self.assertNotIn("GROUP BY", sql)
+        self.assertNotIn("JOIN", sql)
+
+        results = response.data["results"]
+        self.assertEqual(
+            [row["id"] for row in results], [o.id for o in reversed(orders)]
+        )
+        self.assertEqual(results[0]["item_count"], 3)
+        self.assertNotIn("order_items", results[0])
+
+    def test_summary_mode_pages_with_a_cursor(self):
+        orders = self.place_orders(5)
+
+        first = self.client.get("/api/v1/shop/orders/?mode=summary&page_size=2")
+        self.assertEqual(len(first.data["results"]), 2)
+        second = self.client.get(first.data["next"])
+
+        ids = [row["id"] for row in first.data["results"] + second.data["results"]]
+        self.assertEqual(ids, [o.id for o in reversed(orders)][:4])
+
+    def test_summary_mode_only_lists_own_orders(self):
+        other = User.objects.create_user(email="other@example.com", password="x")
+        Order.objects.create(user=other, total_price="1.00")
+
+        response = self.client.get("/api/v1/shop/orders/?mode=summary")
+        self.assertEqual(response.data["results"], [])
+
+    def test_detail_and_full_list_use_a_constant_number_of_queries(self):
+        order = self.place_orders(1)[0]
+
+        # Order (with user) and its items, rendered from their snapshots.
+        with self.assertNumQueries(2):
+            response = self.client.get(f"/api/v1/shop/orders/{order.id}/")
+        self.assertEqual(len(response.data["order_items"]), 3)
+        self.assertEqual(
+            response.data["order_items"][0]["product"]["category"], "Books"
+        )
+
+        self.place_orders(4)
+        # Count, orders and items.
+        with self.assertNumQueries(3):
+            response = self.client.get("/api/v1/shop/orders/")
+        self.assertEqual(response.data["count"], 5)
+
+    def test_orders_still_render_after_the_product_changes_or_goes(self):
+        order = self.place_orders(1)[0]
+        Product.objects.filter(pk=self.products[0].pk).update(name="Renamed")
+        self.products[1].delete()
+
+        response = self.client.get(f"/api/v1/shop/orders/{order.id}/")
+        items = response.data["order_items"]
+        self.assertEqual(items[0]["product"]["name"], "Book 0")
+        self.assertEqual(items[0]["product"]["price"], items[0]["price"])
+        self.assertEqual(items[0]["product"]["stock"], self.products[0].stock)
+        # A deleted product is null, as it was before lines had snapshots
+        self.assertIsNone(items[1]["product"])
+        self.assertEqual(items[2]["product"]["name"], "Book 2")
+
+    def test_backfill_copies_snapshots_onto_old_lines(self):
+        order = self.place_orders(1)[0]
+        order.order_items.update(product_name="", category_name="")
+
+        call_command("backfill_order_snapshots", batch_size=2, stdout=StringIO())
+
+        snapshots = order.order_items.order_by("id").values_list(
+            "product_name", "category_name"
+        )
+        self.assertEqual(list(snapshots), [(f"Book {i}", "Books") for i in range(3)])
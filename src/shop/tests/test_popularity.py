@@ -0,0 +1,89 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from django.contrib.auth import get_user_model
+from shop.cache import get_catalog_version
+from shop.models import Category, Product, Order, OrderItem, ProductPopularity
+import pytest
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class TestPopularOrdering(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.category = Category.objects.create(name="Toys", description="Fun")
+        self.products = {
+            name: Product.objects.create(
+                name=name, price="5.00", stock=100, category=self.category
+            )
+            for name in ["Kite", "Yo-yo", "Marbles", "Never sold"]
+        }
+
+    def sell(self, name, units, days_ago=0):
+        ProductPopularity.objects.increment(
+            {self.products[name].id: units},
+            timezone.now() - timedelta(days=days_ago),
+        )
+
+    def names(self, response):
+        return [product["name"] for product in response.data["results"]]
+
+    def test_recent_sales_outweigh_older_ones(self):
+        self.sell("Kite", 10, days_ago=28)  # Four half-lives ago: worth 10/16
+        self.sell("Yo-yo", 2)
+        self.sell("Marbles", 1)
+        self.sell("Marbles", 1, days_ago=1)
+
+        response = self.client.get("/api/v1/shop/products/?ordering=popular")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.names(response), ["Yo-yo", "Marbles", "Kite"])
+
+    def test_popular_ordering_ignores_cursor_pagination(self):
+        for units, name in enumerate(["Kite", "Yo-yo", "Marbles"], start=1):
+            self.sell(name, units)
+
+        response = self.client.get(
+            "/api/v1/shop/products/?ordering=popular&pagination=cursor"
+        )
+        self.assertEqual(response.data["count"], 3)
+        self.assertEqual(self.names(response), ["Marbles", "Yo-yo", "Kite"])
+
+    def test_a_paid_order_moves_up_the_cached_ranking(self):
+        self.sell("Kite", 2)
+        self.sell("Yo-yo", 1)
+        url = "/api/v1/shop/products/?ordering=popular"
+        self.assertEqual(self.names(self.client.get(url)), ["Kite", "Yo-yo"])
+
+        user = User.objects.create_user(email="kid@example.com", password="password")
+        order = Order.objects.create(user=user, total_price="25.00")
+        OrderItem.objects.create(
+            order=order, product=self.products["Yo-yo"], quantity=5, price="5.00"
+        )
+        version = get_catalog_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductPopularity.objects.record_sale(order)
+
+        # The sale leaves the rest of the catalog cache alone...
+        self.assertEqual(get_catalog_version(), version)
+        self.assertEqual(self.names(self.client.get(url)), ["Kite", "Yo-yo"])
+
+        # ...and shows up once the popular listing's short timeout runs out.
+        cache.clear()
+        self.assertEqual(self.names(self.client.get(url)), ["Yo-yo", "Kite"])
+
+    @override_settings(POPULARITY_HALF_LIFE_DAYS=0.001)
+    def test_sales_far_past_the_epoch_are_still_recorded(self):
+        # Hundreds of thousands of half-lives past POPULARITY_EPOCH
+        with self.assertLogs("shop.models", "WARNING"):
+            self.sell("Kite", 2)
+            self.sell("Yo-yo", 1)
+
+        score = ProductPopularity.objects.get(product=self.products["Kite"]).score
+        self.assertEqual(score, 2 * 2.0**ProductPopularity.objects.MAX_DECAY_EXPONENT)
+        response = self.client.get("/api/v1/shop/products/?ordering=popular")
+        self.assertEqual(self.names(response), ["Kite", "Yo-yo"])
@@ -0,0 +1,67 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+from shop.models import Category, Product
+import pytest
+
+
+@pytest.mark.django_db
+class TestProductCatalog(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.books = Category.objects.create(name="Books2", description="Reading")
+        self.toys = Category.objects.create(name="Toys2", description="Playing")
+
+        for i in range(5):
+            Product.objects.create(
+                name=f"Novel {i}",
+                description="A paperback",
+                price="10.00",
+                stock=3,
+                category=self.books,
+            )
+        Product.objects.create(
+            name="Robot",
+            description="A wind-up toy",
+            price="25.00",
+            stock=1,
+            category=self.toys,
+        )
+
+    def collect_cursor_pages(self, url):
+        names = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn("count", response.data)
+            names.extend(product["name"] for product in response.data["results"])
+            url = response.data["next"]
+        return names
+
+    def test_page_number_pagination_is_the_default(self):
+        response = self.client.get("/api/v1/shop/products/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["count"], 6)
+
+    def test_cursor_pagination_walks_every_product_once(self):
+        names = self.collect_cursor_pages(
+            "/api/v1/shop/products/?pagination=cursor&page_size=2"
+        )
+        self.assertEqual(names, [f"Novel {i}" for i in range(5)] + ["Robot"])
+
+    def test_cursor_pagination_respects_category_filter_and_search(self):
+        names = self.collect_cursor_pages(
+            "/api/v1/shop/products/?pagination=cursor&page_size=2&category=books2"
+        )
+        self.assertEqual(names, [f"Novel {i}" for i in range(5)])
+
+        names = self.collect_cursor_pages(
+            "/api/v1/shop/products/?pagination=cursor&page_size=2&search=wind-up"
+        )
+        self.assertEqual(names, ["Robot"])
+
+    def test_search_matches_name_and_description(self):
+        response = self.client.get("/api/v1/shop/products/?search=robot")
+        self.assertEqual([p["name"] for p in response.data["results"]], ["Robot"])
+
+        response = self.client.get("/api/v1/shop/products/?search=paperback")
+        self.assertEqual(response.data["count"], 5)
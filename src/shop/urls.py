@@ -6,6 +6,7 @@ from shop.views import (
     CartViewSet,
     CartItemViewSet,
     OrderViewSet,
+    OrderExportView,
 )
 
 router = routers.DefaultRouter()
@@ -16,5 +17,6 @@ router.register(r"cart", CartViewSet, basename="cart")
 router.register(r"cart-items", CartItemViewSet, basename="cart-item")
 
 urlpatterns = [
+    path("exports/orders/", OrderExportView.as_view(), name="order-export"),
     path("", include(router.urls)),
 ]
@@ -1,11 +1,18 @@
-from rest_framework import viewsets, filters, status, generics
+from django.conf import settings
+from django.db.models import F, Func, OuterRef, Prefetch, Subquery
+from django.http import StreamingHttpResponse
+from rest_framework import viewsets, status, generics
+from rest_framework.decorators import action
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.permissions import (
     IsAdminUser,
     IsAuthenticatedOrReadOnly,
     IsAuthenticated,
 )
 from django_filters.rest_framework import DjangoFilterBackend
-from drf_spectacular.utils import extend_schema, extend_schema_view
+from drf_spectacular.utils import OpenApiParameter, extend_schema, extend_schema_view
 
 # Import the new serializers and models needed for the cart
 from .serializers import (
@@ -15,18 +22,37 @@ from .serializers import (
     CategorySerializer,
     CartSerializer,
     CartItemSerializer,
+    AddCartItemSerializer,
     OrderSerializer,
+    OrderStatusSerializer,
+    OrderSummarySerializer,
+    OrderExportQuerySerializer,
     CreateOrderSerializer,
 )
-from .models import Product, Category, Order, Cart, CartItem
-from .filters import ProductFilter
+from .models import Product, Category, Order, OrderItem, OrderStatus, Cart, CartItem
+from .filters import PopularityOrderingFilter, ProductFilter, ProductSearchFilter
+from .pagination import (
+    OrderCursorPagination,
+    ProductCursorPagination,
+)
+from .cache import CatalogCacheMixin
+from .export import CONTENT_TYPES, WRITERS, export_orders
+from .idempotency import IDEMPOTENCY_KEY_PARAMETER, idempotent
+from .renderers import CSVRenderer, NDJSONRenderer
 
 # Create your views here.
 
 
 @extend_schema_view(
     list=extend_schema(
-        description="Get a paginated list of all products. Can be filtered by category slug."
+        description=(
+            "Get a paginated list of all products. Can be filtered by category slug. "
+            "`search` results are ordered by relevance. "
+            "Pass `pagination=cursor` to page with an opaque `cursor` instead of a page number. "
+            "`ordering=popular` lists best-selling products first, weighted towards recent sales. "
+            "It always pages by page number, and sales between requests can move a "
+            "product onto a page already fetched."
+        )
     ),
     retrieve=extend_schema(description="Get details of a single product by it's ID."),
     create=extend_schema(description="[Admin Only] Create a new product."),
@@ -38,11 +64,50 @@ from .filters import ProductFilter
         description="[Admin Only] Delete a product from the catalog."
     ),
 )
-class ProductViewSet(viewsets.ModelViewSet):
-    queryset = Product.objects.all().select_related("category").order_by("created_at")
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+class ProductViewSet(CatalogCacheMixin, viewsets.ModelViewSet):
+    queryset = (
+        Product.objects.all()
+        .select_related("category")
+        .defer("search_vector")
+        .order_by("created_at")
+    )
+    filter_backends = [
+        DjangoFilterBackend,
+        ProductSearchFilter,
+        PopularityOrderingFilter,
+    ]
     filterset_class = ProductFilter
     search_fields = ["name", "description"]
+    validator_fields = ("updated_at", "category__updated_at", "popularity__updated_at")
+    stock_field = "stock"
+
+    @property
+    def paginator(self):
+        """
+        Page-number pagination by default; keyset pagination when the client
+        opts in with `?pagination=cursor` (or follows a cursor link).
+
+        `?ordering=popular` always pages by page number. Its sort key, the
+        sales score, moves as orders are paid, so a cursor taken from it
+        stops pointing at the right place; a product can still move between
+        pages from one request to the next.
+        """
+        if not hasattr(self, "_paginator"):
+            request = getattr(self, "request", None)
+            params = getattr(request, "query_params", {})
+            cursor = params.get("pagination") == "cursor" or "cursor" in params
+            if cursor and params.get("ordering") != "popular":
+                self._paginator = ProductCursorPagination()
+            else:
+                self._paginator = super().paginator
+        return self._paginator
+
+    def get_cache_timeout(self):
+        # Sales reorder the popular listing without bumping the catalog
+        # version, so it is only cached for a short while.
+        if self.request.query_params.get("ordering") == "popular":
+            return settings.POPULARITY_CACHE_TIMEOUT
+        return super().get_cache_timeout()
 
     def get_serializer_class(self):
         if self.action == "list":
@@ -80,7 +145,7 @@ class ProductViewSet(viewsets.ModelViewSet):
         description="[Admin Only] Delete a category from the catalog."
     ),
 )
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(CatalogCacheMixin, viewsets.ModelViewSet):
     serializer_class = CategorySerializer
     queryset = Category.objects.all().order_by("name")
 
@@ -93,7 +158,23 @@ class CategoryViewSet(viewsets.ModelViewSet):
 
 
 @extend_schema_view(
-    list=extend_schema(description="Get a list of the current user's past orders."),
+    list=extend_schema(
+        description=(
+            "Get a list of the current user's past orders, newest first. "
+            "Pass `mode=summary` for a light listing (no items, just `item_count`) "
+            "paged with an opaque `cursor`; full item details then come from the "
+            "order detail endpoint."
+        ),
+        parameters=[
+            OpenApiParameter(
+                name="mode",
+                type=str,
+                enum=["summary"],
+                required=False,
+                description="`summary` returns orders without their items.",
+            )
+        ],
+    ),
     retrieve=extend_schema(description="Get details of a specific order."),
     create=extend_schema(
         description="Create a new order from the user's current shopping cart."
@@ -107,30 +188,84 @@ class OrderViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     http_method_names = ["get", "post", "head", "options"]  # No updates or deletes
 
+    @property
+    def summary_mode(self):
+        request = getattr(self, "request", None)
+        params = getattr(request, "query_params", {})
+        return self.action == "list" and params.get("mode") == "summary"
+
+    @property
+    def paginator(self):
+        """Keyset pagination for the summary listing, page numbers otherwise."""
+        if not hasattr(self, "_paginator"):
+            if self.summary_mode:
+                self._paginator = OrderCursorPagination()
+            else:
+                self._paginator = super().paginator
+        return self._paginator
+
     def get_serializer_class(self):
         if self.action == "create":
             return CreateOrderSerializer
+        if self.action == "checkout_status":
+            return OrderStatusSerializer
+        if self.summary_mode:
+            return OrderSummarySerializer
         return OrderSerializer
 
     def get_serializer_context(self):
-        # Pass the user and their cart to the serializer context
-        user = self.request.user
-        cart, _ = Cart.objects.get_or_create(user=user)
-        return {"user": user, "cart": cart}
+        # Pass the user and their (lazily resolved) cart to the serializer context
+        return {"user": self.request.user, "cart": self.request.cart}
 
     def get_queryset(self):
         # Users should only be able to see their own orders
-        return Order.objects.filter(user=self.request.user).prefetch_related(
-            "order_items__product"
+        queryset = Order.objects.filter(user=self.request.user)
+        if self.action == "checkout_status":
+            return queryset.select_related("checkout_job")
+        if self.summary_mode:
+            # The page is walked off the shop_order_user_created_idx index;
+            # a correlated count per returned row, rather than a JOIN and
+            # GROUP BY over every order the user has, keeps it that way.
+            item_count = (
+                OrderItem.objects.filter(order=OuterRef("pk"))
+                .annotate(count=Func(F("id"), function="COUNT"))
+                .values("count")
+            )
+            return queryset.annotate(item_count=Subquery(item_count))
+        # Items render from their snapshots plus the live product stock: one
+        # extra query, joined to the products by primary key only.
+        items = OrderItem.objects.with_product_stock().order_by("id")
+        return (
+            queryset.select_related("user")
+            .prefetch_related(Prefetch("order_items", queryset=items))
+            .order_by("-created_at", "-id")
         )
 
     @extend_schema(tags=["Order"])
     def retrieve(self, request, *args, **kwargs):
         return super().retrieve(request, *args, **kwargs)
 
-    @extend_schema(tags=["Order"])
+    @extend_schema(
+        tags=["Order"],
+        parameters=[IDEMPOTENCY_KEY_PARAMETER],
+        responses={201: CreateOrderSerializer, 202: CreateOrderSerializer},
+    )
+    @idempotent
     def create(self, request, *args, **kwargs):
-        return super().create(request, *args, **kwargs)
+        response = super().create(request, *args, **kwargs)
+        if response.data.get("status") == OrderStatus.queued:
+            # Async checkout: accepted, not yet settled. Poll /status/ for
+            # the outcome.
+            response.status_code = status.HTTP_202_ACCEPTED
+        return response
+
+    @extend_schema(
+        tags=["Order"],
+        description="Get the checkout progress of an order (cheap to poll).",
+    )
+    @action(detail=True, methods=["get"], url_path="status")
+    def checkout_status(self, request, pk=None):
+        return Response(self.get_serializer(self.get_object()).data)
 
 
 @extend_schema_view(
@@ -149,8 +284,12 @@ class CartViewSet(
     permission_classes = [IsAuthenticated]
 
     def get_object(self):
-        # Retrieve or create a cart for the logged-in user
-        cart, created = Cart.objects.get_or_create(user=self.request.user)
+        # Load the cart with its total computed in SQL and its items (with their
+        # products) prefetched, so the query count does not grow with the cart.
+        cart = self.get_queryset().with_total_price().with_items().first()
+        if cart is None:
+            # Users created before carts were made at signup
+            cart = self.request.cart
         return cart
 
     def get_queryset(self):
@@ -180,34 +319,71 @@ class CartItemViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     http_method_names = ["get", "post", "patch", "delete"]  # Limit available methods
 
-    def get_serializer_context(self):
-        """
-        Passes the user's cart to the serializer as context.
-        This is needed for the serializer's custom create logic.
-        """
-        user = self.request.user
-        cart, _ = Cart.objects.get_or_create(user=user)
-        # Add the cart to the default context and return it
-        context = super().get_serializer_context()
-        context["cart"] = cart
-        return context
+    def get_serializer_class(self):
+        if self.action == "create":
+            return AddCartItemSerializer
+        return CartItemSerializer
 
     def get_queryset(self):
-        # Filter items to only those in the user's cart
-        user = self.request.user
-        # Ensure a cart exists before querying items
-        cart, _ = Cart.objects.get_or_create(user=user)
-        return CartItem.objects.filter(cart=cart)
+        # Filter items to only those in the user's cart, joining through the
+        # cart so listing items needs no separate cart lookup
+        return (
+            CartItem.objects.filter(cart__user=self.request.user)
+            .select_related("product")
+            .order_by("id")
+        )
 
     def perform_create(self, serializer):
         # Associate the new cart item with the user's cart
-        cart, _ = Cart.objects.get_or_create(user=self.request.user)
-        serializer.save(cart=cart)
+        serializer.save(cart=self.request.cart)
 
     @extend_schema(tags=["Cart"])
     def retrieve(self, request, *args, **kwargs):
         return super().retrieve(request, *args, **kwargs)
 
-    @extend_schema(tags=["Cart"])
+    @extend_schema(
+        tags=["Cart"],
+        request=AddCartItemSerializer,
+        responses={201: CartItemSerializer},
+    )
     def create(self, request, *args, **kwargs):
         return super().create(request, *args, **kwargs)
+
+
+class OrderExportView(APIView):
+    """
+    Streams all orders with their line items as CSV or NDJSON for finance.
+    """
+
+    permission_classes = [IsAdminUser]
+    renderer_classes = [JSONRenderer, CSVRenderer, NDJSONRenderer]
+
+    @extend_schema(
+        tags=["Order"],
+        summary="Export orders",
+        description=(
+            "[Admin Only] Streams every order placed between `start` and `end` "
+            "(inclusive dates) with the given `status`, oldest first. "
+            "`output=csv` (default) gives one row per order line; `output=ndjson` "
+            "one JSON document per order. The export is read through a server-side "
+            "cursor and streamed, so it has no size limit."
+        ),
+        parameters=[OrderExportQuerySerializer],
+        responses={(200, "text/csv"): str, (200, "application/x-ndjson"): str},
+    )
+    def get(self, request, *args, **kwargs):
+        query = OrderExportQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+        output = params["output"]
+
+        orders = export_orders(
+            start=params.get("start"),
+            end=params.get("end"),
+            status=params.get("status"),
+        )
+        response = StreamingHttpResponse(
+            WRITERS[output](orders), content_type=CONTENT_TYPES[output]
+        )
+        response["Content-Disposition"] = f'attachment; filename="orders.{output}"'
+        return response